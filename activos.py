@@ -0,0 +1,188 @@
+# ======================================================
+# activos.py — archivos estáticos con huella, precomprimidos y cacheables
+# ======================================================
+# - url_for('static', filename='offline.js') → /static/offline.<huella>.js
+#   (la huella es un hash del contenido: cambia solo si cambia el archivo).
+# - Una URL con huella es inmutable → Cache-Control de un año; el cobrador
+#   con datos móviles no vuelve a descargarla hasta el próximo deploy.
+# - Junto a cada archivo de texto se guarda su .gz (y .br si está instalado
+#   el paquete brotli); se sirve el que acepte el navegador.
+# - Las páginas HTML grandes (index, liquidaciones) salen comprimidas con gzip.
+
+import os
+import gzip
+import hashlib
+import mimetypes
+from flask import request, send_from_directory
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# 📦 Tipos que vale la pena comprimir
+EXTENSIONES_COMPRIMIBLES = (".js", ".css", ".svg", ".json", ".txt", ".html")
+
+# 🚫 Deben conservar su URL fija (el service worker se sirve desde /sw.js)
+EXCLUIDOS = {"sw.js"}
+
+# 📏 HTML más chico que esto se envía sin comprimir
+GZIP_MINIMO_BYTES = int(os.getenv("GZIP_MINIMO_BYTES", "1024"))
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+# nombre original ↔ nombre con huella
+_CON_HUELLA = {}
+_ORIGINALES = {}
+
+
+# ---------------------------------------------------
+# 🔏 Huellas
+# ---------------------------------------------------
+def huella(ruta: str):
+    """Primeros 10 caracteres del SHA-256 del contenido."""
+    with open(ruta, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def nombre_con_huella(nombre: str, valor: str):
+    base, extension = os.path.splitext(nombre)
+    return f"{base}.{valor}{extension}"
+
+
+def _archivos(carpeta: str):
+    """Rutas relativas (con /) de los archivos servibles de la carpeta estática."""
+    for raiz, _, nombres in os.walk(carpeta):
+        for nombre in nombres:
+            if nombre.endswith((".gz", ".br")):
+                continue
+            relativa = os.path.relpath(os.path.join(raiz, nombre), carpeta).replace(os.sep, "/")
+            if relativa not in EXCLUIDOS:
+                yield relativa
+
+
+def construir_manifiesto(carpeta: str):
+    """Recalcula el mapa nombre → nombre con huella. Devuelve el manifiesto."""
+    _CON_HUELLA.clear()
+    _ORIGINALES.clear()
+    for relativa in _archivos(carpeta):
+        con_huella = nombre_con_huella(relativa, huella(os.path.join(carpeta, relativa)))
+        _CON_HUELLA[relativa] = con_huella
+        _ORIGINALES[con_huella] = relativa
+    return dict(_CON_HUELLA)
+
+
+# ---------------------------------------------------
+# 🗜️ Precompresión (al arrancar o con "flask activos")
+# ---------------------------------------------------
+def _vigente(origen: str, destino: str):
+    return os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(origen)
+
+
+def precomprimir(carpeta: str, forzar: bool = False):
+    """
+    Escribe los hermanos .gz (y .br si hay brotli) de cada archivo de texto.
+    Solo regenera los que faltan o quedaron más viejos que el original.
+    Devuelve la lista de archivos escritos.
+    """
+    escritos = []
+    for relativa in _archivos(carpeta):
+        if not relativa.endswith(EXTENSIONES_COMPRIMIBLES):
+            continue
+        origen = os.path.join(carpeta, relativa)
+        with open(origen, "rb") as f:
+            contenido = f.read()
+
+        destino = origen + ".gz"
+        if forzar or not _vigente(origen, destino):
+            with open(destino, "wb") as f:
+                f.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+            escritos.append(destino)
+
+        destino = origen + ".br"
+        if brotli is not None and (forzar or not _vigente(origen, destino)):
+            with open(destino, "wb") as f:
+                f.write(brotli.compress(contenido, quality=11))
+            escritos.append(destino)
+    return escritos
+
+
+# ---------------------------------------------------
+# 🔗 url_for con huella y vista de estáticos
+# ---------------------------------------------------
+def _agregar_huella(endpoint, values):
+    if endpoint == "static" and values.get("filename") in _CON_HUELLA:
+        values["filename"] = _CON_HUELLA[values["filename"]]
+
+
+def _servir_estatico(app):
+    def static(filename):
+        original = _ORIGINALES.get(filename)
+        nombre = original or filename
+        tipo = mimetypes.guess_type(nombre)[0]
+
+        # 🗜️ Versión precomprimida que acepte el navegador (br > gzip)
+        codificacion = None
+        for sufijo, valor in ((".br", "br"), (".gz", "gzip")):
+            if valor in request.accept_encodings and os.path.isfile(os.path.join(app.static_folder, nombre + sufijo)):
+                codificacion = valor
+                nombre += sufijo
+                break
+
+        resp = send_from_directory(app.static_folder, nombre, mimetype=tipo)
+        if codificacion:
+            resp.headers["Content-Encoding"] = codificacion
+        resp.vary.add("Accept-Encoding")
+
+        # 🧊 URL con huella: el contenido nunca cambia bajo este nombre
+        if original:
+            resp.headers["Cache-Control"] = CACHE_INMUTABLE
+        return resp
+    return static
+
+
+# ---------------------------------------------------
+# 🗜️ gzip de respuestas HTML
+# ---------------------------------------------------
+def comprimir_html(resp):
+    """after_request: comprime con gzip el HTML grande si el navegador lo acepta."""
+    if (
+        resp.status_code != 200
+        or resp.mimetype != "text/html"
+        or resp.direct_passthrough
+        or resp.is_streamed
+        or "Content-Encoding" in resp.headers
+        or "gzip" not in request.accept_encodings
+    ):
+        return resp
+
+    cuerpo = resp.get_data()
+    if len(cuerpo) < GZIP_MINIMO_BYTES:
+        return resp
+
+    resp.set_data(gzip.compress(cuerpo, compresslevel=6))
+    resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+
+    # 🔏 La misma página comprimida ya no es idéntica byte a byte → ETag débil
+    etag, debil = resp.get_etag()
+    if etag and not debil:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+# ---------------------------------------------------
+# 🚀 Registro en la app
+# ---------------------------------------------------
+def registrar_activos(app):
+    """Manifiesto de huellas, precompresión, vista de estáticos y gzip de HTML."""
+    manifiesto = construir_manifiesto(app.static_folder)
+    try:
+        precomprimir(app.static_folder)
+    except OSError as e:  # carpeta de solo lectura: se sirven sin comprimir
+        print(f"⚠️ No se pudieron precomprimir los estáticos: {e}")
+
+    app.url_defaults(_agregar_huella)
+    app.view_functions["static"] = _servir_estatico(app)
+    app.after_request(comprimir_html)
+    return manifiesto
@@ -0,0 +1,377 @@
+# ======================================================
+# analitica.py — copia columnar de abonos, préstamos y caja (NumPy + mmap)
+# ======================================================
+# Los análisis (tasa de cobranza, curvas de recuperación por frecuencia…) no
+# deben consultar la base de producción. "flask analitica-exportar" escribe:
+#   ANALITICA_DIR/<tabla>/<columna>.npy   un arreglo por columna
+#   ANALITICA_DIR/<tabla>/<columna>.json  diccionario de las columnas de texto
+#   ANALITICA_DIR/manifiesto.json         filas, último id y versión por tabla
+# - Tipos compactos: ids int32, dinero en centavos int64 (exacto, como la
+#   base), fechas datetime64[D], instantes datetime64[s], textos como código
+#   int32 en su diccionario (−1 = NULL).
+# - Incremental: solo se leen las filas con id > último exportado (vivas y
+#   *_archivo) y se agregan al final del .npy reescribiendo solo la cabecera.
+#   Las filas con version > la marca del manifiesto se releen: las ya
+#   exportadas se corrigen en su lugar (p. ej. el saldo de un préstamo) y las
+#   que faltan (id menor que el último pero confirmadas después) se agregan
+#   al final, así que id.npy no queda ordenado. Las lápidas de cambio_borrado
+#   marcan "borrado".
+# - La marca es versiones.version_actual() tomada antes de leer, no la mayor
+#   versión exportada: las versiones se confirman en desorden y lo sellado
+#   después de la marca se vuelve a leer en la exportación siguiente.
+# - El manifiesto se escribe al final: si la exportación se corta, la
+#   siguiente descarta lo que quedó después de las filas confirmadas.
+# - abrir() mapea los archivos en memoria (sin copiar) y las consultas de
+#   abajo son operaciones vectorizadas sobre esos arreglos.
+
+import os
+import json
+import shutil
+import numpy as np
+from sqlalchemy import select, union_all
+from extensions import db
+from modelos import (
+    Abono, Prestamo, MovimientoCaja, CambioBorrado,
+    AbonoArchivo, PrestamoArchivo, MovimientoCajaArchivo,
+)
+from tiempo import hora_actual, local_date
+from versiones import version_actual
+
+# 📁 Carpeta de la copia columnar
+DIRECTORIO = os.getenv("ANALITICA_DIR", "analitica")
+
+# 📦 Filas leídas de la base por consulta
+LOTE = int(os.getenv("ANALITICA_LOTE", "50000"))
+
+MANIFIESTO = "manifiesto.json"
+
+# tipo de columna → dtype del .npy
+TIPOS = {
+    "entero": np.int32,
+    "real": np.float64,
+    "dinero": np.int64,          # centavos
+    "fecha": "datetime64[D]",
+    "instante": "datetime64[s]",
+    "texto": np.int32,           # código en el diccionario
+    "bool": np.bool_,
+}
+
+# tabla → (modelo vivo, tabla de archivo, {columna: tipo})
+TABLAS = {
+    "prestamo": (Prestamo, PrestamoArchivo, {
+        "cliente_id": "entero", "monto": "dinero", "interes": "real", "plazo": "entero",
+        "fecha": "fecha", "saldo": "dinero", "frecuencia": "texto", "archivado": "bool",
+    }),
+    "abono": (Abono, AbonoArchivo, {
+        "prestamo_id": "entero", "monto": "dinero", "fecha": "instante", "archivado": "bool",
+    }),
+    "movimiento_caja": (MovimientoCaja, MovimientoCajaArchivo, {
+        "tipo": "texto", "monto": "dinero", "descripcion": "texto", "fecha": "instante",
+        "prestamo_id": "entero", "archivado": "bool",
+    }),
+}
+
+
+# ---------------------------------------------------
+# 🔹 Conversión de valores de la base a arreglos
+# ---------------------------------------------------
+def _convertir(valores, tipo, diccionario=None):
+    if tipo == "dinero":
+        return np.round(np.array([v or 0.0 for v in valores], dtype=np.float64) * 100).astype(np.int64)
+    if tipo == "texto":
+        codigos = diccionario["codigos"]
+        for v in valores:
+            if v is not None and v not in codigos:
+                codigos[v] = len(diccionario["valores"])
+                diccionario["valores"].append(v)
+        return np.array([-1 if v is None else codigos[v] for v in valores], dtype=np.int32)
+    if tipo in ("fecha", "instante"):
+        return np.array([np.datetime64("NaT") if v is None else v for v in valores], dtype=TIPOS[tipo])
+    if tipo == "entero":
+        return np.array([-1 if v is None else v for v in valores], dtype=np.int32)
+    if tipo == "real":
+        return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+    return np.array([bool(v) for v in valores], dtype=np.bool_)
+
+
+# ---------------------------------------------------
+# 💾 .npy que crece al final (sin reescribir lo exportado)
+# ---------------------------------------------------
+def _escribir(ruta: str, desde: int, valores: np.ndarray):
+    """
+    Escribe `valores` a partir de la fila `desde` y deja el archivo con
+    desde + len(valores) filas (descarta lo que sobre de una exportación
+    cortada). Solo se reescribe la cabecera: numpy deja espacio para que la
+    dimensión crezca sin moverla.
+    """
+    if not os.path.exists(ruta):
+        if desde:
+            raise RuntimeError(f"Falta {ruta}: exporta de nuevo con --completo")
+        np.save(ruta, valores)
+        return
+    formato = np.lib.format
+    with open(ruta, "r+b") as f:
+        version = formato.read_magic(f)
+        leer, escribir = {
+            (1, 0): (formato.read_array_header_1_0, formato.write_array_header_1_0),
+            (2, 0): (formato.read_array_header_2_0, formato.write_array_header_2_0),
+        }[version]
+        _, _, dtype = leer(f)
+        inicio = f.tell()
+        f.seek(0)
+        escribir(f, {"descr": formato.dtype_to_descr(dtype), "fortran_order": False,
+                     "shape": (desde + len(valores),)})
+        if f.tell() == inicio:
+            f.seek(inicio + desde * dtype.itemsize)
+            f.write(np.ascontiguousarray(valores, dtype=dtype).tobytes())
+            f.truncate()
+            return
+    # La cabecera cambió de largo (no debería pasar): reescribir el archivo entero
+    anteriores = np.load(ruta)[:desde]
+    np.save(ruta, np.concatenate((anteriores, valores.astype(anteriores.dtype))))
+
+
+def _posiciones(ids: np.ndarray, buscados):
+    """Posición de cada id buscado en `ids` (en cualquier orden) y máscara de los que están."""
+    buscados = np.asarray(buscados, dtype=ids.dtype)
+    orden = np.argsort(ids, kind="stable")
+    posiciones = orden[np.minimum(np.searchsorted(ids[orden], buscados), len(ids) - 1)]
+    return posiciones, ids[posiciones] == buscados
+
+
+def _carpeta(directorio: str, tabla: str):
+    return os.path.join(directorio, tabla)
+
+
+def _leer_manifiesto(directorio: str):
+    ruta = os.path.join(directorio, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_json(ruta: str, datos):
+    """Escritura atómica (archivo temporal + os.replace)."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+# ---------------------------------------------------
+# 📤 Exportar
+# ---------------------------------------------------
+def _fuente(modelo, archivo, columnas, filtro):
+    """Filas vivas + archivadas que cumplen filtro(tabla), ordenadas por id."""
+    partes = [
+        select(t.c.id, t.c.version, *[t.c[c] for c in columnas]).where(filtro(t))
+        for t in (modelo.__table__, archivo)
+    ]
+    consulta = union_all(*partes).subquery()
+    return select(consulta).order_by(consulta.c.id)
+
+
+def _agregar(carpeta: str, columnas: dict, diccionarios: dict, filas: int, lote):
+    """Escribe las filas de `lote` a continuación de las `filas` ya exportadas."""
+    _escribir(os.path.join(carpeta, "id.npy"), filas, np.array([f.id for f in lote], dtype=np.int32))
+    _escribir(os.path.join(carpeta, "borrado.npy"), filas, np.zeros(len(lote), dtype=np.bool_))
+    for k, (c, tipo) in enumerate(columnas.items()):
+        _escribir(os.path.join(carpeta, f"{c}.npy"), filas,
+                  _convertir([f[k + 2] for f in lote], tipo, diccionarios.get(c)))
+    return filas + len(lote)
+
+
+def _exportar_tabla(directorio: str, nombre: str, estado: dict):
+    modelo, archivo, columnas = TABLAS[nombre]
+    carpeta = _carpeta(directorio, nombre)
+    os.makedirs(carpeta, exist_ok=True)
+    filas, ultimo_id, desde_version = estado.get("filas", 0), estado.get("ultimo_id", 0), estado.get("version", 0)
+    opciones = {"incluir_archivados": True}
+    # 🔖 Tomada antes de leer: lo que se confirme después queda sobre la marca
+    version = version_actual(modelo, CambioBorrado)
+
+    diccionarios = {}
+    for c, tipo in columnas.items():
+        if tipo == "texto":
+            ruta = os.path.join(carpeta, f"{c}.json")
+            valores = []
+            if filas and os.path.exists(ruta):
+                with open(ruta, encoding="utf-8") as f:
+                    valores = json.load(f)
+            diccionarios[c] = {"valores": valores, "codigos": {v: i for i, v in enumerate(valores)}}
+
+    # ✏️ Filas ya exportadas que cambiaron: se corrigen en su lugar
+    corregidas = tardias = 0
+    faltantes = []
+    if filas:
+        ids = np.load(os.path.join(carpeta, "id.npy"), mmap_mode="r")[:filas]
+        cambios = db.session.execute(
+            _fuente(modelo, archivo, columnas, lambda t: (t.c.id <= ultimo_id) & (t.c.version > desde_version))
+            .execution_options(**opciones)
+        ).all()
+        if cambios:
+            posiciones, estan = _posiciones(ids, [f.id for f in cambios])
+            faltantes = [f for f, esta in zip(cambios, estan) if not esta]
+            cambios = [f for f, esta in zip(cambios, estan) if esta]
+            if cambios:
+                for k, (c, tipo) in enumerate(columnas.items()):
+                    arreglo = np.load(os.path.join(carpeta, f"{c}.npy"), mmap_mode="r+")
+                    arreglo[posiciones[estan]] = _convertir([f[k + 2] for f in cambios], tipo, diccionarios.get(c))
+                    arreglo.flush()
+            corregidas = len(cambios)
+
+        # 🪦 Lápidas de filas borradas
+        lapidas = db.session.execute(
+            select(CambioBorrado.fila_id, CambioBorrado.version)
+            .where(CambioBorrado.tabla == nombre, CambioBorrado.version > desde_version,
+                   CambioBorrado.fila_id <= ultimo_id)
+        ).all()
+        if lapidas:
+            posiciones, estan = _posiciones(ids, [l.fila_id for l in lapidas])
+            borrado = np.load(os.path.join(carpeta, "borrado.npy"), mmap_mode="r+")
+            borrado[posiciones[estan]] = True
+            borrado.flush()
+
+    # ⏪ Filas con id ya pasado que se confirmaron después de la exportación anterior
+    if faltantes:
+        filas = _agregar(carpeta, columnas, diccionarios, filas, faltantes)
+        tardias = len(faltantes)
+
+    # ➕ Filas nuevas, por lotes de id creciente
+    nuevas = 0
+    while True:
+        lote = db.session.execute(
+            _fuente(modelo, archivo, columnas, lambda t: t.c.id > ultimo_id)
+            .limit(LOTE).execution_options(**opciones)
+        ).all()
+        if not lote:
+            break
+        filas = _agregar(carpeta, columnas, diccionarios, filas, lote)
+        nuevas += len(lote)
+        ultimo_id = lote[-1].id
+        if len(lote) < LOTE:
+            break
+
+    for c, diccionario in diccionarios.items():
+        _guardar_json(os.path.join(carpeta, f"{c}.json"), diccionario["valores"])
+
+    print(f"🧮 {nombre}: {nuevas} filas nuevas, {tardias} tardías, {corregidas} corregidas ({filas} en total)")
+    return {
+        "filas": filas,
+        "ultimo_id": int(ultimo_id),
+        "version": int(version),
+        "columnas": {"id": "entero", "borrado": "bool", **columnas},
+    }
+
+
+def exportar(directorio: str = DIRECTORIO, completo: bool = False):
+    """
+    Actualiza la copia columnar de `directorio` (o la rehace con completo=True).
+    Devuelve el manifiesto escrito.
+    """
+    if completo and os.path.isdir(directorio):
+        shutil.rmtree(directorio)
+    os.makedirs(directorio, exist_ok=True)
+    anterior = _leer_manifiesto(directorio).get("tablas", {})
+    manifiesto = {
+        "exportado": hora_actual().isoformat(timespec="seconds"),
+        "tablas": {nombre: _exportar_tabla(directorio, nombre, anterior.get(nombre, {})) for nombre in TABLAS},
+    }
+    _guardar_json(os.path.join(directorio, MANIFIESTO), manifiesto)
+    return manifiesto
+
+
+# ---------------------------------------------------
+# 📖 Leer (memoria mapeada, sin tocar la base)
+# ---------------------------------------------------
+class Tabla(dict):
+    """Columnas de una tabla exportada: {columna: arreglo mapeado}. texto() decodifica."""
+
+    def __init__(self, carpeta: str, estado: dict):
+        filas = estado["filas"]
+        super().__init__({
+            c: np.load(os.path.join(carpeta, f"{c}.npy"), mmap_mode="r")[:filas]
+            for c in estado["columnas"]
+        })
+        self.carpeta = carpeta
+        self.filas = filas
+
+    def diccionario(self, columna: str):
+        with open(os.path.join(self.carpeta, f"{columna}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def texto(self, columna: str):
+        """Valores de una columna de texto (None donde era NULL)."""
+        valores = np.array(self.diccionario(columna) + [None], dtype=object)
+        return valores[self[columna]]  # el código −1 cae en el None final
+
+    def vivas(self):
+        """Máscara de filas no borradas."""
+        return ~self["borrado"]
+
+
+def abrir(directorio: str = DIRECTORIO):
+    """{tabla: Tabla} de la última exportación confirmada en el manifiesto."""
+    manifiesto = _leer_manifiesto(directorio)
+    if not manifiesto:
+        raise FileNotFoundError(f"No hay exportación en {directorio}: ejecuta flask analitica-exportar")
+    return {
+        nombre: Tabla(_carpeta(directorio, nombre), estado)
+        for nombre, estado in manifiesto["tablas"].items()
+    }
+
+
+# ---------------------------------------------------
+# 📈 Consultas vectorizadas
+# ---------------------------------------------------
+def cobrado_por_mes(datos=None):
+    """{"YYYY-MM": pesos} de abonos no borrados."""
+    datos = datos or abrir()
+    abonos = datos["abono"]
+    vivas = abonos.vivas()
+    meses, inverso = np.unique(abonos["fecha"][vivas].astype("datetime64[M]"), return_inverse=True)
+    centavos = np.bincount(inverso, weights=abonos["monto"][vivas], minlength=len(meses))
+    return {str(m): round(float(c) / 100, 2) for m, c in zip(meses, centavos)}
+
+
+def recuperacion_por_frecuencia(horizontes=(7, 15, 30, 60, 90), datos=None, hoy=None):
+    """
+    Curva de recuperación: fracción del total a pagar (monto + interés)
+    abonada dentro de los primeros N días de cada préstamo, por frecuencia.
+    Solo cuenta préstamos con al menos N días de antigüedad.
+    Devuelve {frecuencia: {N: {"tasa", "prestamos"}}}.
+    """
+    datos = datos or abrir()
+    prestamos, abonos = datos["prestamo"], datos["abono"]
+    hoy = np.datetime64(hoy or local_date(), "D")
+    if not prestamos.filas:
+        return {}
+
+    # Cada abono → su préstamo y los días desde que se otorgó
+    vivas = abonos.vivas()
+    posiciones, conocidos = _posiciones(prestamos["id"], abonos["prestamo_id"][vivas])
+    posiciones = posiciones[conocidos]
+    montos = abonos["monto"][vivas][conocidos]
+    dias = (abonos["fecha"][vivas][conocidos].astype("datetime64[D]")
+            - prestamos["fecha"][posiciones]).astype(np.int64)
+
+    total = prestamos["monto"] * (1 + np.nan_to_num(prestamos["interes"]) / 100)
+    edad = (hoy - prestamos["fecha"]).astype(np.int64)
+    validos = prestamos.vivas() & ~np.isnat(prestamos["fecha"])
+    frecuencias = prestamos["frecuencia"]
+    nombres = prestamos.diccionario("frecuencia")
+
+    curvas = {}
+    for n in horizontes:
+        pagado = np.bincount(posiciones[dias <= n], weights=montos[dias <= n], minlength=prestamos.filas)
+        incluidos = validos & (edad >= n) & (frecuencias >= 0)
+        por_frecuencia_pagado = np.bincount(frecuencias[incluidos], weights=pagado[incluidos], minlength=len(nombres))
+        por_frecuencia_total = np.bincount(frecuencias[incluidos], weights=total[incluidos], minlength=len(nombres))
+        cantidad = np.bincount(frecuencias[incluidos], minlength=len(nombres))
+        for k, nombre in enumerate(nombres):
+            curvas.setdefault(nombre, {})[n] = {
+                "tasa": round(float(por_frecuencia_pagado[k] / por_frecuencia_total[k]), 4) if por_frecuencia_total[k] else None,
+                "prestamos": int(cantidad[k]),
+            }
+    return curvas
@@ -13,6 +13,8 @@ from extensions import db
 # ⏰ Importar módulo de tiempo centralizado
 # ---------------------------
 from tiempo import hora_actual, to_hora_chile as hora_chile  # ✅ hora real Chile
+from idempotencia import nueva_clave as clave_idempotencia
+from dinero import formato_dinero
 
 # ======================================================
 # 🚀 Inicialización de la app
@@ -27,6 +29,10 @@ app.secret_key = os.environ.get("APP_SECRET", "clave_secreta_local_cámbiala")
 app.jinja_env.globals.update(hora_actual=hora_actual)
 app.jinja_env.filters["hora_chile"] = hora_chile
 app.jinja_env.globals.update(hora_chile=hora_chile)
+# 💵 {{ monto|dinero }} → "1234.50" (centavos exactos, None → 0.00)
+app.jinja_env.filters["dinero"] = formato_dinero
+# 🔁 {{ clave_idempotencia() }} para el campo oculto idempotency_key de los formularios
+app.jinja_env.globals.update(clave_idempotencia=clave_idempotencia)
 
 # ======================================================
 # 🗄️ Configuración de base de datos (Neon PostgreSQL)
@@ -68,18 +74,48 @@ def login_required(f):
 from rutas import app_rutas
 app.register_blueprint(app_rutas)
 
+# 🔢 Versiones de cambio (registra el sellado en before_flush)
+import versiones  # noqa: E402,F401
+
+# 📦 Estáticos con huella, precomprimidos y gzip de HTML
+from activos import registrar_activos
+registrar_activos(app)
+
 # ======================================================
 # 📦 Inicializar extensiones
 # ======================================================
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# ======================================================
+# 🛠️ Comandos de mantenimiento (flask --app app ...)
+# ======================================================
+from comandos import COMANDOS
+for comando in COMANDOS:
+    app.cli.add_command(comando)
+
 # ======================================================
 # 🗃️ Crear tablas si no existen
 # ======================================================
 with app.app_context():
     db.create_all()
 
+    # 🧩 Particiones de los próximos meses (solo PostgreSQL)
+    from particiones import asegurar_particiones
+    try:
+        asegurar_particiones()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ No se pudieron asegurar las particiones: {e}")
+
+    # 📒 Diario de dinero: eventos de apertura si todavía está vacío
+    from diario import sembrar
+    try:
+        sembrar()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ No se pudo sembrar el diario de dinero: {e}")
+
 # ======================================================
 # ▶️ Punto de entrada
 # ======================================================
@@ -0,0 +1,140 @@
+# ======================================================
+# archivo.py — eliminación lógica de clientes y archivo de filas frías
+# ======================================================
+
+import os
+from datetime import timedelta
+from sqlalchemy import event, update, select, insert, delete, exists
+from sqlalchemy.orm import Session, with_loader_criteria
+from extensions import db
+from modelos import (
+    Cliente, Prestamo, Abono, MovimientoCaja,
+    PrestamoArchivo, AbonoArchivo, MovimientoCajaArchivo,
+)
+from versiones import sello
+from dinero import sumar
+from tiempo import hora_actual
+
+# 📋 Modelos que se ocultan de las consultas vivas cuando archivado = true
+MODELOS_ARCHIVABLES = (Prestamo, Abono, MovimientoCaja)
+
+# 🧊 Días que una fila archivada sigue en la tabla viva antes de moverse
+DIAS_ARCHIVO = int(os.getenv("ARCHIVO_DIAS", "30"))
+
+
+# ---------------------------------------------------
+# 🔍 Filtro global: las consultas ORM no ven filas archivadas
+# ---------------------------------------------------
+@event.listens_for(Session, "do_orm_execute")
+def _ocultar_archivados(estado):
+    """
+    Agrega "archivado = false" a todo SELECT del ORM (incluidas las relaciones
+    cargadas como Cliente.prestamos y Prestamo.abonos), que así usa los índices
+    parciales *_vivo_*. Para ver también lo archivado:
+    .execution_options(incluir_archivados=True)
+    """
+    if not estado.is_select or estado.execution_options.get("incluir_archivados", False):
+        return
+    estado.statement = estado.statement.options(*[
+        with_loader_criteria(m, m.archivado == db.false(), include_aliases=True)
+        for m in MODELOS_ARCHIVABLES
+    ])
+
+
+# ---------------------------------------------------
+# 🗄️ Archivar cliente (número fijo de sentencias)
+# ---------------------------------------------------
+def archivar_cliente(cliente: Cliente):
+    """
+    Marca como archivados los préstamos, abonos y movimientos del cliente con
+    un UPDATE por tabla, sin cargar filas en memoria ni borrarlas.
+    Devuelve el total prestado (para el reintegro). No hace commit.
+    """
+    prestamos_ids = select(Prestamo.id).where(Prestamo.cliente_id == cliente.id).scalar_subquery()
+
+    db.session.execute(
+        update(Abono)
+        .where(Abono.prestamo_id.in_(prestamos_ids), Abono.archivado == db.false())
+        .values(archivado=True, **sello())
+        .execution_options(synchronize_session=False)
+    )
+
+    montos = db.session.execute(
+        update(Prestamo)
+        .where(Prestamo.cliente_id == cliente.id, Prestamo.archivado == db.false())
+        .values(archivado=True, **sello())
+        .returning(Prestamo.monto)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    if cliente.nombre:
+        db.session.execute(
+            update(MovimientoCaja)
+            .where(
+                MovimientoCaja.descripcion.ilike(f"%{cliente.nombre}%"),
+                MovimientoCaja.archivado == db.false(),
+            )
+            .values(archivado=True, **sello())
+            .execution_options(synchronize_session=False)
+        )
+
+    cliente.cancelado = True
+    cliente.archivado = True
+    cliente.saldo = 0.0
+
+    # 🔄 Los préstamos cargados en la sesión ya no son vivos
+    db.session.expire(cliente, ["prestamos"])
+    return sumar(montos)
+
+
+# ---------------------------------------------------
+# 🧊 Mover filas frías a las tablas *_archivo (por lotes)
+# ---------------------------------------------------
+def _mover_lote(modelo, tabla_archivo, filtro, lote: int):
+    """Copia y borra un lote de filas; devuelve cuántas movió."""
+    tabla = modelo.__table__
+    ids = db.session.execute(
+        select(tabla.c.id).where(filtro).order_by(tabla.c.id).limit(lote)
+        .execution_options(incluir_archivados=True)
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    columnas = [c.name for c in tabla.columns]
+    db.session.execute(
+        insert(tabla_archivo).from_select(
+            columnas, select(*[tabla.c[c] for c in columnas]).where(tabla.c.id.in_(ids))
+        )
+    )
+    db.session.execute(delete(tabla).where(tabla.c.id.in_(ids)))
+    db.session.commit()  # ✅ transacción corta por lote
+    return len(ids)
+
+
+def mover_archivados(dias: int = DIAS_ARCHIVO, lote: int = 500):
+    """
+    Mueve a las tablas de archivo las filas archivadas hace más de `dias` días.
+    Orden: abonos → movimientos → préstamos (un préstamo se mueve cuando ya
+    no le quedan abonos en la tabla viva). Devuelve {tabla: filas movidas}.
+    """
+    limite = hora_actual() - timedelta(days=dias)
+    a, m, p = Abono.__table__, MovimientoCaja.__table__, Prestamo.__table__
+
+    pasos = [
+        (Abono, AbonoArchivo, (a.c.archivado == db.true()) & (a.c.actualizado < limite)),
+        (MovimientoCaja, MovimientoCajaArchivo, (m.c.archivado == db.true()) & (m.c.actualizado < limite)),
+        (Prestamo, PrestamoArchivo, (p.c.archivado == db.true()) & (p.c.actualizado < limite)
+         & ~exists().where(a.c.prestamo_id == p.c.id)),
+    ]
+
+    movidas = {}
+    for modelo, tabla_archivo, filtro in pasos:
+        total = 0
+        while True:
+            n = _mover_lote(modelo, tabla_archivo, filtro, lote)
+            total += n
+            if n < lote:
+                break
+        movidas[modelo.__tablename__] = total
+        print(f"🗄️ {modelo.__tablename__}: {total} filas movidas a {tabla_archivo.name}")
+    return movidas
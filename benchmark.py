@@ -0,0 +1,150 @@
+# ======================================================
+# benchmark.py — medición de latencia por abono y render del listado
+# ======================================================
+# Uso:
+#   DATABASE_URL=sqlite:///bench.db python benchmark.py [clientes] [abonos]
+# Si no se define DATABASE_URL se usa una base SQLite en memoria, nunca Neon.
+
+import os
+import sys
+import json
+import time
+import random
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from modelos import Cliente, Prestamo  # noqa: E402
+from pagos import registrar_abono, LATENCIA_OBJETIVO_MS  # noqa: E402
+from particiones import TABLAS_PARTICIONADAS, esta_particionada  # noqa: E402
+from tiempo import local_date, day_range  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+
+def _percentil(valores, p):
+    orden = sorted(valores)
+    idx = min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))
+    return orden[idx]
+
+
+def preparar_clientes(n: int):
+    """Crea n clientes de prueba con un préstamo diario cada uno."""
+    ids = []
+    for i in range(n):
+        cliente = Cliente(
+            codigo=f"BENCH{i:06d}",
+            nombre=f"Cliente bench {i}",
+            fecha_creacion=local_date(),
+            saldo=120000.0,
+        )
+        cliente.prestamos.append(Prestamo(
+            monto=100000.0, interes=20.0, plazo=30, fecha=local_date(),
+            saldo=120000.0, frecuencia="diario",
+        ))
+        db.session.add(cliente)
+        db.session.flush()
+        ids.append((cliente.id, cliente.prestamos[0].id))
+    db.session.commit()
+    return ids
+
+
+def medir_abonos(ids, n_abonos: int):
+    """Registra n_abonos y devuelve la latencia (ms) de cada uno, commit incluido."""
+    latencias = []
+    for _ in range(n_abonos):
+        cliente_id, prestamo_id = random.choice(ids)
+        inicio = time.perf_counter()
+        registrar_abono(cliente_id, prestamo_id, 1000.0)
+        db.session.commit()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def limpiar(ids):
+    """Elimina los datos de prueba."""
+    for cliente_id, _ in ids:
+        cliente = db.session.get(Cliente, cliente_id)
+        for p in list(cliente.prestamos):
+            db.session.delete(p)
+        db.session.delete(cliente)
+    db.session.commit()
+
+
+def medir_index(repeticiones: int = 5):
+    """
+    Tiempo (ms) de GET / con la caché de fragmentos fría y caliente.
+    Devuelve (fría, mediana caliente).
+    """
+    import cache_fragmentos
+
+    cliente_http = app.test_client()
+    with cliente_http.session_transaction() as sesion:
+        sesion["usuario"] = "benchmark"
+
+    cache_fragmentos.limpiar()
+    inicio = time.perf_counter()
+    cliente_http.get("/")
+    fria = (time.perf_counter() - inicio) * 1000
+
+    calientes = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cliente_http.get("/")
+        calientes.append((time.perf_counter() - inicio) * 1000)
+    return fria, _percentil(calientes, 50)
+
+
+def _relaciones(plan):
+    """Tablas/particiones que lee un plan EXPLAIN (FORMAT JSON)."""
+    nombres = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for hijo in plan.get("Plans", []):
+        nombres |= _relaciones(hijo)
+    return nombres
+
+
+def verificar_poda():
+    """
+    Comprueba que el filtro de un día lea una sola partición (PostgreSQL).
+    Devuelve {tabla: particiones leídas}, o None si la base no está particionada.
+    """
+    conexion = db.session.connection()
+    inicio, fin = day_range(local_date())
+    leidas = {}
+    for tabla in TABLAS_PARTICIONADAS:
+        if not esta_particionada(conexion, tabla):
+            return None
+        plan = conexion.execute(
+            text(f"EXPLAIN (FORMAT JSON) SELECT sum(monto) FROM {tabla} WHERE fecha >= :i AND fecha < :f"),
+            {"i": inicio, "f": fin},
+        ).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        leidas[tabla] = sorted(_relaciones(plan[0]["Plan"]))
+    return leidas
+
+
+if __name__ == "__main__":
+    n_clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_abonos = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with app.app_context():
+        ids = preparar_clientes(n_clientes)
+        try:
+            lat = medir_abonos(ids, n_abonos)
+            render_fria, render_caliente = medir_index()
+            poda = verificar_poda()
+        finally:
+            limpiar(ids)
+
+    p50, p95 = _percentil(lat, 50), _percentil(lat, 95)
+    estado = "✅" if p95 <= LATENCIA_OBJETIVO_MS else "❌"
+    print(f"💰 Abonos: {n_abonos} sobre {n_clientes} clientes")
+    print(f"⏱️ p50 = {p50:.2f} ms | p95 = {p95:.2f} ms | máx = {max(lat):.2f} ms")
+    print(f"{estado} Objetivo p95 ≤ {LATENCIA_OBJETIVO_MS:.0f} ms por abono")
+    print(f"🧩 Listado ({n_clientes} clientes): {render_fria:.1f} ms sin caché | {render_caliente:.1f} ms con caché de filas")
+
+    if poda is None:
+        print("🧩 Poda de particiones: no aplica (base sin particionar)")
+    for tabla, leidas in (poda or {}).items():
+        estado = "✅" if len(leidas) == 1 else "❌"
+        print(f"{estado} Poda {tabla}: un día lee {len(leidas)} partición(es) → {', '.join(leidas)}")
@@ -0,0 +1,123 @@
+# ======================================================
+# cache_fragmentos.py — caché de fragmentos HTML (filas de clientes y totales)
+# ======================================================
+# Cada fila del listado se guarda ya renderizada, con clave:
+#   (cliente.id, cliente.version, préstamos vivos, versión máx. de préstamo, hoy)
+# Cualquier abono, préstamo, edición u orden nuevo sella una versión nueva
+# (versiones.py), así que la clave cambia sola y nunca hay que invalidar.
+# "hoy" entra en la clave porque cuotas atrasadas y plazos dependen de la fecha.
+# La caché es por worker, acotada (LRU) y segura entre hilos (gthread).
+
+import os
+import threading
+from collections import OrderedDict
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy import func
+from extensions import db
+from modelos import Prestamo
+from helpers import calcular_estado_plazo
+
+# 📏 Fragmentos guardados por worker (filas + tarjetas)
+MAX_FRAGMENTOS = int(os.getenv("CACHE_FRAGMENTOS_MAX", "2000"))
+
+
+class CacheLRU:
+    """Diccionario acotado: al llenarse descarta el fragmento menos usado."""
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._candado:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._candado:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def estadisticas(self):
+        with self._candado:
+            return {"fragmentos": len(self._datos), "maximo": self.maximo,
+                    "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+_FRAGMENTOS = CacheLRU(MAX_FRAGMENTOS)
+
+
+# ---------------------------------------------------
+# 🔢 Versiones de préstamos por cliente (una sola consulta)
+# ---------------------------------------------------
+def versiones_prestamos(cliente_ids=None):
+    """{cliente_id: (préstamos vivos, versión máxima)} para armar las claves."""
+    consulta = db.session.query(
+        Prestamo.cliente_id, func.count(Prestamo.id), func.max(Prestamo.version)
+    )
+    if cliente_ids is not None:
+        consulta = consulta.filter(Prestamo.cliente_id.in_(cliente_ids))
+    return {
+        cliente_id: (cantidad, version or 0)
+        for cliente_id, cantidad, version in consulta.group_by(Prestamo.cliente_id).all()
+    }
+
+
+# ---------------------------------------------------
+# 🧩 Fragmentos
+# ---------------------------------------------------
+def fila_cliente(c, hoy, version_prestamos=None):
+    """
+    HTML de la fila del cliente (_fila_cliente.html), desde la caché si su
+    versión no cambió. Sin `version_prestamos` se consulta solo la de este cliente.
+    """
+    if version_prestamos is None:
+        version_prestamos = versiones_prestamos([c.id]).get(c.id, (0, 0))
+    clave = ("fila", c.id, c.version or 0, *version_prestamos, hoy)
+
+    html = _FRAGMENTOS.obtener(clave)
+    if html is None:
+        c.estado_plazo = calcular_estado_plazo(c, hoy)
+        html = Markup(render_template("_fila_cliente.html", c=c, hoy=hoy))
+        _FRAGMENTOS.guardar(clave, html)
+    return html
+
+
+def filas_clientes(clientes, hoy):
+    """Filas de todo el listado con una sola consulta de versiones de préstamos."""
+    versiones = versiones_prestamos()
+    return [fila_cliente(c, hoy, versiones.get(c.id, (0, 0))) for c in clientes]
+
+
+def tarjeta_totales(totales: dict):
+    """HTML de la tarjeta de totales del día (_totales_dia.html), por valor."""
+    clave = ("totales", *sorted(totales.items()))
+    html = _FRAGMENTOS.obtener(clave)
+    if html is None:
+        html = Markup(render_template("_totales_dia.html", totales=totales))
+        _FRAGMENTOS.guardar(clave, html)
+    return html
+
+
+def estadisticas():
+    return _FRAGMENTOS.estadisticas()
+
+
+def limpiar():
+    _FRAGMENTOS.limpiar()
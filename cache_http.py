@@ -0,0 +1,100 @@
+# ======================================================
+# cache_http.py — GET condicional (ETag / Last-Modified → 304)
+# ======================================================
+# La firma de una página se arma con (versión máx., cantidad, última
+# modificación) de las filas que lee, más las lápidas de sus tablas:
+# - un INSERT/UPDATE sella una versión nueva → cambia la versión máx.
+# - un DELETE o un archivado → cambia la cantidad (y deja lápida).
+# Si el navegador manda la misma firma, se responde 304 sin recalcular nada.
+# Los días pasados llevan además max-age: el navegador ni siquiera pregunta.
+
+import os
+import hashlib
+from datetime import date
+import pytz
+from flask import request, session, make_response, current_app
+from sqlalchemy import func
+from werkzeug.http import is_resource_modified
+from extensions import db
+from modelos import CambioBorrado
+from tiempo import CHILE_TZ, local_date
+
+# ⏱️ Segundos que el navegador reutiliza una página de un día pasado sin preguntar
+VIDA_DIAS_PASADOS = int(os.getenv("CACHE_HTTP_VIDA_PASADOS", "3600"))
+
+
+# ---------------------------------------------------
+# 🔏 Firma de las filas que lee una página
+# ---------------------------------------------------
+def resumen_filas(modelo, *filtros, consulta=None):
+    """
+    Consulta (versión máx., cantidad, actualizado máx.) de las filas de `modelo`
+    que cumplen los filtros. `consulta` permite partir de un join ya armado.
+    """
+    consulta = consulta if consulta is not None else db.session.query(modelo)
+    return consulta.with_entities(
+        func.max(modelo.version), func.count(modelo.id), func.max(modelo.actualizado)
+    ).filter(*filtros)
+
+
+def _a_utc(dt):
+    """actualizado se guarda en hora Chile sin tzinfo; Last-Modified va en UTC."""
+    return CHILE_TZ.localize(dt).astimezone(pytz.utc) if dt else None
+
+
+def validadores(partes, tablas_borradas=()):
+    """
+    (etag, last_modified) de una página a partir de sus consultas de resumen.
+    La URL completa (con ?parámetros) entra en el ETag.
+    """
+    valores, ultima = [request.full_path], None
+    for parte in partes:
+        version, cantidad, actualizado = parte.one()
+        valores.append((int(version or 0), int(cantidad or 0)))
+        if actualizado and (ultima is None or actualizado > ultima):
+            ultima = actualizado
+
+    if tablas_borradas:
+        version, fecha = (
+            db.session.query(func.max(CambioBorrado.version), func.max(CambioBorrado.fecha))
+            .filter(CambioBorrado.tabla.in_(tablas_borradas))
+            .one()
+        )
+        valores.append(int(version or 0))
+        if fecha and (ultima is None or fecha > ultima):
+            ultima = fecha
+
+    etag = hashlib.sha1(repr(valores).encode()).hexdigest()[:32]
+    return etag, _a_utc(ultima)
+
+
+# ---------------------------------------------------
+# 📨 Respuesta condicional
+# ---------------------------------------------------
+def vida_para(fecha: date):
+    """max-age para una página de `fecha`: días pasados sí, hoy (o futuro) no."""
+    return VIDA_DIAS_PASADOS if fecha and fecha < local_date() else 0
+
+
+def responder_condicional(partes, generar, vida: int = 0, tablas_borradas=()):
+    """
+    Devuelve 304 si la firma coincide con If-None-Match / If-Modified-Since;
+    si no, llama a generar() y agrega ETag, Last-Modified y Cache-Control.
+    """
+    # 💬 Con mensajes flash pendientes la página es de un solo uso: no se cachea
+    if session.get("_flashes"):
+        return generar()
+
+    etag, ultima = validadores(partes, tablas_borradas)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=ultima):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = make_response(generar())
+        if resp.status_code != 200:
+            return resp  # redirecciones y errores no se cachean
+
+    resp.set_etag(etag)
+    if ultima:
+        resp.last_modified = ultima
+    resp.headers["Cache-Control"] = f"private, max-age={vida}" if vida else "private, no-cache"
+    return resp
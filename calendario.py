@@ -0,0 +1,207 @@
+# ======================================================
+# calendario.py — días de cobro en Chile 🇨🇱 (domingos, feriados, vencimientos)
+# ======================================================
+# - Día de cobro = día hábil de numpy (busdaycalendar) con la semana de
+#   DIAS_SIN_COBRO y los feriados de Chile (fijos + Semana Santa + FERIADOS).
+# - Vencimientos: las cuotas diarias caen en días de cobro consecutivos; las
+#   semanales / quincenales / mensuales cada N días corridos desde el préstamo,
+#   corridas al siguiente día de cobro si caen en domingo o feriado.
+# - Todas las funciones de fechas aceptan un date o un arreglo (vectorizadas).
+# - Límites de día / semana / mes memorizados: la base guarda hora local de
+#   Chile sin tzinfo, así que el día es [00:00, 00:00 del día siguiente) en
+#   hora local, también los días de cambio de horario. rango_dia_utc() da los
+#   instantes reales (días de 23 o 25 horas).
+
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import numpy as np
+import pytz
+from tiempo import CHILE_TZ, local_date
+
+# 📅 Días de la semana sin cobro (0 = lunes … 6 = domingo)
+DIAS_SIN_COBRO = frozenset(
+    int(d) for d in os.getenv("DIAS_SIN_COBRO", "6").split(",") if d.strip()
+)
+
+# 🎉 Feriados adicionales (YYYY-MM-DD separados por coma): los móviles por
+# ley (San Pedro y San Pablo, 12 de octubre, Iglesias Evangélicas…) y los
+# decretados cada año
+FERIADOS = tuple(
+    date.fromisoformat(d.strip()) for d in os.getenv("FERIADOS", "").split(",") if d.strip()
+)
+
+# 🗓️ Feriados de fecha fija (mes, día)
+FERIADOS_FIJOS = (
+    (1, 1), (5, 1), (5, 21), (7, 16), (8, 15), (9, 18), (9, 19), (11, 1), (12, 8), (12, 25),
+)
+
+# 🔁 Días corridos entre cuotas por frecuencia
+DIAS_POR_PERIODO = {
+    "diario": 1,
+    "semanal": 7,
+    "quincenal": 15,
+    "mensual": 30,
+}
+
+# Años cubiertos por el calendario de numpy (alrededor de hoy)
+AÑOS_ATRAS, AÑOS_ADELANTE = 15, 10
+
+
+def _pascua(año: int):
+    """Domingo de Pascua (algoritmo anónimo gregoriano)."""
+    a, b, c = año % 19, año // 100, año % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    mes = (h + l - 7 * m + 90) // 25
+    return date(año, mes, (h + l - 7 * m + 33 * mes + 19) % 32)
+
+
+def feriados(año: int):
+    """Feriados conocidos de un año (fijos, Viernes y Sábado Santo, y FERIADOS)."""
+    pascua = _pascua(año)
+    dias = {date(año, m, d) for m, d in FERIADOS_FIJOS}
+    dias |= {pascua - timedelta(days=2), pascua - timedelta(days=1)}
+    dias |= {f for f in FERIADOS if f.year == año}
+    return sorted(dias)
+
+
+@lru_cache(maxsize=8)
+def _calendario(año_central: int):
+    semana = "".join("0" if d in DIAS_SIN_COBRO else "1" for d in range(7))
+    dias = [f for año in range(año_central - AÑOS_ATRAS, año_central + AÑOS_ADELANTE + 1)
+            for f in feriados(año)]
+    return np.busdaycalendar(weekmask=semana, holidays=np.array(dias, dtype="datetime64[D]"))
+
+
+def calendario():
+    """busdaycalendar de numpy con los días de cobro (se arma una vez por año)."""
+    return _calendario(local_date().year)
+
+
+# ---------------------------------------------------
+# 🔹 Conversión date ↔ datetime64
+# ---------------------------------------------------
+def _d64(fechas):
+    return np.asarray(fechas, dtype="datetime64[D]")
+
+
+def _a_date(valores):
+    """datetime64 → date (o arreglo de date si venía un arreglo)."""
+    if np.ndim(valores) == 0:
+        return np.datetime64(valores, "D").astype(date)
+    return np.asarray(valores, dtype="datetime64[D]").astype(date)
+
+
+def _hoy(hoy):
+    return _d64(local_date() if hoy is None else hoy)
+
+
+# ---------------------------------------------------
+# ✅ Días de cobro
+# ---------------------------------------------------
+def es_dia_cobro(fechas):
+    """True si se cobra ese día (no es DIAS_SIN_COBRO ni feriado)."""
+    return np.is_busday(_d64(fechas), busdaycal=calendario())
+
+
+def siguiente_dia_cobro(fechas):
+    """La misma fecha si es día de cobro, si no el siguiente día de cobro."""
+    return _a_date(np.busday_offset(_d64(fechas), 0, roll="forward", busdaycal=calendario()))
+
+
+def dias_cobro_entre(desde, hasta):
+    """Días de cobro en [desde, hasta) (negativo si hasta < desde)."""
+    return np.busday_count(_d64(desde), _d64(hasta), busdaycal=calendario())
+
+
+# ---------------------------------------------------
+# 📆 Cuotas y vencimientos
+# ---------------------------------------------------
+def _periodos(frecuencias):
+    return np.vectorize(lambda f: DIAS_POR_PERIODO.get((f or "diario").lower(), 1), otypes=[np.int64])(
+        np.asarray(frecuencias, dtype=object)
+    )
+
+
+def _vencimiento(inicios, periodos, n):
+    """Fecha de la cuota n (n ≥ 1) de cada préstamo, como datetime64[D]."""
+    cal = calendario()
+    # roll="backward": si el préstamo se dio en domingo, la cuota 1 es el lunes
+    diario = np.busday_offset(inicios, n, roll="backward", busdaycal=cal)
+    corrido = np.busday_offset(inicios + n * periodos, 0, roll="forward", busdaycal=cal)
+    return np.where(periodos == 1, diario, corrido)
+
+
+def cuotas_vencidas(inicios, frecuencias, hoy=None):
+    """
+    Cuotas cuyo vencimiento ya llegó (≤ hoy) desde la fecha de cada préstamo.
+    Diario: días de cobro en (inicio, hoy]; otras frecuencias: cada N días
+    corridos, movidos al siguiente día de cobro.
+    """
+    inicios, hoy = _d64(inicios), _hoy(hoy)
+    periodos = _periodos(frecuencias)
+    dias = (hoy - inicios).astype(np.int64)
+    n = np.maximum(dias // periodos, 0)
+    # El último candidato puede correrse más allá de hoy (domingo / feriado)
+    n = np.where((n > 0) & (_vencimiento(inicios, periodos, np.maximum(n, 1)) > hoy), n - 1, n)
+    diario = np.maximum(dias_cobro_entre(inicios + 1, hoy + 1), 0)
+    return np.where(periodos == 1, diario, n)
+
+
+def fecha_cuota(inicios, frecuencias, n):
+    """Fecha en que vence la cuota número n (n ≥ 1) de cada préstamo."""
+    return _a_date(_vencimiento(_d64(inicios), _periodos(frecuencias), np.asarray(n, dtype=np.int64)))
+
+
+def proximo_vencimiento(inicios, frecuencias, hoy=None):
+    """Fecha de la próxima cuota (≥ hoy) de cada préstamo."""
+    inicios, hoy = _d64(inicios), _hoy(hoy)
+    return fecha_cuota(inicios, frecuencias, cuotas_vencidas(inicios, frecuencias, hoy - 1) + 1)
+
+
+# ---------------------------------------------------
+# 🕛 Límites de día, semana y mes (memorizados)
+# ---------------------------------------------------
+@lru_cache(maxsize=4096)
+def rango_dia(fecha: date):
+    """(inicio, fin) del día en hora local sin tzinfo, como se guarda en la base."""
+    inicio = datetime.combine(fecha, time.min)
+    return inicio, inicio + timedelta(days=1)
+
+
+@lru_cache(maxsize=1024)
+def rango_semana(fecha: date):
+    """(lunes 00:00, lunes siguiente 00:00) de la semana de `fecha`."""
+    lunes = fecha - timedelta(days=fecha.weekday())
+    return rango_dia(lunes)[0], rango_dia(lunes + timedelta(days=7))[0]
+
+
+@lru_cache(maxsize=512)
+def rango_mes(fecha: date):
+    """(día 1 00:00, día 1 del mes siguiente 00:00) del mes de `fecha`."""
+    inicio = fecha.replace(day=1)
+    siguiente = (inicio + timedelta(days=32)).replace(day=1)
+    return rango_dia(inicio)[0], rango_dia(siguiente)[0]
+
+
+def _inicio_local(fecha: date):
+    """Primer instante del día en Santiago (el 00:00 no existe al adelantar la hora)."""
+    medianoche = datetime.combine(fecha, time.min)
+    try:
+        return CHILE_TZ.localize(medianoche, is_dst=None)
+    except pytz.NonExistentTimeError:
+        return CHILE_TZ.localize(medianoche + timedelta(hours=1), is_dst=True)
+    except pytz.AmbiguousTimeError:
+        return CHILE_TZ.localize(medianoche, is_dst=True)
+
+
+@lru_cache(maxsize=1024)
+def rango_dia_utc(fecha: date):
+    """(inicio, fin) del día local como instantes UTC con tzinfo (23, 24 o 25 h)."""
+    return (_inicio_local(fecha).astimezone(pytz.utc),
+            _inicio_local(fecha + timedelta(days=1)).astimezone(pytz.utc))
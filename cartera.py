@@ -0,0 +1,123 @@
+# ======================================================
+# cartera.py — foto diaria de la cartera (tabla cartera_diaria)
+# ======================================================
+# La cartera actual es Σ Prestamo.saldo, pero su historia no se puede leer
+# sin reproducir cada abono. Al cerrar el día (trabajo "cierre_diario" o
+# "flask cierre-diario") se guarda una fila con el estado de ese momento:
+# - cartera, clientes y préstamos activos
+# - morosos: clientes con cuotas vencidas (calendario.py) sin cubrir
+# - vencidos: préstamos con saldo después de su última cuota
+# - días de atraso promedio (desde la primera cuota impaga)
+# La fila de un día no se reescribe: la primera captura es la que vale.
+# Solo se captura ayer u hoy: los saldos son los de ahora, y guardarlos bajo
+# otra fecha dejaría una foto falsa que ya no se corrige.
+# serie() agrupa rangos largos en ≤ `puntos` filas para los gráficos.
+
+import math
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select, func
+from extensions import db
+from modelos import CarteraDiaria, Prestamo
+from helpers import insert_upsert
+from calendario import cuotas_vencidas, fecha_cuota
+from pronostico import cartera_activa
+from dinero import redondear
+from tiempo import local_date
+
+# 📊 Filas máximas que devuelve serie() por defecto
+PUNTOS = 300
+
+CAMPOS = ("cartera", "clientes_activos", "prestamos_activos", "morosos",
+          "monto_atrasado", "vencidos", "dias_atraso_promedio")
+
+
+# ---------------------------------------------------
+# 🧮 Medir (arreglos NumPy, sin bucles por préstamo)
+# ---------------------------------------------------
+def medir(hoy: date = None):
+    """Indicadores de la cartera vista al final de `hoy` (dict con CAMPOS)."""
+    hoy = hoy or local_date()
+    cartera = float(db.session.execute(
+        select(func.coalesce(func.sum(Prestamo.saldo), 0.0))
+    ).scalar() or 0.0)
+    c = cartera_activa()
+    if not len(c["id"]):
+        return dict.fromkeys(CAMPOS, 0) | {"cartera": cartera}
+
+    dia = np.datetime64(hoy, "D")
+    vencidas = np.minimum(cuotas_vencidas(c["fecha"], c["frecuencia"], dia), c["cuotas"])
+    pagado = np.maximum(c["total"] - c["saldo"], 0.0)
+    atraso = np.maximum(vencidas * c["cuota"] - pagado, 0.0)
+    moroso = atraso >= 0.005
+
+    # 📅 Primera cuota impaga: la siguiente a las que cubre lo pagado
+    cubiertas = np.floor(np.divide(pagado, c["cuota"], out=np.zeros_like(pagado), where=c["cuota"] > 0) + 1e-9)
+    primera = np.minimum(cubiertas.astype(np.int64) + 1, c["cuotas"])
+    dias_atraso = (dia - np.asarray(fecha_cuota(c["fecha"], c["frecuencia"], primera), dtype="datetime64[D]")).astype(np.int64)
+    ultima = np.asarray(fecha_cuota(c["fecha"], c["frecuencia"], c["cuotas"]), dtype="datetime64[D]")
+
+    return {
+        "cartera": cartera,
+        "clientes_activos": int(np.unique(c["cliente_id"]).size),
+        "prestamos_activos": int(c["id"].size),
+        "morosos": int(np.unique(c["cliente_id"][moroso]).size),
+        "monto_atrasado": redondear(atraso.sum()),
+        "vencidos": int((ultima < dia).sum()),
+        "dias_atraso_promedio": round(float(dias_atraso[moroso].mean()), 1) if moroso.any() else 0.0,
+    }
+
+
+def capturar(fecha: date = None):
+    """
+    Guarda la foto de `fecha` (por defecto ayer, el día recién cerrado) si no
+    existe. Devuelve True si se creó. No hace commit.
+    ValueError si `fecha` no es ayer ni hoy.
+    """
+    hoy = local_date()
+    ayer = hoy - timedelta(days=1)
+    fecha = fecha or ayer
+    if not ayer <= fecha <= hoy:
+        raise ValueError("Solo se puede capturar la cartera de ayer o de hoy (los saldos son los actuales).")
+    creada = db.session.execute(
+        insert_upsert(CarteraDiaria)
+        .values(fecha=fecha, **medir(fecha))
+        .on_conflict_do_nothing(index_elements=["fecha"])
+        .returning(CarteraDiaria.id)
+    ).first()
+    return creada is not None
+
+
+# ---------------------------------------------------
+# 📈 Serie para gráficos
+# ---------------------------------------------------
+def _a_dict(fila):
+    return {"fecha": fila.fecha.isoformat(), **{c: getattr(fila, c) for c in CAMPOS}}
+
+
+def serie(desde: date = None, hasta: date = None, puntos: int = PUNTOS):
+    """
+    Fotos de [desde, hasta]. Si hay más de `puntos`, se agrupan en tramos
+    consecutivos: de cada tramo queda la última foto (los indicadores son
+    saldos, no flujos) con el atraso promedio del tramo. Devuelve (filas, paso).
+    """
+    consulta = select(CarteraDiaria).order_by(CarteraDiaria.fecha)
+    if desde:
+        consulta = consulta.where(CarteraDiaria.fecha >= desde)
+    if hasta:
+        consulta = consulta.where(CarteraDiaria.fecha <= hasta)
+    filas = db.session.execute(consulta).scalars().all()
+
+    puntos = max(1, puntos)
+    paso = max(1, math.ceil(len(filas) / puntos))
+    if paso == 1:
+        return [_a_dict(f) for f in filas], paso
+
+    reducidas = []
+    for i in range(0, len(filas), paso):
+        tramo = filas[i:i + paso]
+        punto = _a_dict(tramo[-1])
+        punto["desde"] = tramo[0].fecha.isoformat()
+        punto["dias_atraso_promedio"] = round(sum(f.dias_atraso_promedio for f in tramo) / len(tramo), 1)
+        reducidas.append(punto)
+    return reducidas, paso
@@ -0,0 +1,132 @@
+# ======================================================
+# cierre.py — cierre diario de liquidaciones (hora Chile 🇨🇱)
+# ======================================================
+# Programar "flask cierre-diario" a las 00:05 America/Santiago (cron de la
+# plataforma). Cierra todos los días anteriores a hoy que sigan abiertos.
+
+import os
+import json
+import hashlib
+from datetime import date, timedelta
+from extensions import db
+from modelos import Liquidacion, LiquidacionFranja
+from helpers import (
+    asegurar_fila_liquidacion, liquidacion_consolidada, limpiar_franjas, desplazar_caja,
+)
+from cache_fragmentos import CacheLRU
+from tiempo import hora_actual, local_date
+
+# 📋 Campos que congela el cierre (y entran en el checksum)
+CAMPOS_CIERRE = ("caja_manual", "entradas", "entradas_caja", "prestamos_hoy", "salidas", "gastos", "caja")
+
+# 🧊 Días cerrados ya serializados (inmutables → sin expiración; acotada por worker)
+_CACHE_CERRADAS = CacheLRU(int(os.getenv("CACHE_CERRADAS_MAX", "400")))
+
+
+def calcular_checksum(liq: Liquidacion):
+    """SHA-256 de la fecha y los montos (redondeados a centavos) del día."""
+    datos = {"fecha": liq.fecha.isoformat(), **{c: round(float(getattr(liq, c) or 0.0), 2) for c in CAMPOS_CIERRE}}
+    return hashlib.sha256(json.dumps(datos, sort_keys=True).encode()).hexdigest()
+
+
+def checksum_valido(liq: Liquidacion):
+    """True si la fila cerrada no fue modificada después del cierre."""
+    return bool(liq.cerrada and liq.checksum == calcular_checksum(liq))
+
+
+def cerrar_dia(fecha: date):
+    """
+    Congela la liquidación de un día pasado:
+    1. Bloquea la fila (los abonos tardíos de ese día esperan o pasan a hoy).
+    2. Suma las franjas pendientes a la fila y las elimina (sin recalcular fuentes).
+    3. Marca cerrada, guarda checksum y hora de cierre.
+    4. Crea la fila del día siguiente; si su caja inicial no coincide, la
+       diferencia se arrastra a todos los días abiertos siguientes (desplazar_caja).
+    Devuelve la fila cerrada.
+    """
+    if fecha >= local_date():
+        raise ValueError("Solo se pueden cerrar días anteriores a hoy.")
+
+    asegurar_fila_liquidacion(fecha)
+    liq = Liquidacion.query.filter_by(fecha=fecha).with_for_update().first()
+    if liq.cerrada:
+        db.session.rollback()
+        return liq
+
+    LiquidacionFranja.query.filter_by(fecha=fecha).with_for_update().all()
+    consolidada = liquidacion_consolidada(liq)
+    for campo in CAMPOS_CIERRE:
+        setattr(liq, campo, round(float(getattr(consolidada, campo) or 0.0), 2))
+    limpiar_franjas(fecha)
+
+    liq.cerrada = True
+    liq.cerrada_en = hora_actual()
+    liq.checksum = calcular_checksum(liq)
+
+    # ➡️ Día siguiente: parte con la caja final del día cerrado
+    siguiente = fecha + timedelta(days=1)
+    asegurar_fila_liquidacion(siguiente)
+    prox = Liquidacion.query.filter_by(fecha=siguiente).with_for_update().first()
+    if prox and not prox.cerrada:
+        diferencia = (liq.caja or 0.0) - (prox.caja_manual or 0.0)
+        if abs(diferencia) >= 0.005:
+            # Mismo camino que acumular_liquidacion: corrige siguiente y los días después
+            desplazar_caja(fecha, round(diferencia, 2))
+
+    db.session.commit()
+    print(f"🔒 Liquidación del {fecha} cerrada (caja final {liq.caja:.2f})")
+    return liq
+
+
+def cerrar_pendientes(hasta: date = None):
+    """
+    Cierra, en orden, todos los días abiertos anteriores a `hasta` (por defecto hoy),
+    incluido ayer aunque no haya tenido movimientos. Devuelve las fechas cerradas.
+    """
+    hasta = hasta or local_date()
+    ayer = hasta - timedelta(days=1)
+    fechas = {
+        f for (f,) in db.session.query(Liquidacion.fecha)
+        .filter(Liquidacion.fecha < hasta, Liquidacion.cerrada == db.false())
+        .all()
+    }
+    fechas.add(ayer)
+    cerradas = []
+    for fecha in sorted(fechas):
+        cerrar_dia(fecha)
+        cerradas.append(fecha)
+    return cerradas
+
+
+# ---------------------------------------------------
+# 📤 Lectura de días (caché inmutable para días cerrados)
+# ---------------------------------------------------
+def liquidacion_a_dict(liq: Liquidacion):
+    return {
+        "fecha": liq.fecha.isoformat(),
+        **{c: round(float(getattr(liq, c) or 0.0), 2) for c in CAMPOS_CIERRE},
+        "cerrada": bool(liq.cerrada),
+        "checksum": liq.checksum,
+        "cerrada_en": liq.cerrada_en.isoformat() if liq.cerrada_en else None,
+    }
+
+
+def liquidacion_del_dia(fecha: date):
+    """
+    Devuelve (datos, cerrada). Un día cerrado se lee una vez y queda en memoria;
+    un día abierto se consolida (fila + franjas) en cada llamada.
+    """
+    datos = _CACHE_CERRADAS.obtener(fecha)
+    if datos is not None:
+        return datos, True
+
+    liq = Liquidacion.query.filter_by(fecha=fecha).first()
+    if liq is None:
+        return None, False
+    if liq.cerrada:
+        datos = liquidacion_a_dict(liq)
+        _CACHE_CERRADAS.guardar(fecha, datos)
+        return datos, True
+
+    datos = liquidacion_a_dict(liquidacion_consolidada(liq))
+    return datos, False
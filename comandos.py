@@ -0,0 +1,273 @@
+# ======================================================
+# comandos.py — comandos de mantenimiento (flask --app app <comando>)
+# ======================================================
+
+import click
+from flask.cli import with_appcontext
+
+
+# ---------------------------------------------------
+# 🔁 Idempotencia
+# ---------------------------------------------------
+@click.command("purgar-idempotencia")
+@with_appcontext
+def purgar_idempotencia():
+    """Borra las respuestas idempotentes vencidas."""
+    from idempotencia import purgar_respuestas_vencidas
+    borradas = purgar_respuestas_vencidas()
+    click.echo(f"🧹 Respuestas vencidas eliminadas: {borradas}")
+
+
+# ---------------------------------------------------
+# 🗄️ Archivo de filas frías
+# ---------------------------------------------------
+@click.command("archivar")
+@click.option("--dias", type=int, default=None, help="Antigüedad mínima (por defecto ARCHIVO_DIAS).")
+@click.option("--lote", type=int, default=500, show_default=True, help="Filas por transacción.")
+@with_appcontext
+def archivar(dias, lote):
+    """Mueve préstamos, abonos y movimientos archivados a las tablas *_archivo."""
+    from archivo import mover_archivados, DIAS_ARCHIVO
+    movidas = mover_archivados(DIAS_ARCHIVO if dias is None else dias, lote)
+    click.echo(f"✅ Filas movidas: {sum(movidas.values())}")
+
+
+# ---------------------------------------------------
+# 🧩 Particiones mensuales (PostgreSQL)
+# ---------------------------------------------------
+@click.command("particiones")
+@click.option("--meses", type=int, default=None, help="Meses adelante (por defecto PARTICIONES_MESES_ADELANTE).")
+@with_appcontext
+def particiones(meses):
+    """Crea las particiones mensuales que falten en abono y movimiento_caja."""
+    from particiones import asegurar_particiones, MESES_ADELANTE
+    creadas = asegurar_particiones(MESES_ADELANTE if meses is None else meses)
+    click.echo(f"✅ Particiones creadas: {len(creadas)}")
+
+
+# ---------------------------------------------------
+# 📆 Resúmenes semanales / mensuales
+# ---------------------------------------------------
+@click.command("reconstruir-periodos")
+@with_appcontext
+def reconstruir_periodos():
+    """Recalcula liquidacion_semanal y liquidacion_mensual desde las filas diarias."""
+    from periodos import reconstruir_periodos as reconstruir
+    dias = reconstruir()
+    click.echo(f"✅ Resúmenes recalculados a partir de {dias} días")
+
+
+# ---------------------------------------------------
+# 🔒 Cierre diario (programar a las 00:05 hora Chile)
+# ---------------------------------------------------
+@click.command("cierre-diario")
+@click.option("--fecha", default=None, help="Cerrar solo este día (YYYY-MM-DD).")
+@with_appcontext
+def cierre_diario(fecha):
+    """Cierra las liquidaciones de los días anteriores a hoy que sigan abiertas."""
+    from datetime import datetime
+    from cierre import cerrar_dia, cerrar_pendientes
+    if fecha:
+        liq = cerrar_dia(datetime.strptime(fecha, "%Y-%m-%d").date())
+        click.echo(f"🔒 {liq.fecha} cerrada · checksum {liq.checksum[:12]}…")
+        return
+    cerradas = cerrar_pendientes()
+    click.echo(f"✅ Días cerrados: {len(cerradas)}")
+    _capturar_cartera(None)
+
+
+@click.command("cartera-capturar")
+@click.option("--fecha", default=None, help="Día de la foto: ayer u hoy (YYYY-MM-DD, por defecto ayer).")
+@with_appcontext
+def cartera_capturar(fecha):
+    """Guarda la foto diaria de la cartera (no reescribe un día ya capturado)."""
+    from datetime import datetime
+    _capturar_cartera(datetime.strptime(fecha, "%Y-%m-%d").date() if fecha else None)
+
+
+def _capturar_cartera(fecha):
+    from extensions import db
+    from cartera import capturar
+    try:
+        creada = capturar(fecha)
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        raise SystemExit(1)
+    db.session.commit()
+    click.echo("📈 Foto de cartera guardada" if creada else "📈 La foto de cartera de ese día ya existía")
+
+
+
+# ---------------------------------------------------
+# 📦 Estáticos (huellas + .gz / .br)
+# ---------------------------------------------------
+@click.command("activos")
+@click.option("--forzar", is_flag=True, help="Regenerar también los comprimidos vigentes.")
+@with_appcontext
+def activos(forzar):
+    """Precomprime los estáticos y muestra el manifiesto de huellas."""
+    from flask import current_app
+    from activos import construir_manifiesto, precomprimir
+    escritos = precomprimir(current_app.static_folder, forzar)
+    for original, con_huella in sorted(construir_manifiesto(current_app.static_folder).items()):
+        click.echo(f"  {original} → {con_huella}")
+    click.echo(f"✅ Comprimidos escritos: {len(escritos)}")
+
+
+# ---------------------------------------------------
+# 📒 Diario de dinero (reproducir proyecciones)
+# ---------------------------------------------------
+@click.command("diario-sembrar")
+@with_appcontext
+def diario_sembrar():
+    """Abre el diario con el estado actual (solo si está vacío)."""
+    from diario import sembrar
+    escritos = sembrar()
+    click.echo(f"🌱 Eventos de apertura escritos: {escritos}" if escritos else "ℹ️ Nada que sembrar (el diario ya tenía eventos o la base está vacía).")
+
+
+@click.command("diario-reproducir")
+@click.option("--desde", type=int, default=None, help="Secuencia inicial (por defecto todo el diario).")
+@click.option("--aplicar", is_flag=True, help="Corregir las tablas (sin esto solo se informa).")
+@click.option("--mostrar", type=int, default=20, show_default=True, help="Diferencias a listar por tipo.")
+@with_appcontext
+def diario_reproducir(desde, aplicar, mostrar):
+    """Reconstruye saldos, cartera y liquidaciones desde el diario de dinero."""
+    from diario import reproducir
+    informe = reproducir(desde, aplicar)
+    click.echo(f"📒 Secuencias {informe['desde'] or 0} → {informe['hasta']}")
+    for pid, guardado, proyectado in informe["prestamos"][:mostrar]:
+        click.echo(f"  préstamo {pid}: {guardado:.2f} → {proyectado:.2f}")
+    for cid, guardado, proyectado in informe["clientes"][:mostrar]:
+        click.echo(f"  cliente {cid}: {guardado:.2f} → {proyectado:.2f}")
+    for dia, campo, guardado, proyectado, cerrada in informe["dias"][:mostrar]:
+        click.echo(f"  {dia} {campo}: {guardado:.2f} → {proyectado:.2f}{' 🔒 cerrado' if cerrada else ''}")
+    click.echo(
+        f"{'✅ Aplicado' if aplicar else '🔎 Simulación'}: "
+        f"{len(informe['prestamos'])} préstamos, {len(informe['clientes'])} clientes, "
+        f"{len(informe['dias'])} diferencias de liquidación · cartera {informe['cartera']:.2f}"
+    )
+
+
+# ---------------------------------------------------
+# 🔗 Conciliación de movimientos de préstamo
+# ---------------------------------------------------
+@click.command("conciliar-prestamos")
+@click.option("--aplicar", is_flag=True, help="Insertar/borrar las diferencias (sin esto solo se informa).")
+@with_appcontext
+def conciliar_prestamos(aplicar):
+    """Compara préstamos y movimientos "prestamo" y corrige solo lo distinto."""
+    from conciliacion import conciliar_prestamos as conciliar
+    informe = conciliar(aplicar)
+    for pid, monto, fecha in informe["faltantes"]:
+        click.echo(f"  ➕ préstamo {pid}: {monto:.2f} el {fecha}")
+    for mid, monto, fecha, pid in informe["sobrantes"]:
+        click.echo(f"  🗑️ movimiento {mid}: {monto:.2f} el {fecha} (préstamo {pid or '—'})")
+    for dia, diferencia in informe["dias"].items():
+        click.echo(f"  📅 {dia}: {diferencia:+.2f}")
+    click.echo(
+        f"{'✅ Aplicado' if aplicar else '🔎 Simulación'}: {len(informe['faltantes'])} faltantes, "
+        f"{len(informe['sobrantes'])} sobrantes, {informe['vinculados']} vinculados"
+    )
+
+
+# ---------------------------------------------------
+# 🩺 Integridad de la cartera (tras cada deploy y cada noche)
+# ---------------------------------------------------
+@click.command("integridad")
+@click.option("--sql", "archivo_sql", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Escribir el script de corrección por lotes en este archivo.")
+@click.option("--estricto", is_flag=True, help="Salir con código 1 si hay errores (para el deploy).")
+@with_appcontext
+def integridad(archivo_sql, estricto):
+    """Revisa saldos, banderas y liquidaciones en una pasada y lista las violaciones."""
+    from integridad import revisar, resumen, guion_sql
+    violaciones = []
+    for v in revisar():
+        violaciones.append(v)
+        extra = f" {v['actual']} ≠ {v['esperado']}" if v["esperado"] is not None else ""
+        campo = f" [{v['campo']}]" if v.get("campo") else ""
+        click.echo(f"  {'❌' if v['severidad'] == 'error' else '⚠️'} {v['regla']} {v['tabla']} {v['id']}{campo}{extra}")
+    if archivo_sql:
+        with open(archivo_sql, "w", encoding="utf-8") as f:
+            for linea in guion_sql(violaciones):
+                f.write(linea + "\n")
+        click.echo(f"🛠️ Script de corrección en {archivo_sql}")
+    errores = sum(1 for v in violaciones if v["severidad"] == "error")
+    if not violaciones:
+        click.echo("✅ Sin violaciones")
+    else:
+        detalle = ", ".join(f"{r} {n}" for r, n in sorted(resumen(violaciones).items()))
+        click.echo(f"🩺 {errores} errores, {len(violaciones) - errores} avisos · {detalle}")
+    if estricto and errores:
+        raise SystemExit(1)
+
+
+# ---------------------------------------------------
+# 🧮 Copia columnar para análisis (analitica.py)
+# ---------------------------------------------------
+@click.command("analitica-exportar")
+@click.option("--directorio", default=None, help="Carpeta de salida (por defecto ANALITICA_DIR).")
+@click.option("--completo", is_flag=True, help="Rehacer la copia desde cero.")
+@click.option("--ahora", is_flag=True, help="Exportar en este proceso en vez de encolar el trabajo.")
+@with_appcontext
+def analitica_exportar(directorio, completo, ahora):
+    """Exporta abonos, préstamos y caja a arreglos .npy (incremental desde el último id)."""
+    if not ahora:
+        from extensions import db
+        from trabajos import encolar
+        datos = {"directorio": directorio, "completo": completo}
+        nuevo = encolar("analitica_exportar", directorio or "", datos)
+        db.session.commit()
+        click.echo("⏳ Exportación encolada para el worker." if nuevo
+                   else "⏳ Ya había una exportación pendiente en la cola.")
+        return
+    from analitica import exportar, DIRECTORIO
+    manifiesto = exportar(directorio or DIRECTORIO, completo)
+    for nombre, estado in manifiesto["tablas"].items():
+        click.echo(f"  {nombre}: {estado['filas']} filas · último id {estado['ultimo_id']}")
+
+
+# ---------------------------------------------------
+# ⚙️ Cola de trabajos (Procfile: worker)
+# ---------------------------------------------------
+@click.command("trabajos")
+@click.option("--una-vez", is_flag=True, help="Vaciar la cola y salir.")
+@click.option("--intervalo", type=float, default=None, help="Segundos de espera con la cola vacía.")
+@with_appcontext
+def trabajos(una_vez, intervalo):
+    """Worker: ejecuta los trabajos encolados (recálculos, cierre, archivo, purga)."""
+    from trabajos import trabajar, INTERVALO_SEG
+    trabajar(INTERVALO_SEG if intervalo is None else intervalo, una_vez)
+
+
+@click.command("trabajos-estado")
+@with_appcontext
+def trabajos_estado():
+    """Muestra la profundidad de la cola y los últimos fallos."""
+    from trabajos import estado_cola
+    estado = estado_cola()
+    click.echo(f"⏳ Pendientes: {estado['pendientes']} · en curso: {estado['en_curso']} · "
+               f"fallidos: {estado['fallidos']} · espera máx.: {estado['espera_max_seg']} s")
+    for tipo, conteos in sorted(estado["por_tipo"].items()):
+        click.echo(f"  {tipo}: " + ", ".join(f"{e} {n}" for e, n in sorted(conteos.items())))
+    for fallo in estado["ultimos_fallos"]:
+        click.echo(f"  ❌ #{fallo['id']} {fallo['tipo']}[{fallo['clave']}]: {fallo['error']}")
+
+
+COMANDOS = [
+    purgar_idempotencia,
+    archivar,
+    particiones,
+    reconstruir_periodos,
+    cierre_diario,
+    cartera_capturar,
+    activos,
+    diario_sembrar,
+    diario_reproducir,
+    conciliar_prestamos,
+    integridad,
+    analitica_exportar,
+    trabajos,
+    trabajos_estado,
+]
@@ -0,0 +1,200 @@
+# ======================================================
+# conciliacion.py — movimientos de préstamo por diferencias (SQL de conjuntos)
+# ======================================================
+# Regla (la misma de reconstruir_movimientos_prestamos): cada préstamo vivo de
+# un cliente no cancelado tiene exactamente un MovimientoCaja tipo "prestamo"
+# con su monto y su fecha. Los préstamos entregados con "Otorgar préstamo"
+# ya tienen su salida vinculada (prestamo_id, mismo monto y día) y no llevan
+# otro; un ajuste de reactivación vinculado al préstamo no cuenta como entrega.
+# En vez de borrar y regenerar la tabla completa:
+# 1. Vincula movimientos viejos sin prestamo_id a su préstamo (monto, día, nombre).
+# 2. Faltantes = esperados sin movimiento (anti-join préstamo → movimiento).
+# 3. Sobrantes = movimientos sin préstamo esperado o duplicados (anti-join inverso).
+# 4. Inserta / borra solo esas filas y ajusta solo los días afectados.
+
+from collections import defaultdict
+from datetime import datetime, time
+from sqlalchemy import select, insert, update, delete, func, or_, and_, literal
+from extensions import db
+from modelos import MovimientoCaja, Prestamo, Cliente
+from versiones import sello, anotar_borrados
+
+TIPO = "prestamo"
+
+def _dia(columna):
+    """Día (fecha sin hora) de un DateTime, igual en PostgreSQL y SQLite."""
+    return func.date(columna)
+
+
+def _mismo_monto(a, b):
+    return a == b  # centavos exactos (dinero.py)
+
+
+def _es_salida_de_entrega(m, prestamo):
+    """
+    `m` es la salida con que se entregó `prestamo` (Otorgar préstamo, o el
+    préstamo creado al reactivar): mismo monto y mismo día. Un ajuste de
+    reactivación sobre un préstamo existente también lleva su prestamo_id,
+    pero no es su entrega.
+    """
+    return and_(
+        m.c.prestamo_id == prestamo.c.id, m.c.tipo == "salida", m.c.archivado == db.false(),
+        _mismo_monto(m.c.monto, prestamo.c.monto), _dia(m.c.fecha) == prestamo.c.fecha,
+    )
+
+
+def _con_salida(prestamo):
+    """El préstamo ya tiene su salida de entrega vinculada (no lleva movimiento "prestamo")."""
+    m = MovimientoCaja.__table__.alias("m_salida")
+    return select(literal(1)).where(_es_salida_de_entrega(m, prestamo)).exists()
+
+
+# ---------------------------------------------------
+# 🔗 1. Vincular movimientos antiguos
+# ---------------------------------------------------
+def _vincular_antiguos():
+    """Asigna prestamo_id a los movimientos "prestamo" creados antes de la columna."""
+    mc, p, c = MovimientoCaja.__table__, Prestamo.__table__, Cliente.__table__
+    m2 = mc.alias("m_vinculado")
+    candidato = (
+        select(func.min(p.c.id))
+        .select_from(p.join(c, c.c.id == p.c.cliente_id))
+        .where(
+            p.c.archivado == db.false(),
+            _mismo_monto(p.c.monto, mc.c.monto),
+            p.c.fecha == _dia(mc.c.fecha),
+            mc.c.descripcion.like("%" + c.c.nombre + "%"),
+            ~select(literal(1)).where(
+                m2.c.prestamo_id == p.c.id, m2.c.tipo == TIPO, m2.c.archivado == db.false(),
+            ).exists(),
+            ~_con_salida(p),
+        )
+        .scalar_subquery()
+    )
+    return db.session.execute(
+        update(mc)
+        .where(mc.c.tipo == TIPO, mc.c.prestamo_id.is_(None), mc.c.archivado == db.false(),
+               candidato.isnot(None))
+        .values(prestamo_id=candidato, **sello())
+    ).rowcount
+
+
+# ---------------------------------------------------
+# 🔍 2-3. Diferencias en ambos sentidos
+# ---------------------------------------------------
+def faltantes():
+    """Préstamos esperados sin su movimiento: (id, monto, fecha, nombre)."""
+    mc, p, c = MovimientoCaja.__table__, Prestamo.__table__, Cliente.__table__
+    tiene_movimiento = select(literal(1)).where(
+        mc.c.prestamo_id == p.c.id, mc.c.tipo == TIPO, mc.c.archivado == db.false(),
+        _mismo_monto(mc.c.monto, p.c.monto), _dia(mc.c.fecha) == p.c.fecha,
+    ).exists()
+    return db.session.execute(
+        select(p.c.id, p.c.monto, p.c.fecha, c.c.nombre)
+        .select_from(p.join(c, c.c.id == p.c.cliente_id))
+        .where(
+            p.c.archivado == db.false(), c.c.cancelado == db.false(),
+            ~tiene_movimiento, ~_con_salida(p),
+        )
+        .order_by(p.c.id)
+    ).all()
+
+
+def sobrantes():
+    """Movimientos "prestamo" sin préstamo esperado, o repetidos: (id, monto, fecha, prestamo_id)."""
+    mc, p, c = MovimientoCaja.__table__, Prestamo.__table__, Cliente.__table__
+    anterior = mc.alias("m_anterior")
+    esperado = (
+        select(literal(1))
+        .select_from(p.join(c, c.c.id == p.c.cliente_id))
+        .where(
+            p.c.id == mc.c.prestamo_id, p.c.archivado == db.false(), c.c.cancelado == db.false(),
+            _mismo_monto(p.c.monto, mc.c.monto), p.c.fecha == _dia(mc.c.fecha),
+            ~_con_salida(p),
+        )
+        .exists()
+    )
+    repetido = select(literal(1)).where(
+        anterior.c.prestamo_id == mc.c.prestamo_id, anterior.c.tipo == TIPO,
+        anterior.c.archivado == db.false(), anterior.c.id < mc.c.id,
+        _mismo_monto(anterior.c.monto, mc.c.monto), _dia(anterior.c.fecha) == _dia(mc.c.fecha),
+    ).exists()
+    return db.session.execute(
+        select(mc.c.id, mc.c.monto, mc.c.fecha, mc.c.prestamo_id)
+        .where(mc.c.tipo == TIPO, mc.c.archivado == db.false(), or_(~esperado, repetido))
+        .order_by(mc.c.id)
+    ).all()
+
+
+# ---------------------------------------------------
+# 🔧 4. Aplicar
+# ---------------------------------------------------
+def _insertar(filas):
+    if not filas:
+        return
+    db.session.execute(
+        insert(MovimientoCaja.__table__).values(**sello()),
+        [
+            {
+                "tipo": TIPO,
+                "monto": monto,
+                "descripcion": f"Préstamo a {nombre}",
+                "fecha": datetime.combine(fecha, time.min),
+                "prestamo_id": pid,
+                "archivado": False,
+            }
+            for pid, monto, fecha, nombre in filas
+        ],
+    )
+
+
+def _borrar(filas):
+    if not filas:
+        return
+    ids = [f.id for f in filas]
+    db.session.execute(delete(MovimientoCaja.__table__).where(MovimientoCaja.__table__.c.id.in_(ids)))
+    # 🪦 Lápidas: los DELETE de Core no pasan por versiones.py
+    anotar_borrados(MovimientoCaja.__tablename__, ids)
+
+
+def conciliar_prestamos(aplicar: bool = False):
+    """
+    Concilia los movimientos "prestamo" con los préstamos. Con aplicar=False
+    todo corre en una transacción que se deshace: el informe muestra lo que
+    se haría. Con aplicar=True inserta/borra solo las diferencias y suma el
+    ajuste neto a la liquidación de cada día afectado (franja + diario; los
+    días siguientes arrastran la caja). Devuelve el informe.
+    """
+    from helpers import acumular_liquidacion
+
+    vinculados = _vincular_antiguos()
+    falta, sobra = faltantes(), sobrantes()
+
+    por_dia = defaultdict(float)
+    for _, monto, fecha, _ in falta:
+        por_dia[fecha] += monto
+    for fila in sobra:
+        por_dia[fila.fecha.date()] -= fila.monto
+
+    informe = {
+        "aplicado": aplicar,
+        "vinculados": vinculados,
+        "faltantes": [(pid, float(monto), fecha) for pid, monto, fecha, _ in falta],
+        "sobrantes": [(f.id, float(f.monto), f.fecha.date(), f.prestamo_id) for f in sobra],
+        "dias": {d: round(v, 2) for d, v in sorted(por_dia.items()) if round(v, 2)},
+    }
+    if not aplicar:
+        db.session.rollback()
+        return informe
+
+    _insertar(falta)
+    _borrar(sobra)
+    for dia, diferencia in informe["dias"].items():
+        acumular_liquidacion(
+            TIPO, diferencia, dia,
+            evento="conciliacion", descripcion="Conciliación de movimientos de préstamo",
+        )
+    db.session.commit()
+    print(f"✅ Conciliación: {len(falta)} insertados, {len(sobra)} borrados, "
+          f"{vinculados} vinculados, {len(informe['dias'])} días ajustados")
+    return informe
@@ -0,0 +1,372 @@
+# ======================================================
+# diario.py — diario de dinero (solo agregar) y proyecciones reproducibles
+# ======================================================
+# Cada hecho de dinero (abono, préstamo, movimiento de caja, interés,
+# anulación, ajuste) se anota como un EventoDinero con número de secuencia.
+# Las tablas de siempre son proyecciones de ese diario:
+# - Prestamo.saldo  = pliegue de delta_saldo en orden de secuencia
+#   (un delta negativo nunca deja el saldo bajo 0, igual que registrar_abono).
+# - Cliente.saldo   = Σ saldos de sus préstamos vivos.
+# - cartera         = Σ saldos de préstamos vivos.
+# - Liquidacion     = Σ monto por (día, campo); caja_manual = caja del día
+#   anterior (+ ajustes "caja_manual"); caja = caja_manual + neto.
+# En operación normal las proyecciones se actualizan en la misma transacción
+# que el evento (pagos.py, helpers.acumular_liquidacion). Para reparar se
+# reproduce el diario desde la secuencia N: reproducir(desde=N, aplicar=True).
+
+from collections import defaultdict
+from sqlalchemy import select, insert, update, func, bindparam, text
+from extensions import db
+from modelos import EventoDinero, ProyeccionPunto, Prestamo, Cliente, Liquidacion, LiquidacionFranja
+from versiones import sello
+from tiempo import hora_actual, local_date
+from eventos import publicar
+
+# 📦 Préstamos / clientes por lote al reproducir
+LOTE = 500
+
+# 🎯 Diferencia mínima que cuenta como descuadre
+TOLERANCIA = 0.005
+
+# 📌 Nombres de las proyecciones (tabla proyeccion_punto)
+PUNTO_SALDOS = "saldos"
+PUNTO_LIQUIDACION = "liquidacion"
+
+# 🔒 Clave del advisory lock de la siembra inicial
+_LOCK_SIEMBRA = 73120041
+
+
+# ---------------------------------------------------
+# ✍️ Anotar un evento
+# ---------------------------------------------------
+def anotar(tipo: str, *, dia, campo=None, monto=0.0, cliente_id=None, prestamo_id=None,
+           delta_saldo=0.0, referencia_id=None, descripcion=None, fecha=None, dia_origen=None):
+    """
+    Agrega un evento al diario. Debe correr en la misma transacción que el
+    cambio que describe (así el diario y las proyecciones nunca divergen).
+    No hace commit.
+    """
+    db.session.execute(
+        insert(EventoDinero).values(
+            tipo=tipo,
+            dia=dia,
+            fecha=fecha or hora_actual(),
+            campo=campo,
+            monto=float(monto or 0.0),
+            cliente_id=cliente_id,
+            prestamo_id=prestamo_id,
+            delta_saldo=float(delta_saldo or 0.0),
+            referencia_id=referencia_id,
+            descripcion=(descripcion or None) and descripcion[:200],
+            dia_origen=dia_origen,
+        )
+    )
+
+
+def ultima_secuencia():
+    return int(db.session.query(func.coalesce(func.max(EventoDinero.id), 0)).scalar() or 0)
+
+
+def _marcar_punto(nombre: str, secuencia: int):
+    punto = db.session.get(ProyeccionPunto, nombre)
+    if punto is None:
+        punto = ProyeccionPunto(nombre=nombre)
+        db.session.add(punto)
+    punto.secuencia = secuencia
+    punto.actualizado = hora_actual()
+
+
+def puntos():
+    """{proyección: última secuencia reproducida}."""
+    return {p.nombre: int(p.secuencia or 0) for p in ProyeccionPunto.query.all()}
+
+
+def _lotes(valores):
+    valores = sorted(valores)
+    for i in range(0, len(valores), LOTE):
+        yield valores[i:i + LOTE]
+
+
+def _distinto(a, b):
+    return abs((a or 0.0) - (b or 0.0)) >= TOLERANCIA
+
+
+# ---------------------------------------------------
+# 💳 Proyección de saldos (préstamos → clientes → cartera)
+# ---------------------------------------------------
+def plegar_saldo(deltas):
+    """Saldo de un préstamo a partir de sus delta_saldo en orden de secuencia."""
+    saldo = 0.0
+    for delta in deltas:
+        saldo = max(saldo + delta, 0.0) if delta < 0 else saldo + delta
+    return saldo
+
+
+def _prestamos_afectados(desde):
+    if desde is None:
+        # 🔁 Reproducción completa: también los préstamos sin eventos (deberían ser 0)
+        ids = set(db.session.execute(
+            select(Prestamo.id).execution_options(incluir_archivados=True)
+        ).scalars())
+        desde = 0
+    else:
+        ids = set()
+    ids.update(db.session.execute(
+        select(EventoDinero.prestamo_id)
+        .where(EventoDinero.id >= desde, EventoDinero.prestamo_id.isnot(None))
+        .distinct()
+    ).scalars())
+    return ids
+
+
+def _reproducir_saldos(desde, hasta, aplicar, informe):
+    proyectados = {}    # prestamo_id → saldo proyectado
+    clientes = set()
+    prestamo = Prestamo.__table__
+
+    for lote in _lotes(_prestamos_afectados(desde)):
+        consulta = (
+            select(Prestamo.id, Prestamo.cliente_id, Prestamo.saldo)
+            .where(Prestamo.id.in_(lote))
+            .execution_options(incluir_archivados=True)
+        )
+        if aplicar:
+            # 🔒 Los abonos de estos préstamos esperan al final del lote
+            consulta = consulta.with_for_update()
+        guardados = {pid: (cid, saldo) for pid, cid, saldo in db.session.execute(consulta)}
+
+        deltas = defaultdict(list)
+        for pid, delta in db.session.execute(
+            select(EventoDinero.prestamo_id, EventoDinero.delta_saldo)
+            .where(EventoDinero.prestamo_id.in_(lote), EventoDinero.id <= hasta)
+            .order_by(EventoDinero.id)
+        ):
+            deltas[pid].append(delta or 0.0)
+
+        cambios = []
+        for pid in lote:
+            if pid not in guardados:
+                continue  # ya movido a prestamo_archivo
+            cliente_id, guardado = guardados[pid]
+            saldo = round(plegar_saldo(deltas.get(pid, ())), 2)
+            proyectados[pid] = saldo
+            clientes.add(cliente_id)
+            if _distinto(guardado, saldo):
+                informe["prestamos"].append((pid, float(guardado or 0.0), saldo))
+                cambios.append({"b_id": pid, "b_saldo": saldo})
+
+        if aplicar and cambios:
+            db.session.execute(
+                update(prestamo).where(prestamo.c.id == bindparam("b_id"))
+                .values(saldo=bindparam("b_saldo"), **sello()),
+                cambios,
+            )
+        if aplicar:
+            db.session.commit()  # ✅ transacción corta por lote
+
+    # 👤 Clientes: Σ préstamos vivos (proyectado si se reprodujo, guardado si no)
+    for lote in _lotes(clientes):
+        sumas = defaultdict(float)
+        for pid, cid, saldo in db.session.execute(
+            select(Prestamo.id, Prestamo.cliente_id, Prestamo.saldo)
+            .where(Prestamo.cliente_id.in_(lote))
+        ):
+            sumas[cid] += proyectados.get(pid, saldo or 0.0)
+
+        cambios = []
+        for cid, guardado in db.session.execute(
+            select(Cliente.id, Cliente.saldo).where(Cliente.id.in_(lote))
+        ):
+            saldo = round(sumas.get(cid, 0.0), 2)
+            saldo = 0.0 if saldo < TOLERANCIA else saldo
+            if _distinto(guardado, saldo):
+                informe["clientes"].append((cid, float(guardado or 0.0), saldo))
+                cambios.append({"b_id": cid, "b_saldo": saldo})
+
+        if aplicar and cambios:
+            cliente = Cliente.__table__
+            db.session.execute(
+                update(cliente).where(cliente.c.id == bindparam("b_id"))
+                .values(saldo=bindparam("b_saldo"), **sello()),
+                cambios,
+            )
+            db.session.commit()
+
+    informe["prestamos_revisados"] = len(proyectados)
+    informe["clientes_revisados"] = len(clientes)
+
+
+def cartera():
+    """Σ saldos de préstamos vivos (la proyección ya mantenida)."""
+    return round(float(db.session.query(func.coalesce(func.sum(Prestamo.saldo), 0.0)).scalar() or 0.0), 2)
+
+
+# ---------------------------------------------------
+# 📊 Proyección de liquidaciones diarias
+# ---------------------------------------------------
+def _reproducir_liquidacion(desde, hasta, aplicar, informe):
+    from helpers import (
+        CAMPOS_LIQUIDACION, _neto, caja_anterior, totales_franjas,
+        asegurar_fila_liquidacion, limpiar_franjas,
+    )
+    campos = tuple(CAMPOS_LIQUIDACION.values())
+
+    inicio = db.session.query(func.min(EventoDinero.dia)).filter(
+        EventoDinero.id >= (desde or 0), EventoDinero.id <= hasta
+    ).scalar()
+    if desde is None:
+        primera_fila = db.session.query(func.min(Liquidacion.fecha)).scalar()
+        inicio = min(f for f in (inicio, primera_fila) if f) if (inicio or primera_fila) else None
+    if inicio is None:
+        return
+
+    # Σ monto por (día, campo) desde el inicio (una consulta)
+    sumas = defaultdict(lambda: defaultdict(float))
+    for dia, campo, total in db.session.execute(
+        select(EventoDinero.dia, EventoDinero.campo, func.sum(EventoDinero.monto))
+        .where(EventoDinero.dia >= inicio, EventoDinero.id <= hasta, EventoDinero.campo.isnot(None))
+        .group_by(EventoDinero.dia, EventoDinero.campo)
+    ):
+        sumas[dia][campo] += float(total or 0.0)
+
+    filas = {l.fecha: l for l in Liquidacion.query.filter(Liquidacion.fecha >= inicio).all()}
+    dias = sorted(set(filas) | set(sumas))
+    franjas = totales_franjas(inicio, dias[-1]) if dias else {}
+
+    # 📦 La caja previa al inicio no se reproduce: se toma la guardada
+    caja_previa = 0.0 if desde is None else caja_anterior(inicio)
+    recalculados = []
+
+    for dia in dias:
+        totales = {c: round(sumas[dia].get(c, 0.0), 2) for c in campos}
+        caja_manual = round(caja_previa + sumas[dia].get("caja_manual", 0.0), 2)
+        proyectada = {**totales, "caja_manual": caja_manual,
+                      "caja": round(caja_manual + _neto(**totales), 2)}
+
+        fila = filas.get(dia)
+        if fila is not None:
+            delta = franjas.get(dia) or {}
+            guardada = {c: (getattr(fila, c) or 0.0) + delta.get(c, 0.0) for c in campos}
+            guardada["caja_manual"] = fila.caja_manual or 0.0
+            guardada["caja"] = (fila.caja or 0.0) + (_neto(**delta) if delta else 0.0)
+        else:
+            guardada = {c: 0.0 for c in proyectada}
+            guardada["caja_manual"] = guardada["caja"] = caja_previa
+
+        diferentes = [c for c in proyectada if _distinto(guardada[c], proyectada[c])]
+        cerrada = bool(fila is not None and fila.cerrada)
+        for c in diferentes:
+            informe["dias"].append((dia, c, round(float(guardada[c]), 2), proyectada[c], cerrada))
+
+        if cerrada:
+            # 🔒 Un día cerrado no se toca: la cadena sigue desde su caja congelada
+            caja_previa = fila.caja or 0.0
+            continue
+        caja_previa = proyectada["caja"]
+
+        if aplicar and diferentes:
+            LiquidacionFranja.query.filter_by(fecha=dia).with_for_update().all()
+            asegurar_fila_liquidacion(dia)
+            fila = fila or Liquidacion.query.filter_by(fecha=dia).first()
+            for c, valor in proyectada.items():
+                setattr(fila, c, valor)
+            limpiar_franjas(dia)
+            recalculados.append(dia)
+
+    if aplicar:
+        db.session.commit()
+        for dia in recalculados:
+            publicar({"evento": "recalculo", "fecha": dia.isoformat()})
+    informe["dias_revisados"] = len(dias)
+
+
+# ---------------------------------------------------
+# 🔁 Reproducir el diario
+# ---------------------------------------------------
+def reproducir(desde: int = None, aplicar: bool = False):
+    """
+    Reconstruye las proyecciones a partir del diario.
+    - desde=None: todo el diario; desde=N: solo lo afectado por eventos ≥ N
+      (préstamos con eventos desde N y días desde el primer día de esos eventos).
+    - aplicar=False: solo informa los descuadres (simulación).
+    - aplicar=True: corrige préstamos, clientes y días abiertos, y avanza los puntos.
+    Devuelve el informe con cada diferencia encontrada.
+    """
+    hasta = ultima_secuencia()
+    informe = {
+        "desde": desde, "hasta": hasta, "aplicado": aplicar,
+        "prestamos": [], "clientes": [], "dias": [],
+        "cartera_antes": cartera(),
+    }
+    _reproducir_saldos(desde, hasta, aplicar, informe)
+    _reproducir_liquidacion(desde, hasta, aplicar, informe)
+
+    if aplicar:
+        _marcar_punto(PUNTO_SALDOS, hasta)
+        _marcar_punto(PUNTO_LIQUIDACION, hasta)
+        db.session.commit()
+    else:
+        db.session.rollback()
+
+    informe["cartera"] = cartera()
+    return informe
+
+
+# ---------------------------------------------------
+# 🌱 Siembra: eventos de apertura desde el estado actual
+# ---------------------------------------------------
+def sembrar():
+    """
+    Si el diario está vacío, lo abre con el estado actual para que reproducirlo
+    dé exactamente las tablas de hoy:
+    - apertura_saldo: saldo de cada préstamo (también archivados).
+    - apertura_dia:   totales consolidados de cada día de Liquidacion.
+    - apertura_caja:  saltos de caja_manual respecto a la caja del día anterior.
+    Devuelve la cantidad de eventos escritos (0 si ya había diario).
+    """
+    from helpers import CAMPOS_LIQUIDACION, liquidaciones_consolidadas
+
+    conexion = db.session.connection()
+    if conexion.dialect.name == "postgresql":
+        conexion.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": _LOCK_SIEMBRA})
+    if db.session.query(EventoDinero.id).first():
+        db.session.rollback()
+        return 0
+
+    hoy = local_date()
+    eventos = []
+    for pid, cid, saldo in db.session.execute(
+        select(Prestamo.id, Prestamo.cliente_id, Prestamo.saldo)
+        .where(Prestamo.saldo != 0)
+        .order_by(Prestamo.id)
+        .execution_options(incluir_archivados=True)
+    ):
+        eventos.append({"tipo": "apertura_saldo", "dia": hoy, "campo": None, "monto": 0.0,
+                        "cliente_id": cid, "prestamo_id": pid, "delta_saldo": float(saldo)})
+
+    caja_previa = 0.0
+    for liq in liquidaciones_consolidadas(Liquidacion.query.order_by(Liquidacion.fecha).all()):
+        salto = round((liq.caja_manual or 0.0) - caja_previa, 2)
+        if salto:
+            eventos.append({"tipo": "apertura_caja", "dia": liq.fecha, "campo": "caja_manual",
+                            "monto": salto, "cliente_id": None, "prestamo_id": None, "delta_saldo": 0.0})
+        for campo in CAMPOS_LIQUIDACION.values():
+            monto = round(float(getattr(liq, campo) or 0.0), 2)
+            if monto:
+                eventos.append({"tipo": "apertura_dia", "dia": liq.fecha, "campo": campo,
+                                "monto": monto, "cliente_id": None, "prestamo_id": None,
+                                "delta_saldo": 0.0})
+        caja_previa = liq.caja or 0.0
+
+    if not eventos:
+        db.session.rollback()
+        return 0
+
+    ahora = hora_actual()
+    db.session.execute(insert(EventoDinero), [{**e, "fecha": ahora} for e in eventos])
+    secuencia = ultima_secuencia()
+    _marcar_punto(PUNTO_SALDOS, secuencia)
+    _marcar_punto(PUNTO_LIQUIDACION, secuencia)
+    db.session.commit()
+    print(f"🌱 Diario de dinero sembrado: {len(eventos)} eventos de apertura")
+    return len(eventos)
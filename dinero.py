@@ -0,0 +1,56 @@
+# ======================================================
+# dinero.py — montos exactos en centavos (NUMERIC(14, 2))
+# ======================================================
+# - La base guarda NUMERIC(14, 2): SUM, comparaciones y diferencias en SQL son
+#   exactas (PostgreSQL). Nada de tolerancias del tipo "saldo <= 0.01".
+# - Todo valor que se escribe se redondea a centavos (mitad hacia arriba) antes
+#   de llegar a la base; los literales comparados con una columna Dinero
+#   también (Cliente.saldo <= 0 compara centavos).
+# - En Python se lee como float ya redondeado a centavos, así el resto del
+#   código (aritmética con float, jsonify) sigue igual.
+# - Los totales que se suman en Python (reportes) usan sumar(): Decimal exacto.
+
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import Numeric
+from sqlalchemy.types import TypeDecorator
+
+CENTAVO = Decimal("0.01")
+
+# 🔢 Hasta 999.999.999.999,99
+PRECISION, ESCALA = 14, 2
+
+
+def a_centavos(valor):
+    """Decimal redondeado a centavos (mitad hacia arriba); None → 0.00."""
+    if valor is None:
+        return Decimal("0.00")
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))  # str(): 1.005 es "1.005", no 1.00499999...
+    return valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def redondear(valor):
+    """float redondeado a centavos (mitad hacia arriba, a diferencia de round())."""
+    return float(a_centavos(valor))
+
+
+def sumar(valores):
+    """Suma exacta en centavos de montos float/Decimal/None. Devuelve float."""
+    return float(sum((a_centavos(v) for v in valores), Decimal("0.00")))
+
+
+def formato_dinero(valor):
+    """Filtro Jinja `dinero`: 1234.5 → "1234.50" (None → "0.00")."""
+    return f"{a_centavos(valor):.2f}"
+
+
+class Dinero(TypeDecorator):
+    """Monto en centavos exactos: NUMERIC(14, 2) en la base, float en Python."""
+    impl = Numeric(PRECISION, ESCALA)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else a_centavos(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else float(value)
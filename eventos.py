@@ -0,0 +1,161 @@
+# ======================================================
+# eventos.py — eventos de cambio en vivo (NOTIFY / bus en proceso)
+# ======================================================
+# Cada movimiento de dinero publica un evento compacto:
+#   {"evento": "movimiento", "tipo": "abono", "campo": "entradas", "monto": 200.0, "fecha": "2025-10-29"}
+# y un recálculo completo publica {"evento": "recalculo", "fecha": ...}.
+# - PostgreSQL: pg_notify dentro de la misma transacción (solo se entrega si hay commit).
+#   Un hilo por worker hace LISTEN y reparte los eventos a sus suscriptores SSE.
+# - SQLite: el evento espera en la sesión y se reparte en proceso tras el commit.
+# Cada stream abierto ocupa un hilo del worker (gthread, Procfile: --threads 8):
+# hay un tope por worker y cada stream dura a lo sumo DURACION_MAX_SEGUNDOS.
+# Sin cupo, /api/eventos responde 503 y en_vivo.js consulta /api/totales.
+
+import json
+import os
+import queue
+import time
+import select
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from extensions import db
+
+CANAL = "cobros"
+
+# ⏱️ Segundos entre latidos del stream SSE (mantiene viva la conexión)
+LATIDO_SEGUNDOS = 15
+
+# 🚦 Streams abiertos a la vez por worker (el resto de los hilos atiende páginas)
+MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "4"))
+
+# ⏳ Vida máxima de un stream: al cerrarse el navegador reconecta y compite por un cupo
+DURACION_MAX_SEGUNDOS = int(os.getenv("SSE_DURACION_MAX", "600"))
+
+_suscriptores = set()
+_candado = threading.Lock()
+_escucha_iniciada = False
+
+
+# ---------------------------------------------------
+# 📣 Publicar
+# ---------------------------------------------------
+def publicar(evento: dict):
+    """Publica un evento al confirmar la transacción actual (nunca si hay rollback)."""
+    conexion = db.session.connection()
+    if conexion.dialect.name == "postgresql":
+        conexion.execute(
+            text("SELECT pg_notify(:canal, :carga)"),
+            {"canal": CANAL, "carga": json.dumps(evento, separators=(",", ":"))},
+        )
+    else:
+        db.session.info.setdefault("eventos_pendientes", []).append(evento)
+
+
+@event.listens_for(Session, "after_commit")
+def _repartir_tras_commit(session):
+    for evento in session.info.pop("eventos_pendientes", []):
+        repartir(evento)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(session):
+    session.info.pop("eventos_pendientes", None)
+
+
+# ---------------------------------------------------
+# 📬 Bus en proceso (suscriptores SSE de este worker)
+# ---------------------------------------------------
+def repartir(evento: dict):
+    with _candado:
+        destinos = list(_suscriptores)
+    for cola in destinos:
+        try:
+            cola.put_nowait(evento)
+        except queue.Full:
+            pass  # 🐢 cliente lento: pierde el evento y se resincroniza al reconectar
+
+
+def suscribir():
+    """
+    Cola de eventos para un cliente SSE (arranca el LISTEN si hace falta).
+    None si el worker ya tiene MAX_STREAMS streams abiertos.
+    """
+    cola = queue.Queue(maxsize=200)
+    with _candado:
+        if len(_suscriptores) >= MAX_STREAMS:
+            return None
+        _suscriptores.add(cola)
+    _iniciar_escucha()
+    return cola
+
+
+def cancelar(cola):
+    with _candado:
+        _suscriptores.discard(cola)
+
+
+# ---------------------------------------------------
+# 👂 LISTEN en PostgreSQL (un hilo y una conexión por worker)
+# ---------------------------------------------------
+def _iniciar_escucha():
+    global _escucha_iniciada
+    if db.engine.dialect.name != "postgresql":
+        return
+    with _candado:
+        if _escucha_iniciada:
+            return
+        _escucha_iniciada = True
+
+    crudo = db.engine.raw_connection()
+    crudo.detach()  # 🔌 fuera del pool: queda dedicada al LISTEN
+    hilo = threading.Thread(
+        target=_escuchar, args=(crudo.driver_connection, db.engine.dialect.driver), daemon=True
+    )
+    hilo.start()
+
+
+def _escuchar(conexion, driver: str):
+    global _escucha_iniciada
+    try:
+        if driver == "psycopg":  # psycopg 3
+            conexion.autocommit = True
+            conexion.execute(f"LISTEN {CANAL}")
+            while True:
+                for aviso in conexion.notifies(timeout=LATIDO_SEGUNDOS):
+                    repartir(json.loads(aviso.payload))
+        else:  # psycopg2
+            conexion.set_session(autocommit=True)
+            conexion.cursor().execute(f"LISTEN {CANAL}")
+            while True:
+                if select.select([conexion], [], [], LATIDO_SEGUNDOS) == ([], [], []):
+                    continue
+                conexion.poll()
+                while conexion.notifies:
+                    repartir(json.loads(conexion.notifies.pop(0).payload))
+    except Exception as e:
+        print(f"⚠️ LISTEN {CANAL} interrumpido: {e}")
+        _escucha_iniciada = False  # 🔁 el próximo suscriptor vuelve a conectarse
+
+
+# ---------------------------------------------------
+# 📡 Formato Server-Sent Events
+# ---------------------------------------------------
+def formato_sse(nombre: str, datos: dict):
+    return f"event: {nombre}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n"
+
+
+def stream_sse(cola, inicial: dict):
+    """Generador del stream: totales iniciales, luego un evento por cambio (hasta DURACION_MAX_SEGUNDOS)."""
+    fin = time.monotonic() + DURACION_MAX_SEGUNDOS
+    try:
+        yield formato_sse("totales", inicial)
+        while time.monotonic() < fin:
+            try:
+                evento = cola.get(timeout=LATIDO_SEGUNDOS)
+            except queue.Empty:
+                yield ": latido\n\n"
+                continue
+            yield formato_sse(evento.get("evento", "movimiento"), evento)
+    finally:
+        cancelar(cola)
@@ -3,10 +3,16 @@
 # ======================================================
 
 from datetime import date, datetime, time, timedelta
+import os
 import random
-from sqlalchemy import func
+from sqlalchemy import select, func, update, delete, event
+from sqlalchemy.orm import Session
 from extensions import db
-from modelos import Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion
+from modelos import Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion, LiquidacionFranja, EventoDinero
+from versiones import sello, anotar_borrados
+from eventos import publicar
+from diario import anotar
+from dinero import sumar
 
 # ⏰ Importar funciones de hora local
 from tiempo import hora_actual, local_date, day_range
@@ -22,6 +28,19 @@ def generar_codigo_cliente():
             return codigo
 
 
+# ---------------------------------------------------
+# 🔹 INSERT ... ON CONFLICT según el motor (PostgreSQL / SQLite)
+# ---------------------------------------------------
+def insert_upsert(modelo, dialecto: str = None):
+    """Devuelve un INSERT con soporte on_conflict_* para el motor activo."""
+    dialecto = dialecto or db.session.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(modelo)
+
+
 # ---------------------------------------------------
 # 🔹 Crear o buscar liquidación existente
 # ---------------------------------------------------
@@ -29,12 +48,284 @@ def crear_liquidacion_para_fecha(fecha: date):
     """Crea la liquidación para una fecha si no existe."""
     liq = Liquidacion.query.filter_by(fecha=fecha).first()
     if not liq:
-        liq = Liquidacion(fecha=fecha)
-        db.session.add(liq)
+        asegurar_fila_liquidacion(fecha)
         db.session.commit()
+        liq = Liquidacion.query.filter_by(fecha=fecha).first()
     return liq
 
 
+# ======================================================
+# 🧮 FRANJAS DE LIQUIDACIÓN — acumulación sin fila caliente
+# ======================================================
+# Cada movimiento suma su monto en una franja al azar (de N) en vez de
+# reescribir la fila única del día: los hilos de un mismo proceso tampoco
+# compiten por la misma fila. La liquidación real = fila + Σ franjas.
+N_FRANJAS = int(os.getenv("LIQUIDACION_FRANJAS", "8"))
+
+# tipo de movimiento → columna de la liquidación
+CAMPOS_LIQUIDACION = {
+    "abono": "entradas",
+    "entrada_manual": "entradas_caja",
+    "salida": "salidas",
+    "gasto": "gastos",
+    "prestamo": "prestamos_hoy",
+}
+
+# 📌 Fechas cuya fila de Liquidacion ya existe (caché por worker; solo se
+# agregan tras el commit que la creó o la vio, nunca si hubo rollback)
+_FECHAS_CON_FILA = set()
+
+
+@event.listens_for(Session, "after_commit")
+def _confirmar_fechas_con_fila(session):
+    _FECHAS_CON_FILA.update(session.info.pop("fechas_con_fila", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_fechas_con_fila(session):
+    session.info.pop("fechas_con_fila", None)
+
+
+def _neto(entradas, entradas_caja, salidas, gastos, prestamos_hoy):
+    """Efecto de un conjunto de totales sobre la caja."""
+    return (entradas or 0) + (entradas_caja or 0) - (
+        (prestamos_hoy or 0) + (salidas or 0) + (gastos or 0)
+    )
+
+
+def totales_franjas(desde: date, hasta: date = None):
+    """Suma las franjas por fecha en el rango [desde, hasta] → {fecha: {campo: total}}."""
+    hasta = hasta or desde
+    filas = (
+        db.session.query(
+            LiquidacionFranja.fecha,
+            func.coalesce(func.sum(LiquidacionFranja.entradas), 0.0),
+            func.coalesce(func.sum(LiquidacionFranja.entradas_caja), 0.0),
+            func.coalesce(func.sum(LiquidacionFranja.salidas), 0.0),
+            func.coalesce(func.sum(LiquidacionFranja.gastos), 0.0),
+            func.coalesce(func.sum(LiquidacionFranja.prestamos_hoy), 0.0),
+        )
+        .filter(LiquidacionFranja.fecha >= desde, LiquidacionFranja.fecha <= hasta)
+        .group_by(LiquidacionFranja.fecha)
+        .all()
+    )
+    campos = ("entradas", "entradas_caja", "salidas", "gastos", "prestamos_hoy")
+    return {f[0]: dict(zip(campos, map(float, f[1:]))) for f in filas}
+
+
+def caja_anterior(fecha: date):
+    """Caja final consolidada (fila + franjas) del último día anterior a la fecha."""
+    liq_anterior = (
+        Liquidacion.query.filter(Liquidacion.fecha < fecha)
+        .order_by(Liquidacion.fecha.desc())
+        .first()
+    )
+    if not liq_anterior:
+        return 0.0
+    delta = totales_franjas(liq_anterior.fecha).get(liq_anterior.fecha)
+    return (liq_anterior.caja or 0.0) + (_neto(**delta) if delta else 0.0)
+
+
+def asegurar_fila_liquidacion(fecha: date):
+    """Crea (una vez por día) la fila de Liquidacion con la caja arrastrada. No hace commit."""
+    if fecha in _FECHAS_CON_FILA:
+        return
+    if not db.session.query(Liquidacion.id).filter_by(fecha=fecha).first():
+        arrastre = caja_anterior(fecha)
+        creada = db.session.execute(
+            insert_upsert(Liquidacion)
+            .values(fecha=fecha, caja_manual=arrastre, caja=arrastre, **sello())
+            .on_conflict_do_nothing(index_elements=["fecha"])
+            .returning(Liquidacion.id)
+        ).first()
+        if creada:
+            from periodos import actualizar_periodos
+            actualizar_periodos([fecha])
+    db.session.info.setdefault("fechas_con_fila", set()).add(fecha)
+
+
+def dia_cerrado(fecha: date, bloquear: bool = False):
+    """
+    True si la liquidación del día ya tiene cierre diario.
+    Con bloquear=True toma un bloqueo compartido sobre la fila: el cierre
+    (FOR UPDATE) espera a que esta transacción confirme su movimiento.
+    """
+    consulta = db.session.query(Liquidacion.cerrada).filter_by(fecha=fecha)
+    if bloquear:
+        consulta = consulta.with_for_update(read=True)
+    return bool(consulta.scalar())
+
+
+def acumular_liquidacion(tipo: str, monto: float, fecha: date = None, **origen):
+    """
+    Suma un movimiento a una franja al azar del día (UPSERT de una fila) y lo
+    anota en el diario de dinero (diario.py). `origen` completa el evento:
+    cliente_id, prestamo_id, delta_saldo, referencia_id, descripcion y
+    evento (tipo del evento si difiere del tipo de movimiento).
+    Debe ejecutarse en la misma transacción que el abono/movimiento. No hace commit.
+    Devuelve el día donde quedó sumado (hoy si el original ya estaba cerrado).
+    """
+    campo = CAMPOS_LIQUIDACION.get(tipo)
+    if not campo or not monto:
+        return
+    fecha = fecha or local_date()
+    if fecha < local_date() and dia_cerrado(fecha, bloquear=True):
+        # 🔒 Día ya cerrado (p. ej. abono offline que llega tarde): se suma a hoy.
+        # El evento guarda el día original: el recálculo desde las tablas
+        # fuente de hoy lo vuelve a sumar (traslados_al_dia)
+        origen["dia_origen"] = fecha
+        fecha = local_date()
+    anotar(origen.pop("evento", tipo), dia=fecha, campo=campo, monto=monto, **origen)
+    asegurar_fila_liquidacion(fecha)
+
+    tabla = LiquidacionFranja.__table__
+    valores = {c: 0.0 for c in CAMPOS_LIQUIDACION.values()}
+    valores[campo] = monto
+    marca = sello()
+    db.session.execute(
+        insert_upsert(LiquidacionFranja)
+        .values(fecha=fecha, franja=random.randrange(N_FRANJAS), **valores, **marca)
+        .on_conflict_do_update(
+            index_elements=["fecha", "franja"],
+            set_={campo: tabla.c[campo] + monto, **marca},
+        )
+    )
+    if fecha < local_date():
+        # ⏩ Día pasado aún abierto: los días siguientes arrastran la nueva caja
+        desplazar_caja(fecha, _neto(**valores))
+    publicar({"evento": "movimiento", "tipo": tipo, "campo": campo,
+              "monto": round(float(monto), 2), "fecha": fecha.isoformat()})
+    return fecha
+
+
+def registrar_movimiento_caja(tipo: str, monto: float, descripcion: str, fecha: datetime = None, **origen):
+    """
+    Agrega un MovimientoCaja y lo acumula en la franja del día (y en el diario,
+    con `origen` como en acumular_liquidacion). No hace commit.
+    """
+    fecha = fecha or hora_actual()
+    mov = MovimientoCaja(
+        tipo=tipo, monto=monto, descripcion=descripcion, fecha=fecha,
+        prestamo_id=origen.get("prestamo_id"),
+    )
+    db.session.add(mov)
+    db.session.flush()  # id del movimiento para el evento
+    acumular_liquidacion(tipo, monto, fecha.date(), referencia_id=mov.id, descripcion=descripcion, **origen)
+    return mov
+
+
+def traslados_al_dia(fecha: date):
+    """
+    {campo: total} de los movimientos de días ya cerrados que se sumaron a
+    `fecha`. Sus filas fuente conservan su fecha original, así que un
+    recálculo desde las tablas fuente debe agregarlos aparte.
+    """
+    filas = db.session.execute(
+        select(EventoDinero.campo, func.coalesce(func.sum(EventoDinero.monto), 0.0))
+        .where(EventoDinero.dia == fecha, EventoDinero.dia_origen.isnot(None))
+        .group_by(EventoDinero.campo)
+    ).all()
+    return {campo: float(total) for campo, total in filas if campo}
+
+
+def limpiar_franjas(fecha: date):
+    """Elimina las franjas de un día ya recalculado desde las tablas fuente. No hace commit."""
+    ids = db.session.execute(
+        delete(LiquidacionFranja).where(LiquidacionFranja.fecha == fecha)
+        .returning(LiquidacionFranja.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    anotar_borrados(LiquidacionFranja.__tablename__, ids)
+
+
+def desplazar_caja(fecha: date, diferencia: float):
+    """
+    Arrastra un cambio de caja de `fecha` a los días siguientes ya creados:
+    suma `diferencia` a caja_manual y caja de cada día abierto posterior,
+    hasta el primer día cerrado (que queda congelado). Devuelve las fechas
+    desplazadas. No hace commit.
+    """
+    if not diferencia:
+        return []
+    siguiente_cerrado = (
+        db.session.query(func.min(Liquidacion.fecha))
+        .filter(Liquidacion.fecha > fecha, Liquidacion.cerrada == db.true())
+        .scalar()
+    )
+    filtros = [Liquidacion.fecha > fecha, Liquidacion.cerrada == db.false()]
+    if siguiente_cerrado:
+        filtros.append(Liquidacion.fecha < siguiente_cerrado)
+    fechas = db.session.execute(
+        update(Liquidacion)
+        .where(*filtros)
+        .values(
+            caja_manual=func.coalesce(Liquidacion.caja_manual, 0.0) + diferencia,
+            caja=func.coalesce(Liquidacion.caja, 0.0) + diferencia,
+            **sello(),
+        )
+        .returning(Liquidacion.fecha)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if fechas:
+        from periodos import actualizar_periodos
+        actualizar_periodos(fechas)
+    return fechas
+
+
+def liquidacion_consolidada(liq: Liquidacion, delta: dict = None):
+    """
+    Devuelve una Liquidacion transitoria (fuera de la sesión) con fila + franjas.
+    Solo lectura: nunca se agrega a la sesión ni se guarda.
+    """
+    if delta is None:
+        delta = totales_franjas(liq.fecha).get(liq.fecha)
+    delta = delta or {}
+    return Liquidacion(
+        fecha=liq.fecha,
+        caja_manual=liq.caja_manual or 0.0,
+        entradas=(liq.entradas or 0.0) + delta.get("entradas", 0.0),
+        entradas_caja=(liq.entradas_caja or 0.0) + delta.get("entradas_caja", 0.0),
+        salidas=(liq.salidas or 0.0) + delta.get("salidas", 0.0),
+        gastos=(liq.gastos or 0.0) + delta.get("gastos", 0.0),
+        prestamos_hoy=(liq.prestamos_hoy or 0.0) + delta.get("prestamos_hoy", 0.0),
+        caja=(liq.caja or 0.0) + (_neto(**delta) if delta else 0.0),
+    )
+
+
+def totales_del_dia(fecha: date = None):
+    """
+    Totales del día desde la liquidación mantenida (fila + franjas), sin recorrer
+    abonos ni movimientos. caja_dia = neto del día; caja = caja anterior + neto.
+    """
+    fecha = fecha or local_date()
+    liq = Liquidacion.query.filter_by(fecha=fecha).first()
+    if liq:
+        liq = liquidacion_consolidada(liq)
+        caja_manual = liq.caja_manual or 0.0
+    else:
+        caja_manual = caja_anterior(fecha)
+        liq = Liquidacion(fecha=fecha, caja_manual=caja_manual, caja=caja_manual)
+
+    totales = {c: round(float(getattr(liq, c) or 0.0), 2) for c in CAMPOS_LIQUIDACION.values()}
+    caja_dia = _neto(**totales)
+    return {
+        "fecha": fecha.isoformat(),
+        **totales,
+        "caja_manual": round(float(caja_manual), 2),
+        "caja_dia": round(float(caja_dia), 2),
+        "caja": round(float(caja_manual) + caja_dia, 2),
+    }
+
+
+def liquidaciones_consolidadas(liquidaciones):
+    """Consolida una lista de filas de Liquidacion con una sola consulta de franjas."""
+    if not liquidaciones:
+        return []
+    fechas = [l.fecha for l in liquidaciones]
+    deltas = totales_franjas(min(fechas), max(fechas))
+    return [liquidacion_consolidada(l, deltas.get(l.fecha, {})) for l in liquidaciones]
+
+
 # ---------------------------------------------------
 # 🔹 Obtener totales generales
 # ---------------------------------------------------
@@ -66,54 +357,71 @@ def obtener_resumen_total():
     return {'caja_total': caja_total, 'cartera_total': cartera_total}
 
 
+# ---------------------------------------------------
+# 🔹 Estado del plazo de un cliente (color de su fila)
+# ---------------------------------------------------
+def calcular_estado_plazo(cliente: Cliente, hoy: date = None):
+    """'normal', 'vencido' (< 30 días tras el plazo) o 'moroso' (≥ 30 días)."""
+    hoy = hoy or local_date()
+    if not cliente.prestamos:
+        return "normal"
+    ultimo = max(cliente.prestamos, key=lambda p: p.fecha)
+    if not ultimo.plazo:
+        return "normal"
+    dias_pasados = (hoy - (ultimo.fecha + timedelta(days=ultimo.plazo))).days
+    if dias_pasados >= 30:
+        return "moroso"
+    if dias_pasados >= 0:
+        return "vencido"
+    return "normal"
+
+
 # ======================================================
 # 🔄 RECONSTRUIR MOVIMIENTOS DE PRÉSTAMOS
 # ======================================================
-def reconstruir_movimientos_prestamos():
+def reconstruir_movimientos_prestamos(aplicar: bool = True):
     """
-    🔧 Repara la tabla MovimientoCaja eliminando todos los movimientos tipo 'prestamo'
-    y los vuelve a generar solo para clientes activos (no cancelados).
-    Luego actualiza la liquidación del día actual.
+    🔧 Repara los movimientos tipo 'prestamo': uno por préstamo vivo de cliente
+    activo. Concilia por diferencias (conciliacion.py): inserta solo los que
+    faltan, borra solo los que sobran y ajusta solo los días afectados.
+    Con aplicar=False devuelve el informe sin tocar nada.
     """
-    borrados = MovimientoCaja.query.filter_by(tipo="prestamo").delete()
-    db.session.commit()
-    print(f"🗑️ Movimientos de préstamo eliminados: {borrados}")
-
-    nuevos = 0
-    for p in Prestamo.query.all():
-        if p.cliente and not p.cliente.cancelado:
-            mov = MovimientoCaja(
-                tipo="prestamo",
-                monto=p.monto,
-                descripcion=f"Préstamo a {p.cliente.nombre}",
-                fecha=datetime.combine(p.fecha, datetime.min.time())
-            )
-            db.session.add(mov)
-            nuevos += 1
-
-    db.session.commit()
-    print(f"✅ Movimientos válidos reconstruidos: {nuevos}")
-
-    from helpers import actualizar_liquidacion_por_movimiento
-    liq = actualizar_liquidacion_por_movimiento(local_date())
-
-    print(f"📅 Liquidación del {liq.fecha} actualizada correctamente.")
-    print(f"💰 Caja final: {liq.caja:.2f}")
-    return liq
+    from conciliacion import conciliar_prestamos
+    informe = conciliar_prestamos(aplicar)
+    print(f"➕ Movimientos faltantes: {len(informe['faltantes'])}")
+    print(f"🗑️ Movimientos sobrantes: {len(informe['sobrantes'])}")
+    for dia, diferencia in informe["dias"].items():
+        print(f"📅 {dia}: préstamos {diferencia:+.2f}")
+    return informe
 
 
 # ---------------------------------------------------
 # 🔹 Actualizar liquidación diaria
 # ---------------------------------------------------
 def actualizar_liquidacion_por_movimiento(fecha: date):
-    """Recalcula la liquidación para una fecha según movimientos y abonos (hora Chile)."""
+    """
+    Recalcula la liquidación para una fecha según movimientos y abonos (hora Chile).
+    Un día con cierre diario no se recalcula: se devuelve tal como quedó.
+    """
+    if dia_cerrado(fecha):
+        print(f"🔒 Liquidación del {fecha} cerrada; no se recalcula.")
+        return Liquidacion.query.filter_by(fecha=fecha).first()
+
     start, end = day_range(fecha)
 
+    # 🔒 Bloquear las franjas del día: los abonos concurrentes esperan al recálculo
+    LiquidacionFranja.query.filter_by(fecha=fecha).with_for_update().all()
+
+    # 🗄️ Las filas de clientes eliminados (archivado = true) siguen contando:
+    # archivar las saca de las vistas vivas, no deshace el dinero que ya se movió
+    todo = {"incluir_archivados": True}
+
     # 💰 Abonos de clientes
     entradas_abonos = (
         db.session.query(func.coalesce(func.sum(Abono.monto), 0))
         .join(Prestamo, Abono.prestamo_id == Prestamo.id)
         .filter(Abono.fecha >= start, Abono.fecha < end)
+        .execution_options(**todo)
         .scalar() or 0.0
     )
 
@@ -125,6 +433,7 @@ def actualizar_liquidacion_por_movimiento(fecha: date):
             MovimientoCaja.fecha >= start,
             MovimientoCaja.fecha < end,
         )
+        .execution_options(**todo)
         .scalar() or 0.0
     )
 
@@ -136,6 +445,7 @@ def actualizar_liquidacion_por_movimiento(fecha: date):
             MovimientoCaja.fecha >= start,
             MovimientoCaja.fecha < end,
         )
+        .execution_options(**todo)
         .scalar() or 0.0
     )
 
@@ -147,6 +457,7 @@ def actualizar_liquidacion_por_movimiento(fecha: date):
             MovimientoCaja.fecha >= start,
             MovimientoCaja.fecha < end,
         )
+        .execution_options(**todo)
         .scalar() or 0.0
     )
 
@@ -158,32 +469,39 @@ def actualizar_liquidacion_por_movimiento(fecha: date):
             MovimientoCaja.fecha >= start,
             MovimientoCaja.fecha < end,
         )
+        .execution_options(**todo)
         .scalar() or 0.0
     )
 
-    # 📦 Caja anterior
-    liq_anterior = (
-        Liquidacion.query.filter(Liquidacion.fecha < fecha)
-        .order_by(Liquidacion.fecha.desc())
-        .first()
-    )
-    caja_anterior = liq_anterior.caja if liq_anterior else 0.0
+    # ⏩ Movimientos de días ya cerrados que se sumaron a este día
+    traslados = traslados_al_dia(fecha)
+    entradas_abonos += traslados.get("entradas", 0.0)
+    entradas_manual += traslados.get("entradas_caja", 0.0)
+    salidas_manual += traslados.get("salidas", 0.0)
+    gastos += traslados.get("gastos", 0.0)
+    prestamos_entregados += traslados.get("prestamos_hoy", 0.0)
+
+    # 📦 Caja anterior (fila + franjas del día previo)
+    caja_previa = caja_anterior(fecha)
 
     # 🔢 Calcular totales
     total_entradas = entradas_abonos + entradas_manual
     total_salidas = salidas_manual
-    caja_actual = caja_anterior + total_entradas - (prestamos_entregados + total_salidas + gastos)
+    caja_actual = caja_previa + total_entradas - (prestamos_entregados + total_salidas + gastos)
 
-    # 🔄 Crear o actualizar registro
-    liq = crear_liquidacion_para_fecha(fecha)
+    # 🔄 Crear o actualizar registro (las franjas quedan incluidas en el recálculo)
+    asegurar_fila_liquidacion(fecha)
+    liq = Liquidacion.query.filter_by(fecha=fecha).first()
+    limpiar_franjas(fecha)
     liq.entradas = entradas_abonos
     liq.entradas_caja = entradas_manual
     liq.prestamos_hoy = prestamos_entregados
     liq.salidas = salidas_manual
     liq.gastos = gastos
-    liq.caja_manual = caja_anterior
+    liq.caja_manual = caja_previa
     liq.caja = caja_actual
 
+    publicar({"evento": "recalculo", "fecha": fecha.isoformat()})
     db.session.commit()
     return liq
 
@@ -194,9 +512,11 @@ def actualizar_liquidacion_por_movimiento(fecha: date):
 def reparar_cliente(nombre: str | int):
     """
     Repara un cliente que fue eliminado antes de la actualización de la ruta.
-    - Crea una entrada manual devolviendo el saldo pendiente a la caja.
+    - Crea una entrada manual devolviendo el saldo pendiente a la caja
+      (franja del día + evento "reverso" en el diario).
+    - Deja en 0 sus préstamos con saldo, cada uno con su evento "ajuste_saldo",
+      así reproducir el diario llega al mismo resultado.
     - Marca al cliente como cancelado y su saldo en 0.
-    - Actualiza la liquidación del día actual.
     Puede usarse por nombre o por ID.
     """
     if isinstance(nombre, int):
@@ -212,25 +532,27 @@ def reparar_cliente(nombre: str | int):
         print(f"ℹ️ El cliente '{cliente.nombre}' no tiene saldo para revertir (saldo actual = {cliente.saldo}).")
         return
 
-    # 💵 Crear movimiento de reverso
-    mov = MovimientoCaja(
-        tipo="entrada_manual",
-        monto=cliente.saldo,
-        descripcion=f"Reverso manual cliente {cliente.nombre}",
-        fecha=hora_actual(),  # 👈 hora local de Chile
-    )
-    db.session.add(mov)
+    hoy = local_date()
+    descripcion = f"Reverso manual cliente {cliente.nombre}"
+
+    # 💳 Préstamos con saldo: a 0, con su delta en el diario
+    prestamos = Prestamo.query.filter(Prestamo.cliente_id == cliente.id, Prestamo.saldo > 0).all()
+    saldo_devuelto = sumar(p.saldo for p in prestamos) if prestamos else cliente.saldo
+    for prestamo in prestamos:
+        anotar(
+            "ajuste_saldo", dia=hoy, cliente_id=cliente.id, prestamo_id=prestamo.id,
+            delta_saldo=-prestamo.saldo, descripcion=descripcion,
+        )
+        prestamo.saldo = 0.0
 
-    saldo_devuelto = cliente.saldo
+    # 💵 Reverso en caja (sin prestamo_id: una entrada_manual con préstamo es un interés)
+    registrar_movimiento_caja(
+        "entrada_manual", saldo_devuelto, descripcion, evento="reverso", cliente_id=cliente.id,
+    )
     cliente.saldo = 0
     cliente.cancelado = True
     db.session.commit()
 
-    try:
-        actualizar_liquidacion_por_movimiento(local_date())
-    except Exception as e:
-        print(f"⚠️ No se pudo actualizar la liquidación automáticamente: {e}")
-
     print(f"✅ Cliente '{cliente.nombre}' reparado correctamente.")
     print(f"💰 Se devolvieron ${saldo_devuelto:.2f} a la caja.")
 
@@ -0,0 +1,177 @@
+# ======================================================
+# idempotencia.py — reintentos seguros de POST (Idempotency-Key)
+# ======================================================
+
+import os
+import json
+import uuid
+from datetime import timedelta
+from functools import wraps
+from flask import request, make_response, jsonify
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from extensions import db
+from modelos import RespuestaIdempotente
+from helpers import insert_upsert
+from tiempo import hora_actual
+
+# ⏳ Tiempo que se guarda cada respuesta
+HORAS_VIGENCIA = int(os.getenv("IDEMPOTENCIA_HORAS", "24"))
+
+# 👻 Una reserva sin respuesta más vieja que esto es de un worker que murió
+# antes de su commit (si hubiera hecho commit, la marca estaría escrita)
+SEGUNDOS_EN_PROCESO = int(os.getenv("IDEMPOTENCIA_EN_PROCESO_SEG", "120"))
+
+
+def nueva_clave():
+    """Genera una clave para formularios HTML (campo oculto idempotency_key)."""
+    return uuid.uuid4().hex
+
+
+def clave_para(ruta: str, clave: str):
+    """Clave almacenada: la misma clave en otra ruta es otra operación."""
+    return f"{ruta}:{clave}"[:200]
+
+
+def _clave_de_la_peticion():
+    """Lee la clave del header Idempotency-Key o del campo de formulario."""
+    clave = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key")
+    clave = (clave or "").strip()
+    if not clave:
+        return None
+    return clave_para(request.path, clave)
+
+
+def _reclamar(clave: str):
+    """
+    Reserva la clave antes de ejecutar la vista.
+    Devuelve None si esta petición debe ejecutarse, o la fila ya existente.
+    """
+    ahora = hora_actual()
+    RespuestaIdempotente.query.filter(
+        RespuestaIdempotente.clave == clave,
+        (RespuestaIdempotente.expira <= ahora)
+        | (RespuestaIdempotente.estado.is_(None)
+           & (RespuestaIdempotente.creado <= ahora - timedelta(seconds=SEGUNDOS_EN_PROCESO))),
+    ).delete(synchronize_session=False)
+
+    reservada = db.session.execute(
+        insert_upsert(RespuestaIdempotente)
+        .values(clave=clave, creado=ahora, expira=ahora + timedelta(hours=HORAS_VIGENCIA))
+        .on_conflict_do_nothing(index_elements=["clave"])
+        .returning(RespuestaIdempotente.id)
+    ).first()
+    db.session.commit()
+
+    if reservada:
+        return None
+    return RespuestaIdempotente.query.filter_by(clave=clave).first()
+
+
+def _marca_provisoria():
+    """
+    Respuesta que queda guardada en el MISMO commit que las escrituras de la
+    vista. Si el worker muere antes de _guardar, el reintento recibe esto en
+    vez de un 409 (o de registrar el abono dos veces).
+    """
+    if request.headers.get("X-Requested-With") == "fetch":
+        cuerpo = {"ok": True, "reproducida": True, "mensaje": "La operación ya se había registrado."}
+        return {"estado": 200, "cuerpo": json.dumps(cuerpo).encode(),
+                "tipo_contenido": "application/json", "ubicacion": None}
+    return {"estado": 303, "cuerpo": b"", "tipo_contenido": None,
+            "ubicacion": request.referrer or "/"}
+
+
+@event.listens_for(Session, "before_commit")
+def _marcar_en_el_commit(session):
+    reserva = session.info.pop("idempotencia", None)
+    if reserva is None:
+        return
+    clave, valores = reserva
+    session.execute(
+        update(RespuestaIdempotente)
+        .where(RespuestaIdempotente.clave == clave, RespuestaIdempotente.estado.is_(None))
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _liberar(clave: str):
+    """Borra la reserva para que un reintento vuelva a ejecutar la operación."""
+    db.session.info.pop("idempotencia", None)
+    db.session.rollback()
+    RespuestaIdempotente.query.filter_by(clave=clave).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _guardar(clave: str, resp):
+    """Guarda la respuesta final asociada a la clave (reemplaza la marca provisoria)."""
+    db.session.info.pop("idempotencia", None)
+    db.session.rollback()  # 🧹 descarta cualquier estado pendiente de la vista
+    RespuestaIdempotente.query.filter_by(clave=clave).update(
+        {
+            "estado": resp.status_code,
+            "cuerpo": resp.get_data(),
+            "tipo_contenido": resp.headers.get("Content-Type"),
+            "ubicacion": resp.headers.get("Location"),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+
+def _reproducir(guardada: RespuestaIdempotente):
+    """Reconstruye la respuesta original sin volver a ejecutar la escritura."""
+    resp = make_response(guardada.cuerpo or b"", guardada.estado)
+    if guardada.tipo_contenido:
+        resp.headers["Content-Type"] = guardada.tipo_contenido
+    if guardada.ubicacion:
+        resp.headers["Location"] = guardada.ubicacion
+    resp.headers["Idempotent-Replay"] = "true"
+    return resp
+
+
+def idempotente(vista):
+    """
+    Decorador para POST que mueven dinero. Si la petición trae Idempotency-Key
+    (o el campo idempotency_key) y ya se procesó, devuelve la respuesta
+    guardada en vez de registrar otro abono o movimiento.
+    """
+    @wraps(vista)
+    def wrapper(*args, **kwargs):
+        clave = _clave_de_la_peticion()
+        if not clave:
+            return vista(*args, **kwargs)
+
+        guardada = _reclamar(clave)
+        if guardada is not None:
+            if guardada.estado is None:
+                return jsonify({"ok": False, "error": "La operación anterior aún está en proceso."}), 409
+            return _reproducir(guardada)
+
+        # 📌 El primer commit de la vista deja también la marca provisoria
+        db.session.info["idempotencia"] = (clave, _marca_provisoria())
+        try:
+            resp = make_response(vista(*args, **kwargs))
+        except Exception:
+            _liberar(clave)
+            raise
+
+        if resp.status_code >= 500:
+            _liberar(clave)
+        else:
+            _guardar(clave, resp)
+        return resp
+    return wrapper
+
+
+# ---------------------------------------------------
+# 🧹 Limpieza de respuestas vencidas
+# ---------------------------------------------------
+def purgar_respuestas_vencidas():
+    """Elimina las respuestas cuya vigencia ya terminó. Devuelve cuántas borró."""
+    borradas = RespuestaIdempotente.query.filter(
+        RespuestaIdempotente.expira <= hora_actual()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return borradas
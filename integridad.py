@@ -0,0 +1,321 @@
+# ======================================================
+# integridad.py — revisión de invariantes de toda la cartera en una pasada
+# ======================================================
+# Pocas consultas agregadas (una por tabla) recorridas en streaming; cada
+# violación sale apenas se encuentra. Reglas:
+# - cliente_saldo:            Cliente.saldo = Σ saldos de sus préstamos vivos
+# - cliente_cancelado_con_saldo / cliente_activo_sin_saldo: bandera cancelado
+# - prestamo_saldo_negativo:  saldo ≥ 0
+# - prestamo_saldo_formula:   saldo = monto + interés + intereses mensuales − Σ abonos
+# - liquidacion_caja:         caja = caja_manual + neto del día
+# - liquidacion_arrastre:     caja_manual = caja final del día anterior
+# - liquidacion_diario:       totales del día = Σ eventos del diario de dinero
+# - liquidacion_checksum:     día cerrado sin modificar después del cierre
+# - caja_abono_mal_clasificado: entrada_manual que en realidad es un abono
+# guion_sql() arma un script de corrección por lotes para las reglas que
+# tienen corrección directa; el resto se corrige reproduciendo el diario.
+# El script sella version/actualizado (sync y ETags ven el cambio) y anota
+# en el diario los ajustes de saldo, así diario-reproducir no lo deshace.
+
+from collections import defaultdict
+from sqlalchemy import select, func, case, and_, or_
+from extensions import db
+from modelos import Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion, LiquidacionFranja, EventoDinero
+from helpers import CAMPOS_LIQUIDACION, _neto
+from diario import plegar_saldo, ultima_secuencia
+from tiempo import hora_actual, local_date
+from cierre import calcular_checksum
+
+# 🎯 Diferencia mínima que cuenta como violación
+TOLERANCIA = 0.005
+
+# 📦 Filas leídas por tanda / ids por sentencia del script
+LOTE = 1000
+LOTE_SQL = 500
+
+CAMPOS = tuple(CAMPOS_LIQUIDACION.values())
+
+
+def _violacion(regla, tabla, fila_id, actual=None, esperado=None, severidad="error", **detalle):
+    return {
+        "regla": regla, "severidad": severidad, "tabla": tabla, "id": fila_id,
+        "actual": None if actual is None else round(float(actual), 2),
+        "esperado": None if esperado is None else round(float(esperado), 2),
+        **detalle,
+    }
+
+
+def _leer(consulta):
+    return db.session.execute(consulta.execution_options(yield_per=LOTE))
+
+
+def _distinto(a, b):
+    return abs((a or 0.0) - (b or 0.0)) >= TOLERANCIA
+
+
+# ---------------------------------------------------
+# 👤 Clientes (1 consulta)
+# ---------------------------------------------------
+def _revisar_clientes():
+    c, p = Cliente.__table__, Prestamo.__table__
+    sumas = (
+        select(p.c.cliente_id, func.sum(p.c.saldo).label("suma"), func.count(p.c.id).label("vivos"))
+        .where(p.c.archivado == db.false())
+        .group_by(p.c.cliente_id)
+        .subquery()
+    )
+    suma = func.coalesce(sumas.c.suma, 0.0)
+    vivos = func.coalesce(sumas.c.vivos, 0)
+    for cid, nombre, saldo, cancelado, total, n in _leer(
+        select(c.c.id, c.c.nombre, c.c.saldo, c.c.cancelado, suma, vivos)
+        .select_from(c.outerjoin(sumas, sumas.c.cliente_id == c.c.id))
+        .where(c.c.archivado == db.false(), or_(
+            func.abs(func.coalesce(c.c.saldo, 0.0) - suma) >= TOLERANCIA,
+            and_(c.c.cancelado == db.true(), suma >= TOLERANCIA),
+            and_(c.c.cancelado == db.false(), vivos > 0, suma < TOLERANCIA),
+        ))
+        .order_by(c.c.id)
+    ):
+        total = 0.0 if total < TOLERANCIA else total
+        if _distinto(saldo, total):
+            yield _violacion("cliente_saldo", "cliente", cid, saldo, total, nombre=nombre)
+        if cancelado and total >= TOLERANCIA:
+            yield _violacion("cliente_cancelado_con_saldo", "cliente", cid, nombre=nombre, saldo=round(total, 2))
+        if not cancelado and n and total < TOLERANCIA:
+            yield _violacion("cliente_activo_sin_saldo", "cliente", cid, nombre=nombre, severidad="aviso")
+
+
+# ---------------------------------------------------
+# 💳 Préstamos (1 consulta)
+# ---------------------------------------------------
+def _revisar_prestamos():
+    p, a, m = Prestamo.__table__, Abono.__table__, MovimientoCaja.__table__
+    abonos = (
+        select(a.c.prestamo_id, func.sum(a.c.monto).label("total"))
+        .group_by(a.c.prestamo_id).subquery()
+    )
+    intereses = (
+        select(m.c.prestamo_id, func.sum(m.c.monto).label("total"))
+        .where(m.c.tipo == "entrada_manual", m.c.prestamo_id.isnot(None))
+        .group_by(m.c.prestamo_id).subquery()
+    )
+    bruto = (
+        p.c.monto + p.c.monto * func.coalesce(p.c.interes, 0.0) / 100
+        + func.coalesce(intereses.c.total, 0.0) - func.coalesce(abonos.c.total, 0.0)
+    )
+    esperado = case((bruto > 0, bruto), else_=0.0)
+    saldo = func.coalesce(p.c.saldo, 0.0)
+    for pid, cid, actual, calculado in _leer(
+        select(p.c.id, p.c.cliente_id, saldo, esperado)
+        .select_from(
+            p.outerjoin(abonos, abonos.c.prestamo_id == p.c.id)
+            .outerjoin(intereses, intereses.c.prestamo_id == p.c.id)
+        )
+        .where(p.c.archivado == db.false(),
+               or_(saldo < 0, func.abs(saldo - esperado) >= TOLERANCIA))
+        .order_by(p.c.id)
+    ):
+        if actual < 0:
+            yield _violacion("prestamo_saldo_negativo", "prestamo", pid, actual, 0.0, cliente_id=cid)
+        else:
+            # ⚠️ Aviso: reactivaciones y ediciones de monto también mueven el saldo
+            yield _violacion("prestamo_saldo_formula", "prestamo", pid, actual, calculado,
+                             severidad="aviso", cliente_id=cid)
+
+
+# ---------------------------------------------------
+# 📊 Liquidaciones (fila + franjas + diario, 1 consulta)
+# ---------------------------------------------------
+def _revisar_liquidaciones():
+    l, f, e = Liquidacion.__table__, LiquidacionFranja.__table__, EventoDinero.__table__
+    franjas = (
+        select(f.c.fecha, *[func.sum(f.c[c]).label(c) for c in CAMPOS])
+        .group_by(f.c.fecha).subquery()
+    )
+    con_diario = db.session.query(EventoDinero.id).first() is not None
+    diario = (
+        select(e.c.dia, *[
+            func.sum(case((e.c.campo == c, e.c.monto), else_=0.0)).label(c) for c in CAMPOS
+        ]).group_by(e.c.dia).subquery()
+    )
+    columnas = [l.c.fecha, l.c.cerrada, l.c.checksum, l.c.caja_manual, l.c.caja,
+                *[l.c[c] for c in CAMPOS],
+                *[func.coalesce(franjas.c[c], 0.0) for c in CAMPOS],
+                *[func.coalesce(diario.c[c], 0.0) for c in CAMPOS]]
+    n = len(CAMPOS)
+    caja_previa = None
+    for fila in _leer(
+        select(*columnas)
+        .select_from(
+            l.outerjoin(franjas, franjas.c.fecha == l.c.fecha)
+            .outerjoin(diario, diario.c.dia == l.c.fecha)
+        )
+        .order_by(l.c.fecha)
+    ):
+        fecha, cerrada, checksum, caja_manual, caja = fila[:5]
+        propios = dict(zip(CAMPOS, (v or 0.0 for v in fila[5:5 + n])))
+        pendientes = dict(zip(CAMPOS, fila[5 + n:5 + 2 * n]))
+        del_diario = dict(zip(CAMPOS, fila[5 + 2 * n:]))
+        caja_manual, caja = caja_manual or 0.0, caja or 0.0
+        consolidados = {c: propios[c] + pendientes[c] for c in CAMPOS}
+        caja_final = caja + _neto(**pendientes)
+
+        if _distinto(caja, caja_manual + _neto(**propios)):
+            yield _violacion("liquidacion_caja", "liquidacion", fecha.isoformat(),
+                             caja, caja_manual + _neto(**propios), cerrada=bool(cerrada))
+        if caja_previa is not None and _distinto(caja_manual, caja_previa):
+            yield _violacion("liquidacion_arrastre", "liquidacion", fecha.isoformat(),
+                             caja_manual, caja_previa, cerrada=bool(cerrada))
+        if con_diario:
+            for c in CAMPOS:
+                if _distinto(consolidados[c], del_diario[c]):
+                    yield _violacion("liquidacion_diario", "liquidacion", fecha.isoformat(),
+                                     consolidados[c], del_diario[c], campo=c, cerrada=bool(cerrada))
+        if cerrada:
+            transitoria = Liquidacion(fecha=fecha, caja_manual=caja_manual, caja=caja, **propios)
+            if checksum != calcular_checksum(transitoria):
+                yield _violacion("liquidacion_checksum", "liquidacion", fecha.isoformat(), cerrada=True)
+        caja_previa = caja_final
+
+
+# ---------------------------------------------------
+# 💵 Caja (1 consulta)
+# ---------------------------------------------------
+def _revisar_caja():
+    m = MovimientoCaja.__table__
+    for mid, monto, descripcion in _leer(
+        select(m.c.id, m.c.monto, m.c.descripcion)
+        .where(m.c.tipo == "entrada_manual", m.c.archivado == db.false(),
+               m.c.descripcion.ilike("%abono%"))
+        .order_by(m.c.id)
+    ):
+        yield _violacion("caja_abono_mal_clasificado", "movimiento_caja", mid, monto,
+                         descripcion=descripcion)
+
+
+# ---------------------------------------------------
+# 🔎 Revisión completa
+# ---------------------------------------------------
+def revisar():
+    """Generador de violaciones de toda la cartera (dicts), en orden de tabla."""
+    yield from _revisar_clientes()
+    yield from _revisar_prestamos()
+    yield from _revisar_liquidaciones()
+    yield from _revisar_caja()
+
+
+def resumen(violaciones):
+    """{regla: cantidad} de una lista de violaciones."""
+    conteo = defaultdict(int)
+    for v in violaciones:
+        conteo[v["regla"]] += 1
+    return dict(conteo)
+
+
+# ---------------------------------------------------
+# 🛠️ Script de corrección por lotes
+# ---------------------------------------------------
+def _lotes(valores):
+    for i in range(0, len(valores), LOTE_SQL):
+        yield valores[i:i + LOTE_SQL]
+
+
+def _ids(valores):
+    return ", ".join(str(int(v)) for v in valores)
+
+
+def _sello_sql(dialecto):
+    """SET de version/actualizado para las sentencias del script (como versiones.sello())."""
+    if dialecto == "postgresql":
+        return "version = nextval('cambio_version_seq'), actualizado = timezone('America/Santiago', now())"
+    # SQLite: una versión del contador por sentencia
+    return ("version = (SELECT valor FROM version_contador WHERE id = 1), "
+            f"actualizado = '{hora_actual():%Y-%m-%d %H:%M:%S}'")
+
+
+def _contador_sql(dialecto):
+    if dialecto != "postgresql":
+        yield ("INSERT INTO version_contador (id, valor) VALUES (1, 1) "
+               "ON CONFLICT (id) DO UPDATE SET valor = version_contador.valor + 1;")
+
+
+def _ajustes_diario(clientes):
+    """
+    (prestamo_id, cliente_id, delta) para que el pliegue del diario de cada
+    préstamo de `clientes` dé su saldo guardado: el saldo del cliente que fija
+    el script es Σ esos saldos, y diario-reproducir lo recalcula desde el diario.
+    """
+    if not clientes or not ultima_secuencia():
+        return  # 🌱 diario vacío: diario-sembrar lo abre con el estado corregido
+    for lote in _lotes(sorted(clientes)):
+        guardados = {
+            pid: (cid, saldo or 0.0) for pid, cid, saldo in db.session.execute(
+                select(Prestamo.id, Prestamo.cliente_id, Prestamo.saldo).where(Prestamo.cliente_id.in_(lote))
+            )
+        }
+        deltas = defaultdict(list)
+        for pid, delta in db.session.execute(
+            select(EventoDinero.prestamo_id, EventoDinero.delta_saldo)
+            .where(EventoDinero.prestamo_id.in_(list(guardados)))
+            .order_by(EventoDinero.id)
+        ):
+            deltas[pid].append(delta or 0.0)
+        for pid in sorted(guardados):
+            cid, saldo = guardados[pid]
+            plegado = round(plegar_saldo(deltas.get(pid, ())), 2)
+            if _distinto(saldo, plegado):
+                yield pid, cid, round(saldo - plegado, 2)
+
+
+def guion_sql(violaciones, dialecto=None):
+    """
+    Genera (línea por línea) un script SQL que corrige lo que tiene arreglo
+    directo. Lo demás queda como comentario con el comando que lo repara.
+    """
+    dialecto = dialecto or db.engine.dialect.name
+    saldos, activar = {}, []
+    reproducir, otras = set(), defaultdict(list)
+    for v in violaciones:
+        regla = v["regla"]
+        if regla == "cliente_saldo":
+            saldos[v["id"]] = v["esperado"]
+        elif regla == "cliente_cancelado_con_saldo":
+            activar.append(v["id"])
+        elif regla in ("liquidacion_caja", "liquidacion_arrastre", "liquidacion_diario") and not v.get("cerrada"):
+            reproducir.add(v["id"])
+        else:
+            otras[regla].append(v["id"])
+
+    sello = _sello_sql(dialecto)
+    yield "-- 🛠️ Corrección generada por integridad.py"
+    yield "BEGIN;"
+    ids = sorted(saldos)
+    for lote in _lotes(ids):
+        casos = " ".join(f"WHEN {i} THEN {saldos[i]!r}" for i in lote)
+        yield from _contador_sql(dialecto)
+        yield f"UPDATE cliente SET saldo = CASE id {casos} END, {sello} WHERE id IN ({_ids(lote)});"
+    for lote in _lotes(sorted(activar)):
+        yield from _contador_sql(dialecto)
+        yield f"UPDATE cliente SET cancelado = FALSE, {sello} WHERE id IN ({_ids(lote)});"
+
+    # 📒 Ajustes al diario: reproducirlo da los mismos saldos que fija el script
+    ajustes = list(_ajustes_diario(saldos))
+    hoy, ahora = local_date(), hora_actual()
+    for i in range(0, len(ajustes), LOTE_SQL):
+        valores = ", ".join(
+            f"('ajuste_saldo', '{hoy.isoformat()}', '{ahora:%Y-%m-%d %H:%M:%S}', 0.0, {cid}, {pid}, {delta!r}, "
+            "'Corrección de integridad')"
+            for pid, cid, delta in ajustes[i:i + LOTE_SQL]
+        )
+        yield ("INSERT INTO evento_dinero (tipo, dia, fecha, monto, cliente_id, prestamo_id, delta_saldo, descripcion) "
+               f"VALUES {valores};")
+    yield "COMMIT;"
+
+    if reproducir:
+        yield (f"-- 📒 {len(reproducir)} días abiertos con descuadre desde {min(reproducir)}: "
+               f"flask --app app diario-reproducir --aplicar")
+    if otras.get("caja_abono_mal_clasificado"):
+        yield f"-- 🧹 Abonos mal clasificados ({len(otras.pop('caja_abono_mal_clasificado'))}): /reparar_caja"
+    for regla, filas in sorted(otras.items()):
+        muestra = ", ".join(str(i) for i in filas[:20])
+        yield f"-- ⚠️ {regla}: {len(filas)} sin corrección automática (revisar: {muestra})"
@@ -0,0 +1,81 @@
+"""Diario de dinero (evento_dinero, solo INSERT) y puntos de proyección
+
+Revision ID: 0d3f5a7c9e41
+Revises: c7e1a9d3f046
+Create Date: 2025-10-30 09:21:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d3f5a7c9e41'
+down_revision = 'c7e1a9d3f046'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('evento_dinero',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('tipo', sa.String(length=30), nullable=False),
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=True),
+    sa.Column('campo', sa.String(length=20), nullable=True),
+    sa.Column('monto', sa.Float(), nullable=False),
+    sa.Column('cliente_id', sa.Integer(), nullable=True),
+    sa.Column('prestamo_id', sa.Integer(), nullable=True),
+    sa.Column('delta_saldo', sa.Float(), nullable=False),
+    sa.Column('referencia_id', sa.Integer(), nullable=True),
+    sa.Column('descripcion', sa.String(length=200), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('evento_dinero', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_evento_dinero_tipo'), ['tipo'], unique=False)
+        batch_op.create_index(batch_op.f('ix_evento_dinero_dia'), ['dia'], unique=False)
+        batch_op.create_index(batch_op.f('ix_evento_dinero_cliente_id'), ['cliente_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_evento_dinero_prestamo_id'), ['prestamo_id'], unique=False)
+
+    op.create_table('proyeccion_punto',
+    sa.Column('nombre', sa.String(length=50), nullable=False),
+    sa.Column('secuencia', sa.BigInteger(), nullable=False),
+    sa.Column('actualizado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+
+    # 🚫 Solo INSERT: UPDATE y DELETE se rechazan en la propia base
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            CREATE OR REPLACE FUNCTION evento_dinero_solo_agregar() RETURNS trigger AS $$
+            BEGIN
+                RAISE EXCEPTION 'evento_dinero solo admite INSERT';
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER evento_dinero_solo_agregar
+                BEFORE UPDATE OR DELETE ON evento_dinero
+                FOR EACH ROW EXECUTE FUNCTION evento_dinero_solo_agregar()
+        """)
+    else:
+        for accion in ('UPDATE', 'DELETE'):
+            op.execute(
+                f"CREATE TRIGGER evento_dinero_sin_{accion.lower()} BEFORE {accion} ON evento_dinero "
+                f"BEGIN SELECT RAISE(ABORT, 'evento_dinero solo admite INSERT'); END"
+            )
+    # 🌱 Los eventos de apertura los escribe diario.sembrar() al arrancar la app
+
+
+def downgrade():
+    op.drop_table('proyeccion_punto')
+
+    with op.batch_alter_table('evento_dinero', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_evento_dinero_prestamo_id'))
+        batch_op.drop_index(batch_op.f('ix_evento_dinero_cliente_id'))
+        batch_op.drop_index(batch_op.f('ix_evento_dinero_dia'))
+        batch_op.drop_index(batch_op.f('ix_evento_dinero_tipo'))
+
+    op.drop_table('evento_dinero')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP FUNCTION IF EXISTS evento_dinero_solo_agregar()")
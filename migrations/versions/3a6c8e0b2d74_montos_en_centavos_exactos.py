@@ -0,0 +1,67 @@
+"""Montos en centavos exactos (Float → NUMERIC(14, 2))
+
+Revision ID: 3a6c8e0b2d74
+Revises: 2f5b7d9c1a63
+Create Date: 2025-11-03 08:47:12.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a6c8e0b2d74'
+down_revision = '2f5b7d9c1a63'
+branch_labels = None
+depends_on = None
+
+
+_LIQUIDACION = ['entradas', 'entradas_caja', 'salidas', 'gastos', 'prestamos_hoy']
+
+# tabla → columnas de dinero (Prestamo.interes es un porcentaje y sigue Float)
+MONTOS = {
+    'cliente': ['saldo'],
+    'prestamo': ['monto', 'saldo'],
+    'prestamo_archivo': ['monto', 'saldo'],
+    'abono': ['monto'],
+    'abono_archivo': ['monto'],
+    'movimiento_caja': ['monto'],
+    'movimiento_caja_archivo': ['monto'],
+    'liquidacion': _LIQUIDACION + ['caja', 'caja_manual'],
+    'liquidacion_semanal': _LIQUIDACION + ['caja_inicial', 'caja_final'],
+    'liquidacion_mensual': _LIQUIDACION + ['caja_inicial', 'caja_final'],
+    'liquidacion_franja': _LIQUIDACION,
+    'evento_dinero': ['monto', 'delta_saldo'],
+}
+
+
+def _cambiar(tipo_nuevo, tipo_anterior, usar):
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for tabla, columnas in MONTOS.items():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            for columna in columnas:
+                # 💵 round(x::numeric, 2): cada valor queda en su centavo más cercano
+                extra = {'postgresql_using': usar.format(c=columna)} if postgresql else {}
+                batch_op.alter_column(columna, type_=tipo_nuevo, existing_type=tipo_anterior, **extra)
+    if not postgresql:
+        # SQLite guarda REAL: redondear los valores existentes (antes de reponer
+        # los triggers de evento_dinero, que el modo batch recreó sin ellos)
+        for tabla, columnas in MONTOS.items():
+            op.execute(f"UPDATE {tabla} SET " + ", ".join(f"{c} = round({c}, 2)" for c in columnas))
+        # 🚫 Triggers de solo INSERT del diario
+        for accion in ('UPDATE', 'DELETE'):
+            op.execute(f"DROP TRIGGER IF EXISTS evento_dinero_sin_{accion.lower()}")
+            op.execute(
+                f"CREATE TRIGGER evento_dinero_sin_{accion.lower()} BEFORE {accion} ON evento_dinero "
+                f"BEGIN SELECT RAISE(ABORT, 'evento_dinero solo admite INSERT'); END"
+            )
+
+
+def upgrade():
+    # En PostgreSQL, ALTER ... TYPE sobre abono / movimiento_caja (particionadas)
+    # se propaga a todas las particiones; no dispara los triggers de fila.
+    _cambiar(sa.Numeric(precision=14, scale=2), sa.Float(), 'round({c}::numeric, 2)')
+
+
+def downgrade():
+    _cambiar(sa.Float(), sa.Numeric(precision=14, scale=2), '{c}::double precision')
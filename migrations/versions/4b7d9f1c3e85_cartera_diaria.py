@@ -0,0 +1,37 @@
+"""Foto diaria de la cartera (cartera_diaria)
+
+Revision ID: 4b7d9f1c3e85
+Revises: 3a6c8e0b2d74
+Create Date: 2025-11-05 07:58:31.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7d9f1c3e85'
+down_revision = '3a6c8e0b2d74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cartera_diaria',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('cartera', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('clientes_activos', sa.Integer(), nullable=False),
+    sa.Column('prestamos_activos', sa.Integer(), nullable=False),
+    sa.Column('morosos', sa.Integer(), nullable=False),
+    sa.Column('monto_atrasado', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('vencidos', sa.Integer(), nullable=False),
+    sa.Column('dias_atraso_promedio', sa.Float(), nullable=False),
+    sa.Column('capturado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('fecha')
+    )
+
+
+def downgrade():
+    op.drop_table('cartera_diaria')
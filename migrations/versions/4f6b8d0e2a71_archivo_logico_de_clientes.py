@@ -0,0 +1,89 @@
+"""Archivo lógico de clientes + tablas de archivo
+
+Revision ID: 4f6b8d0e2a71
+Revises: 9a7c3e5b2f14
+Create Date: 2025-10-27 16:40:02.915377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6b8d0e2a71'
+down_revision = '9a7c3e5b2f14'
+branch_labels = None
+depends_on = None
+
+VIVO_PG = sa.text('NOT archivado')
+VIVO_SQLITE = sa.text('archivado = 0')
+
+# índice parcial → (tabla, columnas)
+INDICES_VIVOS = {
+    'ix_prestamo_vivo_cliente': ('prestamo', ['cliente_id']),
+    'ix_abono_vivo_fecha': ('abono', ['fecha']),
+    'ix_abono_vivo_prestamo': ('abono', ['prestamo_id']),
+    'ix_movimiento_caja_vivo_fecha': ('movimiento_caja', ['fecha', 'tipo']),
+}
+
+
+def _columnas_archivo(tabla):
+    """Copia de las columnas de la tabla viva (estado tras la migración anterior)."""
+    comunes = [
+        sa.Column('version', sa.BigInteger(), nullable=True),
+        sa.Column('actualizado', sa.DateTime(), nullable=True),
+        sa.Column('archivado', sa.Boolean(), nullable=False),
+        sa.Column('archivado_en', sa.DateTime(), nullable=True),
+    ]
+    propias = {
+        'prestamo': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('cliente_id', sa.Integer(), nullable=False),
+            sa.Column('monto', sa.Float(), nullable=False),
+            sa.Column('interes', sa.Float(), nullable=True),
+            sa.Column('plazo', sa.Integer(), nullable=True),
+            sa.Column('fecha', sa.Date(), nullable=True),
+            sa.Column('saldo', sa.Float(), nullable=True),
+            sa.Column('frecuencia', sa.String(length=20), nullable=True),
+            sa.Column('ultima_aplicacion_interes', sa.Date(), nullable=True),
+        ],
+        'abono': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('prestamo_id', sa.Integer(), nullable=False),
+            sa.Column('monto', sa.Float(), nullable=False),
+            sa.Column('fecha', sa.DateTime(), nullable=True),
+        ],
+        'movimiento_caja': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('tipo', sa.String(length=20), nullable=False),
+            sa.Column('monto', sa.Float(), nullable=False),
+            sa.Column('descripcion', sa.String(length=255), nullable=True),
+            sa.Column('fecha', sa.DateTime(), nullable=True),
+        ],
+    }[tabla]
+    return propias + comunes + [sa.PrimaryKeyConstraint('id')]
+
+
+def upgrade():
+    for tabla in ['cliente', 'prestamo', 'abono', 'movimiento_caja']:
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('archivado', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    for nombre, (tabla, columnas) in INDICES_VIVOS.items():
+        op.create_index(nombre, tabla, columnas, unique=False,
+                        postgresql_where=VIVO_PG, sqlite_where=VIVO_SQLITE)
+
+    for tabla in ['prestamo', 'abono', 'movimiento_caja']:
+        op.create_table(f'{tabla}_archivo', *_columnas_archivo(tabla))
+
+
+def downgrade():
+    for tabla in ['movimiento_caja', 'abono', 'prestamo']:
+        op.drop_table(f'{tabla}_archivo')
+
+    for nombre, (tabla, _) in INDICES_VIVOS.items():
+        op.drop_index(nombre, table_name=tabla)
+
+    for tabla in ['movimiento_caja', 'abono', 'prestamo', 'cliente']:
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_column('archivado')
@@ -0,0 +1,35 @@
+"""Día original de los movimientos trasladados a otro día (evento_dinero.dia_origen)
+
+Revision ID: 5c8e0a2d4f96
+Revises: 4b7d9f1c3e85
+Create Date: 2025-11-06 09:12:44.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e0a2d4f96'
+down_revision = '4b7d9f1c3e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sin batch_alter_table: en SQLite ADD COLUMN no recrea la tabla y los
+    # triggers de solo INSERT de evento_dinero se conservan
+    op.add_column('evento_dinero', sa.Column('dia_origen', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('evento_dinero', schema=None) as batch_op:
+        batch_op.drop_column('dia_origen')
+    if op.get_bind().dialect.name != 'postgresql':
+        # 🚫 El modo batch recreó la tabla sin los triggers de solo INSERT
+        for accion in ('UPDATE', 'DELETE'):
+            op.execute(f"DROP TRIGGER IF EXISTS evento_dinero_sin_{accion.lower()}")
+            op.execute(
+                f"CREATE TRIGGER evento_dinero_sin_{accion.lower()} BEFORE {accion} ON evento_dinero "
+                f"BEGIN SELECT RAISE(ABORT, 'evento_dinero solo admite INSERT'); END"
+            )
@@ -0,0 +1,47 @@
+"""Versiones de cambio en cliente (sync offline)
+
+Revision ID: 5d2e8f6a1c37
+Revises: 8c41d7e2a9b0
+Create Date: 2025-10-26 18:05:51.730214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8f6a1c37'
+down_revision = '8c41d7e2a9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE SEQUENCE IF NOT EXISTS cambio_version_seq')
+
+    op.create_table('version_contador',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('valor', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.BigInteger(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_cliente_version'), ['version'], unique=False)
+
+    # 🔢 Clientes existentes parten en versión 0
+    op.execute('UPDATE cliente SET version = 0 WHERE version IS NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cliente_version'))
+        batch_op.drop_column('version')
+
+    op.drop_table('version_contador')
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP SEQUENCE IF EXISTS cambio_version_seq')
@@ -0,0 +1,106 @@
+"""Particionar abono y movimiento_caja por mes (solo PostgreSQL)
+
+Revision ID: 6e0a2c4b8d13
+Revises: 4f6b8d0e2a71
+Create Date: 2025-10-28 09:21:37.604118
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e0a2c4b8d13'
+down_revision = '4f6b8d0e2a71'
+branch_labels = None
+depends_on = None
+
+# 📋 tabla → índices a recrear sobre la tabla particionada (nombre, columnas, parcial)
+TABLAS = {
+    'abono': [
+        ('ix_abono_version', 'version', False),
+        ('ix_abono_vivo_fecha', 'fecha', True),
+        ('ix_abono_vivo_prestamo', 'prestamo_id', True),
+    ],
+    'movimiento_caja': [
+        ('ix_movimiento_caja_version', 'version', False),
+        ('ix_movimiento_caja_vivo_fecha', 'fecha, tipo', True),
+    ],
+}
+
+# 📅 Meses futuros que se crean junto con la migración
+MESES_ADELANTE = 3
+
+
+def _mes_siguiente(d):
+    return d.replace(year=d.year + 1, month=1) if d.month == 12 else d.replace(month=d.month + 1)
+
+
+def _crear_indices(tabla):
+    for nombre, columnas, parcial in TABLAS[tabla]:
+        donde = ' WHERE NOT archivado' if parcial else ''
+        op.execute(f'CREATE INDEX {nombre} ON {tabla} ({columnas}){donde}')
+    if tabla == 'abono':
+        op.execute('ALTER TABLE abono ADD CONSTRAINT abono_prestamo_id_fkey '
+                   'FOREIGN KEY (prestamo_id) REFERENCES prestamo (id)')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # 🧪 SQLite (desarrollo local) sigue sin particionar
+        return
+
+    for tabla in TABLAS:
+        vieja = f'{tabla}_sin_particion'
+        op.execute(f'ALTER TABLE {tabla} RENAME TO {vieja}')
+        op.execute(f'UPDATE {vieja} SET fecha = COALESCE(actualizado, now()) WHERE fecha IS NULL')
+
+        op.execute(
+            f'CREATE TABLE {tabla} (LIKE {vieja} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (fecha)'
+        )
+        op.execute(f'CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT')
+
+        # 🧩 Una partición por mes desde el primer registro hasta MESES_ADELANTE
+        primera = bind.execute(sa.text(f'SELECT min(fecha) FROM {vieja}')).scalar()
+        mes = (primera.date() if primera else date.today()).replace(day=1)
+        ultimo = date.today().replace(day=1)
+        for _ in range(MESES_ADELANTE):
+            ultimo = _mes_siguiente(ultimo)
+        while mes <= ultimo:
+            op.execute(
+                f"CREATE TABLE {tabla}_p{mes:%Y_%m} PARTITION OF {tabla} "
+                f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{_mes_siguiente(mes).isoformat()}')"
+            )
+            mes = _mes_siguiente(mes)
+
+        op.execute(f'INSERT INTO {tabla} SELECT * FROM {vieja}')
+
+        # 🔢 La secuencia del id pasa a la tabla nueva antes de borrar la vieja
+        op.execute(f'ALTER SEQUENCE {tabla}_id_seq OWNED BY {tabla}.id')
+        op.execute(f'DROP TABLE {vieja}')
+
+        # 🔑 La PK de una tabla particionada debe incluir la columna de partición
+        op.execute(f'ALTER TABLE {tabla} ALTER COLUMN fecha SET NOT NULL')
+        op.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id, fecha)')
+        _crear_indices(tabla)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    for tabla in TABLAS:
+        particionada = f'{tabla}_particionada'
+        op.execute(f'ALTER TABLE {tabla} RENAME TO {particionada}')
+        op.execute(f'CREATE TABLE {tabla} (LIKE {particionada} INCLUDING DEFAULTS)')
+        op.execute(f'INSERT INTO {tabla} SELECT * FROM {particionada}')
+        op.execute(f'ALTER SEQUENCE {tabla}_id_seq OWNED BY {tabla}.id')
+        op.execute(f'DROP TABLE {particionada} CASCADE')
+
+        op.execute(f'ALTER TABLE {tabla} ALTER COLUMN fecha DROP NOT NULL')
+        op.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id)')
+        _crear_indices(tabla)
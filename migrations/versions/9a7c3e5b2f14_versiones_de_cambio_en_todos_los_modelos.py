@@ -0,0 +1,59 @@
+"""Versiones de cambio en todos los modelos + lápidas de borrado
+
+Revision ID: 9a7c3e5b2f14
+Revises: 5d2e8f6a1c37
+Create Date: 2025-10-27 10:12:40.318552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a7c3e5b2f14'
+down_revision = '5d2e8f6a1c37'
+branch_labels = None
+depends_on = None
+
+TABLAS = ['prestamo', 'abono', 'movimiento_caja', 'liquidacion', 'liquidacion_franja']
+
+
+def upgrade():
+    op.create_table('cambio_borrado',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tabla', sa.String(length=50), nullable=False),
+    sa.Column('fila_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cambio_borrado', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cambio_borrado_version'), ['version'], unique=False)
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actualizado', sa.DateTime(), nullable=True))
+
+    for tabla in TABLAS:
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.BigInteger(), nullable=True))
+            batch_op.add_column(sa.Column('actualizado', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{tabla}_version'), ['version'], unique=False)
+
+        # 🔢 Filas existentes parten en versión 0
+        op.execute(f'UPDATE {tabla} SET version = 0 WHERE version IS NULL')
+
+
+def downgrade():
+    for tabla in reversed(TABLAS):
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{tabla}_version'))
+            batch_op.drop_column('actualizado')
+            batch_op.drop_column('version')
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_column('actualizado')
+
+    with op.batch_alter_table('cambio_borrado', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cambio_borrado_version'))
+
+    op.drop_table('cambio_borrado')
@@ -0,0 +1,77 @@
+"""Resúmenes semanales y mensuales de liquidación
+
+Revision ID: b2d4f6a8c035
+Revises: 6e0a2c4b8d13
+Create Date: 2025-10-28 15:03:11.482930
+
+"""
+from datetime import timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c035'
+down_revision = '6e0a2c4b8d13'
+branch_labels = None
+depends_on = None
+
+CAMPOS = ['entradas', 'entradas_caja', 'salidas', 'gastos', 'prestamos_hoy']
+
+
+def _columnas():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inicio', sa.Date(), nullable=False),
+        sa.Column('fin', sa.Date(), nullable=False),
+        sa.Column('dias', sa.Integer(), nullable=True),
+        *[sa.Column(c, sa.Float(), nullable=True) for c in CAMPOS],
+        sa.Column('primera_fecha', sa.Date(), nullable=True),
+        sa.Column('ultima_fecha', sa.Date(), nullable=True),
+        sa.Column('caja_inicial', sa.Float(), nullable=True),
+        sa.Column('caja_final', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('inicio'),
+    ]
+
+
+def _semana(f):
+    inicio = f - timedelta(days=f.weekday())
+    return inicio, inicio + timedelta(days=6)
+
+
+def _mes(f):
+    inicio = f.replace(day=1)
+    siguiente = inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    return inicio, siguiente - timedelta(days=1)
+
+
+def upgrade():
+    semanal = op.create_table('liquidacion_semanal', *_columnas())
+    mensual = op.create_table('liquidacion_mensual', *_columnas())
+
+    # 📆 Carga inicial desde las liquidaciones diarias existentes
+    bind = op.get_bind()
+    filas = bind.execute(sa.text(
+        'SELECT fecha, caja_manual, caja, ' + ', '.join(CAMPOS) + ' FROM liquidacion ORDER BY fecha'
+    )).all()
+    for tabla, limites in ((semanal, _semana), (mensual, _mes)):
+        periodos = {}
+        for f in filas:
+            inicio, fin = limites(f.fecha)
+            p = periodos.setdefault(inicio, {
+                'inicio': inicio, 'fin': fin, 'dias': 0, **{c: 0.0 for c in CAMPOS},
+                'primera_fecha': f.fecha, 'caja_inicial': float(f.caja_manual or 0.0),
+            })
+            p['dias'] += 1
+            for c in CAMPOS:
+                p[c] += float(getattr(f, c) or 0.0)
+            p['ultima_fecha'] = f.fecha
+            p['caja_final'] = float(f.caja or 0.0)
+        if periodos:
+            op.bulk_insert(tabla, list(periodos.values()))
+
+
+def downgrade():
+    op.drop_table('liquidacion_mensual')
+    op.drop_table('liquidacion_semanal')
@@ -0,0 +1,30 @@
+"""Cierre diario de liquidación (cerrada, checksum)
+
+Revision ID: c7e1a9d3f046
+Revises: b2d4f6a8c035
+Create Date: 2025-10-29 08:47:55.210634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1a9d3f046'
+down_revision = 'b2d4f6a8c035'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('liquidacion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cerrada', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('cerrada_en', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('checksum', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('liquidacion', schema=None) as batch_op:
+        batch_op.drop_column('checksum')
+        batch_op.drop_column('cerrada_en')
+        batch_op.drop_column('cerrada')
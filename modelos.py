@@ -2,9 +2,26 @@
 # modelos.py — versión FINAL (Créditos System, hora Chile 🇨🇱)
 # ======================================================
 
+from sqlalchemy import DDL, event
 from extensions import db
+from dinero import Dinero  # 💵 centavos exactos
+from calendario import DIAS_POR_PERIODO, cuotas_vencidas
 from tiempo import hora_actual, local_date  # ✅ Hora y fecha local chilena
 
+
+def _indice_vivo(nombre, *columnas):
+    """Índice parcial solo sobre filas no archivadas (las que leen las consultas vivas)."""
+    return db.Index(
+        nombre, *columnas,
+        postgresql_where=db.text("NOT archivado"),
+        sqlite_where=db.text("archivado = 0"),
+    )
+
+
+def _columna_archivado():
+    return db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
 # ---------------------------------------------------
 # 🧍‍♂️ CLIENTE
 # ---------------------------------------------------
@@ -19,9 +36,13 @@ class Cliente(db.Model):
     orden = db.Column(db.Integer)
     fecha_creacion = db.Column(db.Date, default=local_date)  # ✅ Fecha local
     cancelado = db.Column(db.Boolean, default=False)
-    saldo = db.Column(db.Float, default=0.0)
+    saldo = db.Column(Dinero, default=0.0)
     ultimo_abono_fecha = db.Column(db.Date)
+    version = db.Column(db.BigInteger, default=0, index=True)  # 🔢 versión de cambio (sync)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    archivado = _columna_archivado()  # 🗄️ eliminado: su historial queda archivado
 
+    # 🔹 Solo préstamos no archivados (filtro global en archivo.py)
     prestamos = db.relationship("Prestamo", backref="cliente", lazy=True)
 
     # ---------------------------------------------------
@@ -55,12 +76,7 @@ class Cliente(db.Model):
             return 0.0
 
         frecuencia = (u.frecuencia or "diario").lower()
-        dias_por_periodo = {
-            "diario": 1,
-            "semanal": 7,
-            "quincenal": 15,
-            "mensual": 30,
-        }.get(frecuencia, 1)
+        dias_por_periodo = DIAS_POR_PERIODO.get(frecuencia, 1)
 
         numero_cuotas = max(1, u.plazo // dias_por_periodo)
         total_con_interes = u.monto + (u.monto * (u.interes or 0) / 100)
@@ -77,21 +93,12 @@ class Cliente(db.Model):
         if not u.plazo or not u.fecha:
             return 0
 
-        from tiempo import local_date
-        dias_pasados = (local_date() - u.fecha).days
         frecuencia = (u.frecuencia or "diario").lower()
+        if frecuencia not in DIAS_POR_PERIODO:
+            return 0
 
-        if frecuencia == "diario":
-            cuotas = dias_pasados
-        elif frecuencia == "semanal":
-            cuotas = dias_pasados // 7
-        elif frecuencia == "quincenal":
-            cuotas = dias_pasados // 15
-        elif frecuencia == "mensual":
-            cuotas = dias_pasados // 30
-        else:
-            cuotas = 0
-
+        # 📅 Sin domingos ni feriados: una cuota que cae en día sin cobro vence el siguiente
+        cuotas = int(cuotas_vencidas(u.fecha, frecuencia))
         return min(cuotas, u.plazo)
 
     def ultimo_abono_monto(self):
@@ -108,16 +115,20 @@ class Cliente(db.Model):
 
 class Prestamo(db.Model):
     __tablename__ = "prestamo"
+    __table_args__ = (_indice_vivo("ix_prestamo_vivo_cliente", "cliente_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey("cliente.id"), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
-    interes = db.Column(db.Float, default=0.0)
+    monto = db.Column(Dinero, nullable=False)
+    interes = db.Column(db.Float, default=0.0)  # % (no es dinero)
     plazo = db.Column(db.Integer)
     fecha = db.Column(db.Date, default=local_date)  # ✅ Fecha local de Chile
-    saldo = db.Column(db.Float, default=0.0)
+    saldo = db.Column(Dinero, default=0.0)
     frecuencia = db.Column(db.String(20), default="diario")
     ultima_aplicacion_interes = db.Column(db.Date, default=local_date)  # 🕒 Nuevo
+    version = db.Column(db.BigInteger, default=0, index=True)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    archivado = _columna_archivado()
 
     # ✅ Relación corregida: elimina abonos al borrar préstamo
     abonos = db.relationship(
@@ -132,11 +143,19 @@ class Prestamo(db.Model):
 # ---------------------------------------------------
 class Abono(db.Model):
     __tablename__ = "abono"
+    # 🧩 En PostgreSQL está particionada por mes (PK real: id, fecha) — ver particiones.py
+    __table_args__ = (
+        _indice_vivo("ix_abono_vivo_fecha", "fecha"),
+        _indice_vivo("ix_abono_vivo_prestamo", "prestamo_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     prestamo_id = db.Column(db.Integer, db.ForeignKey("prestamo.id"), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
+    monto = db.Column(Dinero, nullable=False)
     fecha = db.Column(db.DateTime(timezone=False), default=hora_actual)  # ✅ Hora real de Chile sin tzinfo
+    version = db.Column(db.BigInteger, default=0, index=True)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    archivado = _columna_archivado()
 
 
 # ---------------------------------------------------
@@ -144,12 +163,18 @@ class Abono(db.Model):
 # ---------------------------------------------------
 class MovimientoCaja(db.Model):
     __tablename__ = "movimiento_caja"
+    # 🧩 En PostgreSQL está particionada por mes (PK real: id, fecha) — ver particiones.py
+    __table_args__ = (_indice_vivo("ix_movimiento_caja_vivo_fecha", "fecha", "tipo"),)
 
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
+    monto = db.Column(Dinero, nullable=False)
     descripcion = db.Column(db.String(255))
     fecha = db.Column(db.DateTime(timezone=False), default=hora_actual)  # ✅ Igual que Deicton
+    prestamo_id = db.Column(db.Integer, index=True)  # préstamo de origen (sin FK: puede pasar al archivo)
+    version = db.Column(db.BigInteger, default=0, index=True)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    archivado = _columna_archivado()
 
 
 # ---------------------------------------------------
@@ -160,13 +185,20 @@ class Liquidacion(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     fecha = db.Column(db.Date, unique=True, nullable=False)
-    entradas = db.Column(db.Float, default=0.0)
-    entradas_caja = db.Column(db.Float, default=0.0)
-    salidas = db.Column(db.Float, default=0.0)
-    gastos = db.Column(db.Float, default=0.0)
-    caja = db.Column(db.Float, default=0.0)
-    caja_manual = db.Column(db.Float, default=0.0)
-    prestamos_hoy = db.Column(db.Float, default=0.0)
+    entradas = db.Column(Dinero, default=0.0)
+    entradas_caja = db.Column(Dinero, default=0.0)
+    salidas = db.Column(Dinero, default=0.0)
+    gastos = db.Column(Dinero, default=0.0)
+    caja = db.Column(Dinero, default=0.0)
+    caja_manual = db.Column(Dinero, default=0.0)
+    prestamos_hoy = db.Column(Dinero, default=0.0)
+    version = db.Column(db.BigInteger, default=0, index=True)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+
+    # 🔒 Cierre diario: una vez cerrada la fila no se vuelve a recalcular
+    cerrada = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    cerrada_en = db.Column(db.DateTime(timezone=False))
+    checksum = db.Column(db.String(64))
 
     @property
     def total_abonos(self):
@@ -191,3 +223,243 @@ class Liquidacion(db.Model):
     @property
     def total_caja(self):
         return self.caja or 0.0
+
+
+# ---------------------------------------------------
+# 📆 RESÚMENES SEMANALES / MENSUALES DE LIQUIDACIÓN
+# ---------------------------------------------------
+class _PeriodoLiquidacion:
+    """Totales de las liquidaciones diarias de un periodo (los mantiene periodos.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    inicio = db.Column(db.Date, unique=True, nullable=False)  # lunes o día 1
+    fin = db.Column(db.Date, nullable=False)
+    dias = db.Column(db.Integer, default=0)
+    entradas = db.Column(Dinero, default=0.0)
+    entradas_caja = db.Column(Dinero, default=0.0)
+    salidas = db.Column(Dinero, default=0.0)
+    gastos = db.Column(Dinero, default=0.0)
+    prestamos_hoy = db.Column(Dinero, default=0.0)
+    primera_fecha = db.Column(db.Date)
+    ultima_fecha = db.Column(db.Date)
+    caja_inicial = db.Column(Dinero, default=0.0)  # caja_manual del primer día
+    caja_final = db.Column(Dinero, default=0.0)    # caja del último día
+
+    # 🔹 Mismos nombres que Liquidacion para reutilizar plantillas y totales
+    @property
+    def fecha(self):
+        return self.inicio
+
+    @property
+    def caja(self):
+        return self.caja_final
+
+    @property
+    def caja_manual(self):
+        return self.caja_inicial
+
+
+class LiquidacionSemanal(_PeriodoLiquidacion, db.Model):
+    __tablename__ = "liquidacion_semanal"
+
+
+class LiquidacionMensual(_PeriodoLiquidacion, db.Model):
+    __tablename__ = "liquidacion_mensual"
+
+# ---------------------------------------------------
+# 📈 FOTO DIARIA DE LA CARTERA (cartera.py, al cierre)
+# ---------------------------------------------------
+class CarteraDiaria(db.Model):
+    """Estado de la cartera al final de un día: una fila por día, no se recalcula."""
+    __tablename__ = "cartera_diaria"
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, unique=True, nullable=False)
+    cartera = db.Column(Dinero, nullable=False, default=0.0)        # Σ saldos vivos
+    clientes_activos = db.Column(db.Integer, nullable=False, default=0)
+    prestamos_activos = db.Column(db.Integer, nullable=False, default=0)
+    morosos = db.Column(db.Integer, nullable=False, default=0)        # clientes con cuotas impagas vencidas
+    monto_atrasado = db.Column(Dinero, nullable=False, default=0.0)
+    vencidos = db.Column(db.Integer, nullable=False, default=0)       # préstamos con saldo pasada la última cuota
+    dias_atraso_promedio = db.Column(db.Float, nullable=False, default=0.0)
+    capturado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+
+
+# ---------------------------------------------------
+# 🧮 FRANJAS DE LIQUIDACIÓN (contadores por worker)
+# ---------------------------------------------------
+class LiquidacionFranja(db.Model):
+    """
+    Acumuladores parciales del día. Cada worker suma en su propia franja, así
+    los cobradores no compiten por la fila única de Liquidacion; la lectura
+    suma fila + franjas.
+    """
+    __tablename__ = "liquidacion_franja"
+    __table_args__ = (
+        db.UniqueConstraint("fecha", "franja", name="uq_liquidacion_franja_fecha_franja"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    franja = db.Column(db.Integer, nullable=False)
+    entradas = db.Column(Dinero, default=0.0)
+    entradas_caja = db.Column(Dinero, default=0.0)
+    salidas = db.Column(Dinero, default=0.0)
+    gastos = db.Column(Dinero, default=0.0)
+    prestamos_hoy = db.Column(Dinero, default=0.0)
+    version = db.Column(db.BigInteger, default=0, index=True)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+
+
+# ---------------------------------------------------
+# 🔁 RESPUESTAS IDEMPOTENTES (reintentos de POST)
+# ---------------------------------------------------
+class RespuestaIdempotente(db.Model):
+    """Respuesta guardada de un POST con Idempotency-Key; estado NULL = en proceso."""
+    __tablename__ = "respuesta_idempotente"
+
+    id = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(200), unique=True, nullable=False)
+    estado = db.Column(db.Integer)
+    cuerpo = db.Column(db.LargeBinary)
+    tipo_contenido = db.Column(db.String(100))
+    ubicacion = db.Column(db.String(500))
+    creado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    expira = db.Column(db.DateTime(timezone=False), nullable=False, index=True)
+
+
+# ---------------------------------------------------
+# 🔢 CONTADOR GLOBAL DE VERSIONES DE CAMBIO
+# ---------------------------------------------------
+# PostgreSQL usa la secuencia (no bloquea entre transacciones);
+# SQLite usa la fila única de version_contador.
+cambio_version_seq = db.Sequence("cambio_version_seq", metadata=db.metadata)
+
+
+class VersionContador(db.Model):
+    __tablename__ = "version_contador"
+
+    id = db.Column(db.Integer, primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# ---------------------------------------------------
+# 🪦 FILAS BORRADAS (para "cambios desde la versión N")
+# ---------------------------------------------------
+class CambioBorrado(db.Model):
+    """Lápida de una fila eliminada: quien sincroniza sabe que debe quitarla."""
+    __tablename__ = "cambio_borrado"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tabla = db.Column(db.String(50), nullable=False)
+    fila_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    fecha = db.Column(db.DateTime(timezone=False), default=hora_actual)
+
+
+# ---------------------------------------------------
+# 📒 DIARIO DE DINERO (solo se agregan filas)
+# ---------------------------------------------------
+class EventoDinero(db.Model):
+    """
+    Un hecho de dinero con número de secuencia (id). Liquidacion, los saldos de
+    préstamos y clientes y la cartera son proyecciones de este diario (diario.py).
+    - campo / monto: efecto en la liquidación de `dia` (monto con signo).
+    - delta_saldo: efecto en el saldo del préstamo.
+    Nunca se modifica ni se borra: una corrección es otro evento.
+    """
+    __tablename__ = "evento_dinero"
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False, index=True)
+    dia = db.Column(db.Date, nullable=False, index=True)
+    fecha = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    campo = db.Column(db.String(20))
+    monto = db.Column(Dinero, nullable=False, default=0.0)
+    cliente_id = db.Column(db.Integer, index=True)   # sin FK: el préstamo puede pasar al archivo
+    prestamo_id = db.Column(db.Integer, index=True)
+    delta_saldo = db.Column(Dinero, nullable=False, default=0.0)
+    referencia_id = db.Column(db.Integer)           # id del abono / movimiento de origen
+    descripcion = db.Column(db.String(200))
+    dia_origen = db.Column(db.Date)                 # día del movimiento si se sumó a otro (día ya cerrado)
+
+
+class ProyeccionPunto(db.Model):
+    """Última secuencia del diario reproducida por cada proyección."""
+    __tablename__ = "proyeccion_punto"
+
+    nombre = db.Column(db.String(50), primary_key=True)
+    secuencia = db.Column(db.BigInteger, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+
+
+# 🚫 El diario rechaza UPDATE y DELETE también en la base (create_all; en
+# producción lo crea la migración 0d3f5a7c9e41)
+_SOLO_AGREGAR_PG = DDL("""
+CREATE OR REPLACE FUNCTION evento_dinero_solo_agregar() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'evento_dinero solo admite INSERT';
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER evento_dinero_solo_agregar
+    BEFORE UPDATE OR DELETE ON evento_dinero
+    FOR EACH ROW EXECUTE FUNCTION evento_dinero_solo_agregar();
+""")
+event.listen(EventoDinero.__table__, "after_create", _SOLO_AGREGAR_PG.execute_if(dialect="postgresql"))
+for _accion in ("UPDATE", "DELETE"):
+    event.listen(EventoDinero.__table__, "after_create", DDL(
+        f"CREATE TRIGGER evento_dinero_sin_{_accion.lower()} BEFORE {_accion} ON evento_dinero "
+        f"BEGIN SELECT RAISE(ABORT, 'evento_dinero solo admite INSERT'); END"
+    ).execute_if(dialect="sqlite"))
+
+
+# ---------------------------------------------------
+# ⚙️ COLA DE TRABAJOS EN SEGUNDO PLANO (trabajos.py)
+# ---------------------------------------------------
+class Trabajo(db.Model):
+    """
+    Trabajo pesado que corre fuera de la petición (worker del Procfile).
+    Solo puede haber uno pendiente por (tipo, clave): encolar dos veces el
+    mismo recálculo del mismo día deja una sola fila.
+    """
+    __tablename__ = "trabajo"
+    __table_args__ = (
+        db.Index(
+            "uq_trabajo_pendiente", "tipo", "clave", unique=True,
+            postgresql_where=db.text("estado = 'pendiente'"),
+            sqlite_where=db.text("estado = 'pendiente'"),
+        ),
+        db.Index("ix_trabajo_cola", "estado", "disponible_en"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(40), nullable=False)
+    clave = db.Column(db.String(100), nullable=False, default="")
+    datos = db.Column(db.JSON)
+    estado = db.Column(db.String(12), nullable=False, default="pendiente")  # pendiente / en_curso / hecho / fallido
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=5)
+    disponible_en = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    creado = db.Column(db.DateTime(timezone=False), default=hora_actual)
+    iniciado = db.Column(db.DateTime(timezone=False))
+    terminado = db.Column(db.DateTime(timezone=False))
+    error = db.Column(db.Text)
+
+
+# ---------------------------------------------------
+# 🗄️ TABLAS DE ARCHIVO (filas frías movidas por "flask archivar")
+# ---------------------------------------------------
+def _tabla_archivo(modelo):
+    """Copia las columnas de la tabla viva (sin índices ni FKs) + fecha de archivo."""
+    origen = modelo.__table__
+    return db.Table(
+        f"{origen.name}_archivo",
+        db.metadata,
+        *[db.Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False)
+          for c in origen.columns],
+        db.Column("archivado_en", db.DateTime(timezone=False), default=hora_actual),
+    )
+
+
+PrestamoArchivo = _tabla_archivo(Prestamo)
+AbonoArchivo = _tabla_archivo(Abono)
+MovimientoCajaArchivo = _tabla_archivo(MovimientoCaja)
@@ -0,0 +1,194 @@
+# ======================================================
+# pagos.py — servicio atómico de abonos (hora Chile 🇨🇱)
+# ======================================================
+
+import time
+from datetime import timedelta
+from sqlalchemy import insert, update, select, func, case
+from sqlalchemy.orm.util import identity_key
+from extensions import db
+from modelos import Cliente, Prestamo, Abono, MovimientoCaja
+from helpers import acumular_liquidacion
+from versiones import sello
+from tiempo import hora_actual, local_date
+
+# ⏱️ Latencia objetivo por abono (milisegundos)
+LATENCIA_OBJETIVO_MS = 50.0
+
+
+def _expirar(modelo, pk):
+    """Marca como obsoleto el objeto ORM ya cargado (si existe) tras un UPDATE directo."""
+    obj = db.session.identity_map.get(identity_key(modelo, pk))
+    if obj is not None:
+        db.session.expire(obj)
+
+
+# ---------------------------------------------------
+# 🔹 Aplicar interés mensual (una sola sentencia)
+# ---------------------------------------------------
+def aplicar_interes_mensual(prestamo_id: int, nombre_cliente: str):
+    """
+    Suma el interés mensual al préstamo si ya pasaron 30 días desde la última
+    aplicación. El UPDATE condicional evita aplicarlo dos veces en paralelo.
+    Devuelve el monto aplicado (0.0 si no correspondía).
+    """
+    hoy = local_date()
+    ultima = func.coalesce(Prestamo.ultima_aplicacion_interes, Prestamo.fecha)
+
+    fila = db.session.execute(
+        update(Prestamo)
+        .where(
+            Prestamo.id == prestamo_id,
+            func.lower(Prestamo.frecuencia) == "mensual",
+            ultima <= hoy - timedelta(days=30),
+        )
+        .values(
+            saldo=Prestamo.saldo + Prestamo.monto * func.coalesce(Prestamo.interes, 0) / 100,
+            ultima_aplicacion_interes=hoy,
+            **sello(),
+        )
+        .returning(Prestamo.monto * func.coalesce(Prestamo.interes, 0) / 100)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if not fila:
+        return 0.0
+
+    _expirar(Prestamo, prestamo_id)
+    interes_extra = float(fila[0] or 0.0)
+    mov_id = db.session.execute(
+        insert(MovimientoCaja).values(
+            tipo="entrada_manual",
+            monto=interes_extra,
+            descripcion=f"Interés mensual aplicado a {nombre_cliente}",
+            fecha=hora_actual(),
+            prestamo_id=prestamo_id,
+            **sello(),
+        ).returning(MovimientoCaja.id)
+    ).scalar_one()
+    acumular_liquidacion(
+        "entrada_manual", interes_extra,
+        evento="interes", prestamo_id=prestamo_id, delta_saldo=interes_extra,
+        referencia_id=mov_id, descripcion=f"Interés mensual aplicado a {nombre_cliente}",
+    )
+    return interes_extra
+
+
+def interes_vencido(prestamo) -> bool:
+    """True si el préstamo (ya cargado) es mensual y le toca un nuevo interés."""
+    ultima = prestamo.ultima_aplicacion_interes or prestamo.fecha
+    return (
+        (prestamo.frecuencia or "").lower() == "mensual"
+        and ultima is not None
+        and ultima <= local_date() - timedelta(days=30)
+    )
+
+
+def aplicar_intereses_vencidos():
+    """
+    Aplica el interés mensual a todos los préstamos vivos que ya cumplieron 30
+    días (trabajo "interes_mensual"). No hace commit. Devuelve {prestamo_id: monto}.
+    """
+    hoy = local_date()
+    ultima = func.coalesce(Prestamo.ultima_aplicacion_interes, Prestamo.fecha)
+    vencidos = db.session.execute(
+        select(Prestamo.id, Cliente.nombre)
+        .join(Cliente, Cliente.id == Prestamo.cliente_id)
+        .where(
+            Prestamo.saldo > 0,
+            func.lower(Prestamo.frecuencia) == "mensual",
+            ultima <= hoy - timedelta(days=30),
+        )
+        .order_by(Prestamo.id)
+    ).all()
+    aplicados = {}
+    for prestamo_id, nombre in vencidos:
+        monto = aplicar_interes_mensual(prestamo_id, nombre)
+        if monto:
+            aplicados[prestamo_id] = monto
+    return aplicados
+
+
+# ---------------------------------------------------
+# 🔹 Registrar abono (INSERT + 2 UPDATE ... RETURNING)
+# ---------------------------------------------------
+def registrar_abono(cliente_id: int, prestamo_id: int, monto: float, fecha=None):
+    """
+    Aplica un abono con un número fijo de sentencias y sin leer-modificar-escribir
+    en Python, de modo que dos dispositivos abonando al mismo cliente no se pisan:
+    1. INSERT del abono ... RETURNING id.
+    2. UPDATE prestamo ... RETURNING saldo (el saldo nunca baja de 0).
+    3. UPDATE cliente ... RETURNING saldo, cancelado (re-suma en la misma sentencia).
+    4. UPSERT en la franja de liquidación del worker (sin fila caliente) y
+       evento en el diario de dinero.
+    `fecha` permite conservar la hora real de cobro de un abono hecho offline.
+    No hace commit: la ruta decide cuándo confirmar la transacción.
+    """
+    inicio = time.perf_counter()
+    fecha = fecha or hora_actual()
+    hoy = fecha.date()
+
+    abono_id = db.session.execute(
+        insert(Abono).values(prestamo_id=prestamo_id, monto=monto, fecha=fecha, **sello())
+        .returning(Abono.id)
+    ).scalar_one()
+
+    saldo_prestamo = db.session.execute(
+        update(Prestamo)
+        .where(Prestamo.id == prestamo_id)
+        .values(
+            saldo=case(
+                (func.coalesce(Prestamo.saldo, 0) - monto > 0,
+                 func.coalesce(Prestamo.saldo, 0) - monto),
+                else_=0.0,
+            ),
+            **sello(),
+        )
+        .returning(Prestamo.saldo)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+    suma_prestamos = (
+        select(func.coalesce(func.sum(Prestamo.saldo), 0.0))
+        .where(Prestamo.cliente_id == cliente_id, Prestamo.archivado == db.false())
+        .scalar_subquery()
+    )
+    saldo_cerrado = suma_prestamos <= 0  # centavos exactos (dinero.py)
+
+    saldo_cliente, cancelado = db.session.execute(
+        update(Cliente)
+        .where(Cliente.id == cliente_id)
+        .values(
+            saldo=case((saldo_cerrado, 0.0), else_=suma_prestamos),
+            cancelado=case((saldo_cerrado, True), else_=Cliente.cancelado),
+            # ⏩ Solo avanza: un abono offline que sincroniza tarde no la retrocede
+            ultimo_abono_fecha=case(
+                (Cliente.ultimo_abono_fecha.is_(None) | (Cliente.ultimo_abono_fecha < hoy), hoy),
+                else_=Cliente.ultimo_abono_fecha,
+            ),
+            **sello(),
+        )
+        .returning(Cliente.saldo, Cliente.cancelado)
+        .execution_options(synchronize_session=False)
+    ).one()
+
+    acumular_liquidacion(
+        "abono", monto, hoy,
+        cliente_id=cliente_id, prestamo_id=prestamo_id, delta_saldo=-monto, referencia_id=abono_id,
+    )
+
+    # 🔄 Los objetos ORM cargados antes quedan obsoletos
+    _expirar(Cliente, cliente_id)
+    _expirar(Prestamo, prestamo_id)
+
+    latencia_ms = (time.perf_counter() - inicio) * 1000
+    if latencia_ms > LATENCIA_OBJETIVO_MS:
+        print(f"⚠️ Abono lento: {latencia_ms:.1f} ms (objetivo {LATENCIA_OBJETIVO_MS:.0f} ms)")
+
+    return {
+        "saldo_prestamo": float(saldo_prestamo or 0.0),
+        "saldo": float(saldo_cliente or 0.0),
+        "cancelado": bool(cancelado),
+        "fecha_abono": hoy,
+        "latencia_ms": latencia_ms,
+    }
@@ -0,0 +1,103 @@
+# ======================================================
+# particiones.py — particiones mensuales (PostgreSQL) de abono y movimiento_caja
+# ======================================================
+# En PostgreSQL las tablas abono y movimiento_caja están particionadas por
+# rango de mes sobre "fecha" (ver migración 6e0a2c4b8d13). Cada consulta de un
+# día solo lee la partición de su mes. En SQLite las tablas siguen sin particionar.
+
+import os
+from datetime import date
+from sqlalchemy import text
+from extensions import db
+from tiempo import local_date
+
+# 📋 Tablas particionadas por mes
+TABLAS_PARTICIONADAS = ("abono", "movimiento_caja")
+
+# 📅 Meses futuros que se dejan creados por adelantado
+MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", "3"))
+
+# 🔒 Clave del advisory lock (evita que dos workers creen la misma partición)
+_LOCK_PARTICIONES = 73120032
+
+
+def inicio_mes(fecha: date):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(fecha: date):
+    fecha = inicio_mes(fecha)
+    return fecha.replace(year=fecha.year + 1, month=1) if fecha.month == 12 else fecha.replace(month=fecha.month + 1)
+
+
+def nombre_particion(tabla: str, mes: date):
+    return f"{tabla}_p{mes:%Y_%m}"
+
+
+def esta_particionada(conexion, tabla: str):
+    """True si la tabla existe como tabla particionada en PostgreSQL."""
+    if conexion.dialect.name != "postgresql":
+        return False
+    return bool(conexion.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :tabla AND n.nspname = current_schema()"
+    ), {"tabla": tabla}).first())
+
+
+def particiones_existentes(conexion, tabla: str):
+    """Nombres de las particiones hijas de la tabla."""
+    return set(conexion.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :tabla"
+    ), {"tabla": tabla}).scalars())
+
+
+def crear_particion(conexion, tabla: str, mes: date):
+    """
+    Crea la partición del mes. Si la partición DEFAULT ya recibió filas de ese
+    mes (por falta de partición), se mueven a la nueva antes de adjuntarla.
+    """
+    nombre = nombre_particion(tabla, mes)
+    desde, hasta = inicio_mes(mes), mes_siguiente(mes)
+    conexion.execute(text(
+        f"CREATE TABLE {nombre} (LIKE {tabla} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    conexion.execute(text(
+        f"WITH movidas AS ("
+        f"  DELETE FROM {tabla}_default WHERE fecha >= :desde AND fecha < :hasta RETURNING *"
+        f") INSERT INTO {nombre} SELECT * FROM movidas"
+    ), {"desde": desde, "hasta": hasta})
+    conexion.execute(text(
+        f"ALTER TABLE {tabla} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    ))
+    print(f"🧩 Partición creada: {nombre} [{desde} → {hasta})")
+    return nombre
+
+
+def asegurar_particiones(meses: int = MESES_ADELANTE, desde: date = None):
+    """
+    Deja creadas las particiones desde el mes actual (o `desde`) hasta `meses`
+    meses adelante. No hace nada en SQLite. Devuelve las particiones creadas.
+    """
+    conexion = db.session.connection()
+    if conexion.dialect.name != "postgresql":
+        return []
+
+    conexion.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": _LOCK_PARTICIONES})
+    creadas = []
+    for tabla in TABLAS_PARTICIONADAS:
+        if not esta_particionada(conexion, tabla):
+            continue
+        existentes = particiones_existentes(conexion, tabla)
+        mes = inicio_mes(desde or local_date())
+        for _ in range(meses + 1):
+            if nombre_particion(tabla, mes) not in existentes:
+                creadas.append(crear_particion(conexion, tabla, mes))
+            mes = mes_siguiente(mes)
+    db.session.commit()
+    return creadas
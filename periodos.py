@@ -0,0 +1,180 @@
+# ======================================================
+# periodos.py — resúmenes semanales y mensuales de liquidación
+# ======================================================
+# Cada vez que cambia la fila diaria de Liquidacion se recalcula SOLO la fila
+# de su semana y de su mes (≤ 31 filas por índice de fecha). Un reporte de
+# varios meses lee así unas pocas filas en vez de una por día. La fila del
+# periodo se bloquea (FOR UPDATE) mientras se recalcula: dos transacciones
+# sobre días distintos del mismo mes se turnan en vez de pisarse las sumas.
+
+from datetime import date, timedelta
+from sqlalchemy import event, select, delete, func
+from sqlalchemy.orm import Session
+from extensions import db
+from modelos import Liquidacion, LiquidacionSemanal, LiquidacionMensual
+from helpers import insert_upsert, totales_franjas, _neto
+
+CAMPOS_SUMA = ("entradas", "entradas_caja", "salidas", "gastos", "prestamos_hoy")
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+         "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+
+# ---------------------------------------------------
+# 📅 Límites de periodo
+# ---------------------------------------------------
+def _semana(fecha: date):
+    inicio = fecha - timedelta(days=fecha.weekday())
+    return inicio, inicio + timedelta(days=6)
+
+
+def _mes(fecha: date):
+    inicio = fecha.replace(day=1)
+    siguiente = inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    return inicio, siguiente - timedelta(days=1)
+
+
+# granularidad → (modelo, función de límites)
+GRANULARIDADES = {
+    "semana": (LiquidacionSemanal, _semana),
+    "mes": (LiquidacionMensual, _mes),
+}
+
+
+def etiqueta(granularidad: str, inicio: date):
+    """Texto del periodo para tablas y API."""
+    if granularidad == "mes":
+        return f"{MESES[inicio.month - 1]} {inicio.year}"
+    if granularidad == "semana":
+        return f"Semana del {inicio:%d-%m-%Y}"
+    return f"{inicio:%d-%m-%Y}"
+
+
+# ---------------------------------------------------
+# 🔄 Recalcular los periodos de unas fechas
+# ---------------------------------------------------
+def actualizar_periodos(fechas, conexion=None):
+    """
+    Recalcula (UPSERT) la fila semanal y mensual de cada fecha indicada a partir
+    de las filas diarias. No hace commit: corre en la transacción del llamador.
+    """
+    conexion = conexion or db.session.connection()
+    dialecto = conexion.dialect.name
+    liq = Liquidacion.__table__
+
+    for modelo, limites in GRANULARIDADES.values():
+        tabla = modelo.__table__
+        for inicio, fin in sorted({limites(f) for f in fechas}):
+            # 🔒 Fila del periodo bloqueada antes de sumar: otra transacción que
+            # toque otro día del mismo periodo espera y luego suma con este
+            # día ya confirmado (READ COMMITTED relee en cada sentencia)
+            conexion.execute(
+                insert_upsert(modelo, dialecto).values(inicio=inicio, fin=fin)
+                .on_conflict_do_nothing(index_elements=["inicio"])
+            )
+            conexion.execute(select(tabla.c.id).where(tabla.c.inicio == inicio).with_for_update())
+
+            en_rango = (liq.c.fecha >= inicio) & (liq.c.fecha <= fin)
+            totales = conexion.execute(
+                select(
+                    func.count(liq.c.id),
+                    func.min(liq.c.fecha),
+                    func.max(liq.c.fecha),
+                    *[func.coalesce(func.sum(liq.c[c]), 0.0) for c in CAMPOS_SUMA],
+                ).where(en_rango)
+            ).one()
+            dias, primera, ultima = totales[0], totales[1], totales[2]
+
+            if not dias:
+                conexion.execute(delete(tabla).where(tabla.c.inicio == inicio))
+                continue
+
+            caja_inicial = conexion.execute(
+                select(liq.c.caja_manual).where(liq.c.fecha == primera)
+            ).scalar()
+            caja_final = conexion.execute(
+                select(liq.c.caja).where(liq.c.fecha == ultima)
+            ).scalar()
+
+            valores = dict(zip(CAMPOS_SUMA, map(float, totales[3:])))
+            valores.update(
+                fin=fin, dias=dias, primera_fecha=primera, ultima_fecha=ultima,
+                caja_inicial=float(caja_inicial or 0.0), caja_final=float(caja_final or 0.0),
+            )
+            conexion.execute(
+                insert_upsert(modelo, dialecto)
+                .values(inicio=inicio, **valores)
+                .on_conflict_do_update(index_elements=["inicio"], set_=valores)
+            )
+
+
+@event.listens_for(Session, "after_flush")
+def _periodos_tras_flush(session, flush_context):
+    """Toda fila de Liquidacion insertada, modificada o borrada actualiza su semana y su mes."""
+    fechas = {
+        obj.fecha
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Liquidacion) and obj.fecha
+    }
+    if fechas:
+        actualizar_periodos(fechas, session.connection())
+
+
+def reconstruir_periodos():
+    """Vacía y vuelve a calcular todos los resúmenes desde las filas diarias."""
+    db.session.execute(delete(LiquidacionSemanal))
+    db.session.execute(delete(LiquidacionMensual))
+    fechas = [f for (f,) in db.session.query(Liquidacion.fecha).all()]
+    if fechas:
+        actualizar_periodos(fechas)
+    db.session.commit()
+    return len(fechas)
+
+
+# ---------------------------------------------------
+# 📊 Lectura (resumen + franjas aún no consolidadas)
+# ---------------------------------------------------
+def periodos_consolidados(granularidad: str, desde: date = None, hasta: date = None, limite: int = 12):
+    """
+    Filas del periodo (semana/mes) con las franjas del día sumadas, igual que
+    liquidaciones_consolidadas para los días. Sin rango: los últimos `limite` periodos.
+    Devuelve objetos transitorios (nunca se guardan).
+    """
+    modelo, limites = GRANULARIDADES[granularidad]
+    consulta = modelo.query
+    if desde and hasta:
+        filas = (
+            consulta.filter(modelo.inicio >= limites(desde)[0], modelo.inicio <= hasta)
+            .order_by(modelo.inicio.asc())
+            .all()
+        )
+    else:
+        filas = list(reversed(consulta.order_by(modelo.inicio.desc()).limit(limite).all()))
+    if not filas:
+        return []
+
+    deltas = totales_franjas(filas[0].inicio, filas[-1].fin)
+    resultado = []
+    for p in filas:
+        copia = modelo(**{c.name: getattr(p, c.name) for c in modelo.__table__.columns})
+        for fecha, delta in deltas.items():
+            if p.inicio <= fecha <= p.fin:
+                for campo in CAMPOS_SUMA:
+                    setattr(copia, campo, (getattr(copia, campo) or 0.0) + delta.get(campo, 0.0))
+        if p.ultima_fecha in deltas:
+            copia.caja_final = (copia.caja_final or 0.0) + _neto(**deltas[p.ultima_fecha])
+        resultado.append(copia)
+    return resultado
+
+
+def periodo_a_dict(granularidad: str, p):
+    """Fila de periodo para la API JSON."""
+    return {
+        "inicio": p.inicio.isoformat(),
+        "fin": p.fin.isoformat(),
+        "etiqueta": etiqueta(granularidad, p.inicio),
+        "dias": p.dias,
+        **{c: round(float(getattr(p, c) or 0.0), 2) for c in CAMPOS_SUMA},
+        "caja_inicial": round(float(p.caja_inicial or 0.0), 2),
+        "caja_final": round(float(p.caja_final or 0.0), 2),
+    }
@@ -0,0 +1,189 @@
+# ======================================================
+# pronostico.py — cobranza esperada vs. real por día (NumPy)
+# ======================================================
+# - Una consulta trae los préstamos vivos con saldo (clientes no cancelados)
+#   y los pasa a arreglos: fecha, frecuencia, plazo, cuota, saldo. Si la
+#   ventana mira atrás trae también los que se pagaron (o cuyo cliente se
+#   canceló) dentro de ella, con su último abono como día de término: en
+#   los días pasados cuenta todo préstamo vivo ese día, no solo los de hoy.
+# - calendario.cuotas_vencidas() se evalúa de una vez para la matriz
+#   días × préstamos; la diferencia entre días consecutivos son las cuotas
+#   que vencen cada día (sin domingos ni feriados, hasta la última cuota).
+# - Días futuros: lo esperado se acota al saldo de cada préstamo (nadie
+#   paga más de lo que debe). Días pasados: la cuota programada, contra la
+#   suma real de abonos de ese día.
+# - Resultado cacheado por (hoy, parámetros, firma de préstamos y abonos):
+#   un abono o préstamo nuevo sella versión nueva y la clave cambia sola.
+
+import os
+import time
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select, func
+from extensions import db
+from modelos import Cliente, Prestamo, Abono
+from calendario import DIAS_POR_PERIODO, cuotas_vencidas
+from cache_fragmentos import CacheLRU
+from cache_http import resumen_filas
+from dinero import redondear
+from tiempo import local_date, day_range
+
+# 📏 Ventana máxima (días hacia adelante / hacia atrás)
+DIAS_MAX = 90
+
+# 🗃️ Pronósticos guardados por worker
+CACHE = CacheLRU(int(os.getenv("CACHE_PRONOSTICO_MAX", "64")))
+
+
+# ---------------------------------------------------
+# 📥 Cartera activa → arreglos
+# ---------------------------------------------------
+def cartera_activa(desde: date = None):
+    """
+    Préstamos vivos con saldo de clientes no cancelados, como dict de arreglos
+    NumPy (una consulta). Con `desde` se suman los pagados o de clientes
+    cancelados cuyo último abono es ≥ `desde`; "termino" es ese día (NaT en
+    los que siguen vivos).
+    """
+    ultimo = (
+        select(Abono.prestamo_id, func.max(Abono.fecha).label("fecha"))
+        .group_by(Abono.prestamo_id)
+        .subquery()
+    )
+    vivo = (Prestamo.saldo > 0) & (Cliente.cancelado == db.false())
+    consulta = (
+        select(Prestamo.id, Prestamo.cliente_id, Prestamo.fecha, Prestamo.frecuencia, Prestamo.plazo,
+               Prestamo.monto, Prestamo.interes, Prestamo.saldo, vivo, ultimo.c.fecha)
+        .join(Cliente, Cliente.id == Prestamo.cliente_id)
+        .outerjoin(ultimo, ultimo.c.prestamo_id == Prestamo.id)
+        .where(Prestamo.fecha.isnot(None))
+    )
+    if desde:
+        consulta = consulta.where(vivo | (ultimo.c.fecha >= day_range(desde)[0]))
+    else:
+        consulta = consulta.where(vivo)
+    filas = db.session.execute(consulta).all()
+    ids, clientes, fechas, frecuencias, plazos, montos, intereses, saldos, vivos, ultimos = zip(*filas) if filas else ((),) * 10
+
+    frecuencias = np.array([(f or "diario").lower() for f in frecuencias], dtype=object)
+    periodos = np.array([DIAS_POR_PERIODO.get(f, 1) for f in frecuencias], dtype=np.int64)
+    plazos = np.array([p or 0 for p in plazos], dtype=np.int64)
+    montos = np.array(montos, dtype=np.float64)
+    intereses = np.array([i or 0.0 for i in intereses], dtype=np.float64)
+    # 🔹 Igual que Cliente.cuota_total: total con interés / número de cuotas
+    totales = montos * (1 + intereses / 100)
+    numero = np.maximum(plazos // periodos, 1)
+    # 🔹 Día del último abono de los que ya no están vivos (SQLite lo devuelve como texto)
+    termino = [None if v or u is None else str(u)[:10] for v, u in zip(vivos, ultimos)]
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "cliente_id": np.array(clientes, dtype=np.int64),
+        "fecha": np.array(fechas, dtype="datetime64[D]"),
+        "frecuencia": frecuencias,
+        "plazo": plazos,
+        "cuotas": numero,
+        "cuota": np.where(plazos > 0, totales / numero, 0.0),
+        "total": totales,
+        "saldo": np.array(saldos, dtype=np.float64),
+        "termino": np.array([np.datetime64(t) if t else np.datetime64("NaT") for t in termino], dtype="datetime64[D]"),
+    }
+
+
+# ---------------------------------------------------
+# 🧮 Esperado por día
+# ---------------------------------------------------
+def esperado_por_dia(cartera, dias, hoy: date):
+    """
+    (montos, cuotas) esperados para cada día de `dias` (arreglo datetime64[D]
+    consecutivo). Después de su día de término un préstamo no espera nada;
+    los días ≥ hoy se acotan al saldo de cada préstamo.
+    """
+    n = len(dias)
+    if not len(cartera["id"]) or not n:
+        return np.zeros(n), np.zeros(n, dtype=np.int64)
+
+    # Matriz (días + 1) × préstamos de cuotas vencidas, con el día anterior al primero
+    eje = np.concatenate(([dias[0] - 1], dias))[:, None]
+    vencidas = np.minimum(cuotas_vencidas(cartera["fecha"], cartera["frecuencia"], eje), cartera["cuotas"])
+    nuevas = np.diff(vencidas, axis=0)
+    montos = nuevas * cartera["cuota"]
+    # 🔹 Nada se espera de un préstamo después del día en que terminó
+    termino = cartera["termino"]
+    montos[~np.isnat(termino) & (dias[:, None] > termino)] = 0.0
+
+    futuros = dias >= np.datetime64(hoy, "D")
+    if futuros.any():
+        acumulado = np.minimum(np.cumsum(montos[futuros], axis=0), np.maximum(cartera["saldo"], 0.0))
+        montos[futuros] = np.diff(acumulado, axis=0, prepend=0.0)
+    return montos.sum(axis=1), (montos > 0).sum(axis=1)
+
+
+def reales_por_dia(desde: date, hasta: date):
+    """{fecha: Σ abonos} de [desde, hasta] (suma en SQL)."""
+    dia = func.date(Abono.fecha)
+    filas = db.session.execute(
+        select(dia, func.sum(Abono.monto))
+        .where(Abono.fecha >= day_range(desde)[0], Abono.fecha < day_range(hasta)[1])
+        .group_by(dia)
+        .execution_options(incluir_archivados=True)  # lo cobrado a clientes eliminados también se cobró
+    ).all()
+    # SQLite devuelve date() como texto
+    return {(d if isinstance(d, date) else date.fromisoformat(d)): float(total or 0.0) for d, total in filas}
+
+
+# ---------------------------------------------------
+# 📈 Pronóstico
+# ---------------------------------------------------
+def _firma(desde: date, hasta: date):
+    partes = (
+        resumen_filas(Prestamo),
+        resumen_filas(Cliente),
+        resumen_filas(Abono, Abono.fecha >= day_range(desde)[0], Abono.fecha < day_range(hasta)[1],
+                      consulta=db.session.query(Abono).execution_options(incluir_archivados=True)),
+    )
+    return tuple((int(v or 0), int(c or 0)) for v, c, _ in (p.one() for p in partes))
+
+
+def pronostico(dias: int = 14, atras: int = 7, hoy: date = None):
+    """
+    Esperado vs. real desde hoy − atras hasta hoy + dias − 1. Devuelve
+    {"desde", "hasta", "hoy", "dias": [{fecha, esperado, real, diferencia, cuotas}],
+     "esperado_total", "real_total", "prestamos", "ms", "cache"}.
+    """
+    hoy = hoy or local_date()
+    dias, atras = max(1, min(dias, DIAS_MAX)), max(0, min(atras, DIAS_MAX))
+    desde, hasta = hoy - timedelta(days=atras), hoy + timedelta(days=dias - 1)
+
+    clave = (hoy, dias, atras, _firma(desde, hoy))
+    guardado = CACHE.obtener(clave)
+    if guardado is not None:
+        return {**guardado, "cache": True}
+
+    inicio = time.perf_counter()
+    cartera = cartera_activa(desde)
+    eje = np.arange(np.datetime64(desde, "D"), np.datetime64(hasta, "D") + 1)
+    montos, cuotas = esperado_por_dia(cartera, eje, hoy)
+    reales = reales_por_dia(desde, hoy)
+
+    filas = []
+    for fecha, esperado, n in zip(eje.astype(date), montos, cuotas):
+        real = reales.get(fecha, 0.0) if fecha <= hoy else None
+        filas.append({
+            "fecha": fecha.isoformat(),
+            "esperado": redondear(esperado),
+            "real": None if real is None else redondear(real),
+            "diferencia": None if real is None else redondear(real - esperado),
+            "cuotas": int(n),
+        })
+    resultado = {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "hoy": hoy.isoformat(),
+        "dias": filas,
+        "esperado_total": redondear(montos[eje >= np.datetime64(hoy, "D")].sum()),
+        "real_total": redondear(sum(reales.values())),
+        "prestamos": int(len(cartera["id"])),
+        "ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+    CACHE.guardar(clave, resultado)
+    return {**resultado, "cache": False}
@@ -6,20 +6,47 @@
 # ======================================================
 
 import os
-from datetime import datetime, timedelta
+import json
+from datetime import date, datetime, timedelta
 from flask import (
     Blueprint, render_template, request, redirect,
-    url_for, flash, session, jsonify
+    url_for, flash, session, jsonify, current_app, send_from_directory,
+    stream_with_context
 )
 from functools import wraps
 from sqlalchemy import func
 from extensions import db
-from modelos import Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion
+from modelos import Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion, LiquidacionFranja
 from helpers import (
     generar_codigo_cliente,
-    crear_liquidacion_para_fecha,
     obtener_resumen_total,
     actualizar_liquidacion_por_movimiento,
+    registrar_movimiento_caja,
+    acumular_liquidacion,
+    caja_anterior,
+    liquidacion_consolidada,
+    liquidaciones_consolidadas,
+    totales_del_dia,
+)
+from pagos import registrar_abono, interes_vencido
+from idempotencia import idempotente
+from eventos import suscribir, stream_sse
+from archivo import archivar_cliente
+from diario import anotar
+from trabajos import encolar, estado_cola
+from dinero import sumar
+from integridad import revisar as revisar_integridad, guion_sql
+from pronostico import pronostico
+from cartera import serie as serie_cartera
+from simulador import simular
+from cache_fragmentos import fila_cliente, filas_clientes, tarjeta_totales
+from cache_http import resumen_filas, responder_condicional, vida_para
+from sincronizacion import snapshot_roster, aplicar_cola
+from versiones import cambios_desde
+from cierre import liquidacion_del_dia
+from periodos import (
+    GRANULARIDADES, CAMPOS_SUMA, periodos_consolidados, periodo_a_dict,
+    etiqueta as etiqueta_periodo,
 )
 from tiempo import hora_actual, to_hora_chile as hora_chile  # ✅ CORRECTO, sin import circular
 
@@ -61,7 +88,6 @@ def login_required(f):
 @login_required
 def dashboard():
     hoy = local_date()
-    start, end = day_range(hoy)
 
     # 🔹 Total de clientes activos
     total_clientes_activos = (
@@ -70,72 +96,47 @@ def dashboard():
         .scalar() or 0
     )
 
-    # 💰 Total de abonos del día
-    total_abonos = (
-        db.session.query(func.coalesce(func.sum(Abono.monto), 0.0))
-        .filter(Abono.fecha >= start, Abono.fecha < end)
-        .scalar() or 0.0
-    )
-
-    # 🏦 Total de préstamos (desde Prestamo, no MovimientoCaja)
-    total_prestamos = (
-        db.session.query(func.coalesce(func.sum(Prestamo.monto), 0.0))
-        .join(Cliente, Prestamo.cliente_id == Cliente.id)
-        .filter(
-            Cliente.cancelado == False,
-            Prestamo.fecha >= start,
-            Prestamo.fecha < end
-        )
-        .scalar() or 0.0
-    )
+    # 📊 Totales del día desde la liquidación mantenida (se actualizan en vivo por SSE)
+    totales = totales_del_dia(hoy)
 
-    # 💵 Entradas manuales
-    total_entradas = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "entrada_manual",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
+    return render_template(
+        "dashboard.html",
+        hoy=hoy,
+        total_clientes_activos=total_clientes_activos,
+        total_abonos=totales["entradas"],
+        total_prestamos=totales["prestamos_hoy"],
+        total_entradas=totales["entradas_caja"],
+        total_salidas=totales["salidas"],
+        total_gastos=totales["gastos"],
+        caja_total=totales["caja_dia"],
     )
 
-    # 💸 Salidas
-    total_salidas = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "salida",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
-    )
 
-    # 🧾 Gastos
-    total_gastos = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "gasto",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
+@app_rutas.route("/api/eventos")
+@login_required
+def api_eventos():
+    """
+    Stream SSE del día: primero los totales, luego un evento por movimiento
+    (el navegador suma los montos) y "recalculo" cuando hay que releer todo.
+    """
+    inicial = totales_del_dia()
+    cola = suscribir()
+    if cola is None:
+        # 🚦 Sin cupo para otro stream: el navegador pasa a consultar /api/totales
+        return jsonify({"ok": False, "error": "Demasiados streams abiertos"}), 503, {"Retry-After": "60"}
+    db.session.remove()  # 🔌 libera la conexión: el stream no vuelve a usar la BD
+    return current_app.response_class(
+        stream_sse(cola, inicial),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # 📦 Caja total del día
-    caja_total = total_abonos + total_entradas - (total_prestamos + total_salidas + total_gastos)
 
-    return render_template(
-        "dashboard.html",
-        hoy=hoy,
-        total_clientes_activos=total_clientes_activos,
-        total_abonos=total_abonos,
-        total_prestamos=total_prestamos,
-        total_entradas=total_entradas,
-        total_salidas=total_salidas,
-        total_gastos=total_gastos,
-        caja_total=caja_total,
-    )
+@app_rutas.route("/api/totales")
+@login_required
+def api_totales():
+    """Totales del día en JSON (los mismos del evento "totales"), para consultar sin stream."""
+    return jsonify(totales_del_dia())
 
 # ======================================================
 # 🏠 RUTA PRINCIPAL — CLIENTES + TARJETA DE RESUMEN (corregida)
@@ -149,98 +150,54 @@ def index():
         .all()
     )
 
-    # 🔄 Reasignar orden si está roto
+    # 🔄 Reasignar orden si está roto (solo escribe cuando hay algo que corregir)
+    orden_roto = False
     for idx, c in enumerate(clientes, start=1):
         if not c.orden or c.orden != idx:
             c.orden = idx
-    db.session.commit()
+            orden_roto = True
+    if orden_roto:
+        db.session.commit()
 
+    # 🧩 Filas desde la caché de fragmentos (solo se renderizan las que cambiaron)
     hoy = local_date()
-    for c in clientes:
-        estado = "normal"
-        if c.prestamos:
-            ultimo = max(c.prestamos, key=lambda p: p.fecha)
-            if ultimo.plazo:
-                fecha_venc = ultimo.fecha + timedelta(days=ultimo.plazo)
-                dias_pasados = (hoy - fecha_venc).days
-                if 0 <= dias_pasados < 30:
-                    estado = "vencido"
-                elif dias_pasados >= 30:
-                    estado = "moroso"
-        c.estado_plazo = estado
-
-    resumen = obtener_resumen_total()
-    start, end = day_range(hoy)
-
-    # 💰 Total abonos
-    total_abonos = (
-        db.session.query(func.coalesce(func.sum(Abono.monto), 0.0))
-        .filter(Abono.fecha >= start, Abono.fecha < end)
-        .scalar() or 0.0
-    )
-
-    # 🏦 Total préstamos (corregido — desde Prestamo)
-    total_prestamos = (
-        db.session.query(func.coalesce(func.sum(Prestamo.monto), 0.0))
-        .join(Cliente, Prestamo.cliente_id == Cliente.id)
-        .filter(
-            Cliente.cancelado == False,
-            Prestamo.fecha >= start,
-            Prestamo.fecha < end
-        )
-        .scalar() or 0.0
-    )
-
-    # 💵 Entradas manuales
-    total_entradas = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "entrada_manual",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
-    )
-
-    # 💸 Salidas
-    total_salidas = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "salida",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
-    )
-
-    # 🧾 Gastos
-    total_gastos = (
-        db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-        .filter(
-            MovimientoCaja.tipo == "gasto",
-            MovimientoCaja.fecha >= start,
-            MovimientoCaja.fecha < end
-        )
-        .scalar() or 0.0
-    )
-
-    # 📦 Caja total del día
-    caja_total = total_abonos + total_entradas - (total_prestamos + total_salidas + total_gastos)
+    filas = filas_clientes(clientes, hoy)
 
+    # 📦 Totales del día desde la liquidación mantenida (sin recorrer abonos)
     return render_template(
         "index.html",
         clientes=clientes,
-        resumen=resumen,
+        filas=filas,
         hoy=hoy,
-        total_abonos=total_abonos,
-        total_prestamos=total_prestamos,
-        total_entradas=total_entradas,
-        total_salidas=total_salidas,
-        total_gastos=total_gastos,
-        caja_total=caja_total,
+        tarjeta_totales=tarjeta_totales(totales_del_dia(hoy)),
     )
 
 
+# ---------------------------------------------------
+# 🧩 Respuesta parcial para index (fila + totales)
+# ---------------------------------------------------
+def respuesta_parcial(cliente=None, **datos):
+    """
+    JSON para que index.html actualice en su lugar solo lo que cambió:
+    - fila_html: la fila del cliente (None si salió del listado: cancelado/eliminado)
+    - totales / totales_html: la tarjeta de totales del día
+    """
+    hoy = local_date()
+    fila_html = None
+    if cliente is not None and not cliente.cancelado:
+        fila_html = str(fila_cliente(cliente, hoy))
+
+    totales = totales_del_dia(hoy)
+    return jsonify({
+        "ok": True,
+        **datos,
+        "cliente_id": cliente.id if cliente is not None else None,
+        "fila_html": fila_html,
+        "totales": totales,
+        "totales_html": str(tarjeta_totales(totales)),
+    }), 200
+
+
 # ======================================================
 # ✏️ EDITAR PRÉSTAMO — (GET/POST)
 # ======================================================
@@ -275,7 +232,12 @@ def editar_prestamo(cliente_id):
 
         # Mantener saldo si ya tiene abonos
         if not prestamo.abonos or len(prestamo.abonos) == 0:
+            saldo_anterior = prestamo.saldo or 0.0
             prestamo.saldo = prestamo.monto + (prestamo.monto * prestamo.interes / 100)
+            anotar(
+                "ajuste_saldo", dia=local_date(), cliente_id=cliente.id, prestamo_id=prestamo.id,
+                delta_saldo=prestamo.saldo - saldo_anterior, descripcion="Edición de préstamo",
+            )
 
         db.session.commit()
         return jsonify({"ok": True, "msg": "Préstamo actualizado correctamente."})
@@ -345,6 +307,7 @@ def nuevo_cliente():
             # ------------------------------------------------------
             if cliente_existente and cliente_existente.cancelado:
                 cliente_existente.cancelado = False
+                cliente_existente.archivado = False
                 cliente_existente.nombre = nombre or cliente_existente.nombre
                 cliente_existente.direccion = direccion or cliente_existente.direccion
                 cliente_existente.telefono = telefono or cliente_existente.telefono
@@ -362,18 +325,19 @@ def nuevo_cliente():
                         plazo=plazo,
                         frecuencia=frecuencia,
                     )
-                    mov = MovimientoCaja(
-                        tipo="prestamo",
-                        monto=monto,
-                        descripcion=f"Nuevo préstamo (reactivado) a {cliente_existente.nombre}",
-                        fecha=hora_actual(),
+                    db.session.add(nuevo_prestamo)
+                    db.session.flush()
+                    registrar_movimiento_caja(
+                        "prestamo",
+                        monto,
+                        f"Nuevo préstamo (reactivado) a {cliente_existente.nombre}",
+                        cliente_id=cliente_existente.id,
+                        prestamo_id=nuevo_prestamo.id,
+                        delta_saldo=saldo_total,
                     )
-                    db.session.add_all([nuevo_prestamo, mov])
                     cliente_existente.saldo = saldo_total
 
                 db.session.commit()
-                if monto > 0:
-                    actualizar_liquidacion_por_movimiento(local_date())
 
                 flash(f"Cliente {cliente_existente.nombre} reactivado correctamente.", "success")
                 return redirect(url_for("app_rutas.index", resaltado=cliente_existente.id))
@@ -412,22 +376,17 @@ def nuevo_cliente():
                     plazo=plazo,
                     frecuencia=frecuencia,
                 )
-                mov = MovimientoCaja(
-                    tipo="prestamo",
-                    monto=monto,
-                    descripcion=f"Préstamo inicial a {cliente.nombre}",
-                    fecha=hora_actual(),
-                )
                 cliente.saldo = saldo_total
-                db.session.add_all([nuevo_prestamo, mov])
+                db.session.add(nuevo_prestamo)
+                db.session.flush()
+                registrar_movimiento_caja(
+                    "prestamo", monto, f"Préstamo inicial a {cliente.nombre}",
+                    cliente_id=cliente.id, prestamo_id=nuevo_prestamo.id, delta_saldo=saldo_total,
+                )
 
-            # ✅ Un solo commit (más rápido)
+            # ✅ Un solo commit (la liquidación se acumula en la misma transacción)
             db.session.commit()
 
-            # ⚡ Actualizar liquidación solo si hubo préstamo
-            if monto > 0:
-                actualizar_liquidacion_por_movimiento(local_date())
-
             flash(f"Cliente {cliente.nombre} creado correctamente.", "success")
             return redirect(url_for("app_rutas.index", resaltado=cliente.id))
 
@@ -465,7 +424,7 @@ def clientes_cancelados_view():
         Cliente.query
         .filter(
             Cliente.cancelado == True,
-            Cliente.saldo <= 0.01  # 💰 saldo cerrado
+            Cliente.saldo <= 0  # 💰 saldo cerrado (centavos exactos)
         )
         .order_by(Cliente.orden.asc().nullslast())
         .all()
@@ -515,7 +474,7 @@ def clientes_cancelados_view():
             "nombre": c.nombre,
             "salida_total": salida_total,
             "ultimo_abono_monto": ultimo_abono_monto,
-            "saldo": round(c.saldo or 0.0, 2),
+            "saldo": c.saldo or 0.0,
         })
 
     # 🖥️ Renderizar plantilla con los datos listos
@@ -558,16 +517,20 @@ def reactivar_cliente(cliente_id):
                 frecuencia="diario",
             )
             db.session.add(prestamo)
-
-        mov = MovimientoCaja(
-            tipo="salida",
-            monto=deuda_pendiente,
-            descripcion=f"Ajuste reactivación – deuda pendiente de {cliente.nombre}",
-            fecha=hora_actual(),
+            db.session.flush()
+
+        registrar_movimiento_caja(
+            "salida",
+            deuda_pendiente,
+            f"Ajuste reactivación – deuda pendiente de {cliente.nombre}",
+            evento="reactivacion",
+            cliente_id=cliente.id,
+            prestamo_id=prestamo.id,
+            delta_saldo=deuda_pendiente,
         )
-        db.session.add(mov)
 
     cliente.cancelado = False
+    cliente.archivado = False
     cliente.saldo = (
         db.session.query(func.coalesce(func.sum(Prestamo.saldo), 0.0))
         .filter(Prestamo.cliente_id == cliente.id)
@@ -578,7 +541,6 @@ def reactivar_cliente(cliente_id):
         cliente.orden = 1
 
     db.session.commit()
-    actualizar_liquidacion_por_movimiento(local_date())
 
     # ⚡ Si viene desde fetch → devolvemos JSON
     if request.headers.get("X-Requested-With") == "fetch":
@@ -605,13 +567,19 @@ def reactivar_cliente(cliente_id):
 def actualizar_orden(cliente_id):
     nueva_orden = request.form.get("orden", type=int)
     if nueva_orden is None:
-        flash("Debe ingresar un número de orden válido.", "warning")
+        msg = "Debe ingresar un número de orden válido."
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.index"))
 
     cliente = Cliente.query.get_or_404(cliente_id)
     cliente.orden = nueva_orden
     db.session.commit()
 
+    if request.headers.get("X-Requested-With") == "fetch":
+        return respuesta_parcial(cliente, orden=nueva_orden)
+
     flash(f"Orden del cliente {cliente.nombre} actualizada a {nueva_orden}.", "success")
     return redirect(url_for("app_rutas.index")) 
 
@@ -628,57 +596,38 @@ def eliminar_cliente(cliente_id):
 
         # 🔸 Ya cancelado
         if cliente.cancelado:
+            if request.headers.get("X-Requested-With") == "fetch":
+                return respuesta_parcial(cliente, reintegro=0.0)
             flash(f"⚠️ El cliente {cliente.nombre} ya estaba cancelado.", "info")
             return redirect(url_for("app_rutas.index"))
 
         print(f"\n🧾 Eliminando cliente {cliente.nombre}...")
 
         # ======================================================
-        # 1️⃣ Calcular total prestado y eliminar préstamos
-        # ======================================================
-        monto_prestado = sum((p.monto or 0) for p in cliente.prestamos)
-        saldo_restante = float(monto_prestado or 0.0)
-
-        # ✅ Evitar errores de sesión lazy
-        prestamos_a_eliminar = list(cliente.prestamos)
-        for p in prestamos_a_eliminar:
-            db.session.delete(p)
-
-        # ======================================================
-        # 2️⃣ Eliminar movimientos asociados al cliente
+        # 1️⃣ Archivar préstamos, abonos y movimientos del cliente
+        #    (UPDATE por tabla; el historial queda, fuera de las consultas vivas)
         # ======================================================
-        if cliente.nombre:
-            movs_previos = MovimientoCaja.query.filter(
-                MovimientoCaja.descripcion.ilike(f"%{cliente.nombre}%")
-            ).all()
-            for m in movs_previos:
-                db.session.delete(m)
+        saldo_restante = archivar_cliente(cliente)
 
         # ======================================================
-        # 3️⃣ Marcar cliente como cancelado
-        # ======================================================
-        cliente.cancelado = True
-        cliente.saldo = 0.0
-
-        # ======================================================
-        # 4️⃣ Registrar reintegro (solo si había saldo)
+        # 2️⃣ Registrar reintegro (solo si había saldo) — franja + diario
         # ======================================================
         if saldo_restante > 0:
-            mov_reverso = MovimientoCaja(
-                tipo="entrada_manual",
-                monto=saldo_restante,
-                descripcion=f"Reintegro único de cliente {cliente.nombre}",
-                fecha=hora_actual(),  # ✅ UTC seguro
+            registrar_movimiento_caja(
+                "entrada_manual",
+                saldo_restante,
+                f"Reintegro único de cliente {cliente.nombre}",
+                evento="reintegro",
+                cliente_id=cliente.id,
             )
-            db.session.add(mov_reverso)
 
         # ======================================================
-        # 5️⃣ Commit y actualización de liquidación
+        # 3️⃣ Commit (la liquidación ya quedó acumulada en la transacción)
         # ======================================================
         db.session.commit()
 
-        # ⚡ Esta función puede ser pesada → ejecutar al final
-        actualizar_liquidacion_por_movimiento(local_date())
+        if request.headers.get("X-Requested-With") == "fetch":
+            return respuesta_parcial(cliente, reintegro=saldo_restante)
 
         flash(f"✅ Cliente {cliente.nombre} eliminado correctamente.", "success")
         return redirect(url_for("app_rutas.index"))
@@ -686,6 +635,8 @@ def eliminar_cliente(cliente_id):
     except Exception as e:
         db.session.rollback()
         print(f"[ERROR eliminar_cliente] {e}")
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": "Ocurrió un error al eliminar el cliente."}), 500
         flash("Ocurrió un error al eliminar el cliente.", "danger")
         return redirect(url_for("app_rutas.index"))
 
@@ -696,6 +647,7 @@ def eliminar_cliente(cliente_id):
 # ======================================================
 @app_rutas.route("/otorgar_prestamo/<int:cliente_id>", methods=["POST"])
 @login_required
+@idempotente
 def otorgar_prestamo(cliente_id):
     cliente = Cliente.query.get_or_404(cliente_id)
     try:
@@ -703,11 +655,17 @@ def otorgar_prestamo(cliente_id):
         interes = float(request.form.get("interes", 0))
         plazo = int(request.form.get("plazo") or 0)
     except ValueError:
-        flash("Valores de préstamo inválidos.", "danger")
+        msg = "Valores de préstamo inválidos."
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "danger")
         return redirect(url_for("app_rutas.index"))
 
     if monto <= 0:
-        flash("El monto debe ser mayor a 0", "warning")
+        msg = "El monto debe ser mayor a 0"
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.index"))
 
     saldo_con_interes = monto + (monto * (interes / 100.0))
@@ -720,17 +678,16 @@ def otorgar_prestamo(cliente_id):
         saldo=saldo_con_interes,
     )
     db.session.add(prestamo)
+    db.session.flush()
 
-    mov = MovimientoCaja(
-        tipo="salida",
-        monto=monto,
-        descripcion=f"Préstamo a {cliente.nombre}",
-        fecha=hora_actual(),  # ✅ hora real convertida a UTC
+    registrar_movimiento_caja(
+        "salida", monto, f"Préstamo a {cliente.nombre}",
+        evento="prestamo", cliente_id=cliente.id, prestamo_id=prestamo.id, delta_saldo=saldo_con_interes,
     )
-    db.session.add(mov)
     db.session.commit()
 
-    actualizar_liquidacion_por_movimiento(local_date())
+    if request.headers.get("X-Requested-With") == "fetch":
+        return respuesta_parcial(cliente, monto=monto)
 
     flash(f"Préstamo de ${monto:.2f} otorgado a {cliente.nombre}", "success")
     return redirect(url_for("app_rutas.index"))
@@ -740,6 +697,7 @@ def otorgar_prestamo(cliente_id):
 # ======================================================
 @app_rutas.route("/registrar_abono_por_codigo", methods=["POST"])
 @login_required
+@idempotente
 def registrar_abono_por_codigo():
     from sqlalchemy import func
     from datetime import timedelta
@@ -776,71 +734,30 @@ def registrar_abono_por_codigo():
             return jsonify({"ok": False, "error": msg}), 400
         return redirect(url_for("app_rutas.index"))
 
-    # 🧮 Verificar si debe reaplicarse el interés mensual (solo para frecuencia mensual)
-    dias_transcurridos = 0
-    if (prestamo.frecuencia or "").lower() == "mensual":
-        dias_transcurridos = (local_date() - (prestamo.ultima_aplicacion_interes or prestamo.fecha)).days
-        if dias_transcurridos >= 30:
-            interes_extra = prestamo.monto * (prestamo.interes or 0) / 100
-            prestamo.saldo += interes_extra
-            prestamo.ultima_aplicacion_interes = local_date()
-
-            # 💵 Registrar movimiento del interés en la caja
-            mov = MovimientoCaja(
-                tipo="entrada_manual",
-                monto=interes_extra,
-                descripcion=f"Interés mensual aplicado a {cliente.nombre}",
-                fecha=hora_actual()
-            )
-            db.session.add(mov)
-            flash(f"📈 Se aplicó un nuevo interés mensual de ${interes_extra:.2f} a {cliente.nombre}", "info")
-
-    # 💵 Registrar abono
-    abono = Abono(
-        prestamo_id=prestamo.id,
-        monto=monto,
-        fecha=hora_actual(),  # ✅ hora local de Chile
-    )
-    db.session.add(abono)
-
-    # 🔄 Actualizar saldo
-    prestamo.saldo = max(0.0, (prestamo.saldo or 0) - monto)
+    # 🧮 Interés mensual vencido: lo aplica el worker (trabajo "interes_mensual"), no esta ruta
+    interes_en_cola = interes_vencido(prestamo) and encolar("interes_mensual", local_date().isoformat())
+    if interes_en_cola:
+        flash(f"📈 {cliente.nombre} cumplió su mes: el interés mensual se aplicará en segundo plano", "info")
 
-    total_saldo_cliente = (
-        db.session.query(func.coalesce(func.sum(Prestamo.saldo), 0.0))
-        .filter(Prestamo.cliente_id == cliente.id)
-        .scalar()
-        or 0.0
-    )
-    cliente.saldo = total_saldo_cliente
-
-    # 📅 Actualizar fecha del último abono
-    if hasattr(cliente, "ultimo_abono_fecha"):
-        cliente.ultimo_abono_fecha = local_date()
-
-    # ✅ Cancelar si queda en 0
-    cancelado = False
-    if round(cliente.saldo, 2) <= 0:
-        cliente.cancelado = True
-        cliente.saldo = 0.0
-        cancelado = True
+    # 💵 Registrar abono (INSERT + UPDATE ... RETURNING)
+    resultado = registrar_abono(cliente.id, prestamo.id, monto)
+    cancelado = resultado["cancelado"]
+    if cancelado:
         flash(f"✅ {cliente.nombre} quedó en saldo 0 y fue movido a Clientes Cancelados.", "info")
 
     db.session.commit()
-    actualizar_liquidacion_por_movimiento(local_date())
 
     # ⚡ Respuesta AJAX
     if request.headers.get("X-Requested-With") == "fetch":
-        return jsonify({
-            "ok": True,
-            "cliente_id": cliente.id,
-            "nombre": cliente.nombre,
-            "saldo": float(cliente.saldo),
-            "cancelado": cancelado,
-            "monto": monto,
-            "fecha_abono": cliente.ultimo_abono_fecha.strftime("%Y-%m-%d") if hasattr(cliente, "ultimo_abono_fecha") else None,
-            "interes_aplicado": dias_transcurridos >= 30 if (prestamo.frecuencia or '').lower() == 'mensual' else False
-        }), 200
+        return respuesta_parcial(
+            cliente,
+            nombre=cliente.nombre,
+            saldo=resultado["saldo"],
+            cancelado=cancelado,
+            monto=monto,
+            fecha_abono=resultado["fecha_abono"].strftime("%Y-%m-%d"),
+            interes_en_cola=bool(interes_en_cola),
+        )
 
     # 📩 Si es navegación normal
     flash(f"💰 Abono de ${monto:.2f} registrado para {cliente.nombre}", "success")
@@ -853,6 +770,27 @@ def registrar_abono_por_codigo():
 @login_required
 def historial_abonos_html(cliente_id):
     """Devuelve el historial de abonos de un cliente en formato HTML para el modal."""
+    return responder_condicional(
+        _partes_historial(cliente_id),
+        lambda: _historial_abonos_html(cliente_id),
+        tablas_borradas=("abono", "prestamo"),
+    )
+
+
+def _partes_historial(cliente_id):
+    """Filas que lee el historial: el cliente, sus préstamos y sus abonos."""
+    return [
+        resumen_filas(Cliente, Cliente.id == cliente_id),
+        resumen_filas(Prestamo, Prestamo.cliente_id == cliente_id),
+        resumen_filas(
+            Abono,
+            Prestamo.cliente_id == cliente_id,
+            consulta=db.session.query(Abono).join(Prestamo, Abono.prestamo_id == Prestamo.id),
+        ),
+    ]
+
+
+def _historial_abonos_html(cliente_id):
     cliente = Cliente.query.get_or_404(cliente_id)
     prestamo = cliente.prestamos[-1] if cliente.prestamos else None
 
@@ -863,7 +801,7 @@ def historial_abonos_html(cliente_id):
     if not abonos:
         return "<p class='text-center text-muted'>No se registran abonos para este cliente.</p>"
 
-    saldo_actual = prestamo.saldo + sum(a.monto for a in abonos)
+    saldo_actual = sumar([prestamo.saldo, *(a.monto for a in abonos)])
     html = f"""
     <h5 class="text-center mb-3">Historial de Abonos — {cliente.nombre}</h5>
     <div class="table-responsive">
@@ -902,6 +840,14 @@ def historial_abonos_html(cliente_id):
 @login_required
 def historial_abonos_json(cliente_id):
     """Devuelve el historial de abonos y datos del préstamo en formato JSON."""
+    return responder_condicional(
+        _partes_historial(cliente_id),
+        lambda: _historial_abonos_json(cliente_id),
+        tablas_borradas=("abono", "prestamo"),
+    )
+
+
+def _historial_abonos_json(cliente_id):
     from datetime import datetime
 
     cliente = Cliente.query.get_or_404(cliente_id)
@@ -960,12 +906,16 @@ def historial_abonos_json(cliente_id):
 # ======================================================
 @app_rutas.route("/abonar/<int:cliente_id>", methods=["POST"])
 @login_required
+@idempotente
 def abonar(cliente_id):
     cliente = Cliente.query.get_or_404(cliente_id)
     monto_abono = request.form.get("monto", type=float)
 
     if not monto_abono or monto_abono <= 0:
-        flash("El monto del abono debe ser mayor que cero.", "warning")
+        msg = "El monto del abono debe ser mayor que cero."
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.index"))
 
     prestamo = (
@@ -974,29 +924,22 @@ def abonar(cliente_id):
         .first()
     )
     if not prestamo:
-        flash("⚠️ Este cliente no tiene préstamos activos.", "warning")
+        msg = "⚠️ Este cliente no tiene préstamos activos."
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.index"))
 
-    nuevo_abono = Abono(
-        prestamo_id=prestamo.id,
-        monto=monto_abono,
-        fecha=hora_actual(),  # ✅ corrige desfase de hora
-    )
-    db.session.add(nuevo_abono)
-
-    # 🔄 Actualizar saldos
-    prestamo.saldo = max(0.0, (prestamo.saldo or 0) - monto_abono)
-    cliente.saldo = cliente.saldo_total()
-    if hasattr(cliente, "ultimo_abono_fecha"):
-        cliente.ultimo_abono_fecha = local_date()
-
-    if round(cliente.saldo, 2) <= 0:
-        cliente.saldo = 0.0
-        cliente.cancelado = True
+    resultado = registrar_abono(cliente.id, prestamo.id, monto_abono)
+    if resultado["cancelado"]:
         flash(f"✅ El cliente {cliente.nombre} ha sido cancelado.", "info")
 
     db.session.commit()
-    actualizar_liquidacion_por_movimiento(local_date())
+
+    if request.headers.get("X-Requested-With") == "fetch":
+        return respuesta_parcial(
+            cliente, saldo=resultado["saldo"], cancelado=resultado["cancelado"], monto=monto_abono
+        )
 
     flash(f"💰 Se registró un abono de ${monto_abono:.2f} para {cliente.nombre}.", "success")
     return redirect(url_for("app_rutas.index"))
@@ -1014,6 +957,11 @@ def eliminar_abono(abono_id):
         cliente = prestamo.cliente
 
         prestamo.saldo = (prestamo.saldo or 0) + (abono.monto or 0)
+        acumular_liquidacion(
+            "abono", -(abono.monto or 0), abono.fecha.date(),
+            evento="abono_anulado", cliente_id=cliente.id, prestamo_id=prestamo.id,
+            delta_saldo=abono.monto or 0, referencia_id=abono.id,
+        )
         db.session.delete(abono)
         db.session.flush()
 
@@ -1025,19 +973,15 @@ def eliminar_abono(abono_id):
         )
         cliente.saldo = total_saldo_cliente
 
-        if cliente.cancelado and round(cliente.saldo, 2) > 0:
+        if cliente.cancelado and cliente.saldo > 0:
             cliente.cancelado = False
 
-        actualizar_liquidacion_por_movimiento(local_date())
         db.session.commit()
 
         if request.headers.get("X-Requested-With") == "fetch":
-            return jsonify({
-                "ok": True,
-                "cliente_id": cliente.id,
-                "saldo": float(cliente.saldo),
-                "cancelado": cliente.cancelado,
-            }), 200
+            return respuesta_parcial(
+                cliente, saldo=float(cliente.saldo), cancelado=cliente.cancelado
+            )
 
         flash(f"🗑️ Abono de ${abono.monto:.2f} eliminado correctamente.", "info")
         return redirect(url_for("app_rutas.index"))
@@ -1054,10 +998,14 @@ def eliminar_abono(abono_id):
 # ======================================================
 @app_rutas.route("/caja/<tipo>", methods=["POST"])
 @login_required
+@idempotente
 def caja_movimiento(tipo):
     tipos_validos = ["entrada_manual", "salida", "gasto"]
     if tipo not in tipos_validos:
-        flash("Tipo inválido", "danger")
+        msg = "Tipo inválido"
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "danger")
         return redirect(url_for("app_rutas.liquidacion_view"))
 
     try:
@@ -1066,28 +1014,28 @@ def caja_movimiento(tipo):
         monto = 0
 
     if monto <= 0:
-        flash("Monto inválido", "warning")
+        msg = "Monto inválido"
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.liquidacion_view"))
 
     descripcion = request.form.get("descripcion", f"{tipo.replace('_', ' ').capitalize()} manual")
 
     # 🚫 Evitar registrar préstamos como salidas
     if tipo == "salida" and ("préstamo" in descripcion.lower() or "prestamo" in descripcion.lower()):
-        flash("Los préstamos no deben registrarse como salidas. Usa el módulo de préstamos.", "warning")
+        msg = "Los préstamos no deben registrarse como salidas. Usa el módulo de préstamos."
+        if request.headers.get("X-Requested-With") == "fetch":
+            return jsonify({"ok": False, "error": msg}), 400
+        flash(msg, "warning")
         return redirect(url_for("app_rutas.liquidacion_view"))
 
-    # 💾 Registrar movimiento en caja
-    mov = MovimientoCaja(
-        tipo=tipo,
-        monto=monto,
-        descripcion=descripcion,
-        fecha=hora_actual(),  # ✅ Corregido: hora local de Chile
-    )
-    db.session.add(mov)
+    # 💾 Registrar movimiento en caja (y en la franja de liquidación del día)
+    registrar_movimiento_caja(tipo, monto, descripcion)
     db.session.commit()
 
-    # 🔄 Actualizar liquidación del día
-    actualizar_liquidacion_por_movimiento(local_date())
+    if request.headers.get("X-Requested-With") == "fetch":
+        return respuesta_parcial(tipo=tipo, monto=monto)
 
     flash(f"{tipo.replace('_', ' ').capitalize()} registrada correctamente en la caja.", "success")
     return redirect(url_for("app_rutas.liquidacion_view"))
@@ -1116,20 +1064,14 @@ def caja_salida():
 # ======================================================
 @app_rutas.route("/caja_gasto", methods=["POST"])
 @login_required
+@idempotente
 def caja_gasto():
     monto = request.form.get("monto", type=float)
     descripcion = request.form.get("descripcion", "")
 
     if monto and monto > 0:
-        mov = MovimientoCaja(
-            tipo="gasto",
-            monto=monto,
-            descripcion=descripcion or "Gasto general",
-            fecha=hora_actual(),  # ✅ hora real Chile (UTC)
-        )
-        db.session.add(mov)
+        registrar_movimiento_caja("gasto", monto, descripcion or "Gasto general")
         db.session.commit()
-        actualizar_liquidacion_por_movimiento(local_date())
         flash(f"🧾 Gasto de ${monto:.2f} registrado correctamente.", "warning")
     else:
         flash("Debe ingresar un monto válido.", "danger")
@@ -1190,13 +1132,17 @@ def reparar_caja():
         flash("✅ No se encontraron abonos mal clasificados.", "success")
         return redirect(url_for("app_rutas.liquidacion_view"))
 
+    # ↩️ Cada borrado se anota como anulación (resta en la franja de su día)
     for m in abonos_erroneos:
+        acumular_liquidacion(
+            "entrada_manual", -(m.monto or 0), m.fecha.date(),
+            evento="movimiento_anulado", referencia_id=m.id, descripcion=m.descripcion,
+        )
         db.session.delete(m)
     db.session.commit()
 
-    liq = actualizar_liquidacion_por_movimiento(local_date())
     flash(
-        f"🧹 Se eliminaron {len(abonos_erroneos)} abonos mal clasificados y se recalculó la liquidación del {liq.fecha}.",
+        f"🧹 Se eliminaron {len(abonos_erroneos)} abonos mal clasificados y se descontaron de la liquidación.",
         "info",
     )
     return redirect(url_for("app_rutas.liquidacion_view"))
@@ -1208,82 +1154,23 @@ def reparar_caja():
 @app_rutas.route("/liquidacion")
 @login_required
 def liquidacion_view():
+    """
+    Solo lectura: muestra la fila del día ya mantenida (fila + franjas).
+    No recalcula ni guarda nada; para eso está POST /liquidacion/recalcular.
+    """
     try:
         hoy = local_date()
 
-        # Buscar o crear liquidación del día
-        liq = Liquidacion.query.filter_by(fecha=hoy).first()
-        if not liq:
-            liq = crear_liquidacion_para_fecha(hoy)  # debe devolver un Liquidacion persistible
-
-        start, end = day_range(hoy)
-
-        # 💰 Total abonos (ingresos por cuotas)
-        total_abonos = (
-            db.session.query(func.coalesce(func.sum(Abono.monto), 0.0))
-            .filter(Abono.fecha >= start, Abono.fecha < end)
-            .scalar() or 0.0
-        )
-
-        # 🏦 Total préstamos del día (desde Prestamo, consistente con Dashboard/Index)
-        total_prestamos = (
-            db.session.query(func.coalesce(func.sum(Prestamo.monto), 0.0))
-            .join(Cliente, Prestamo.cliente_id == Cliente.id)
-            .filter(
-                Cliente.cancelado == False,
-                Prestamo.fecha >= start,
-                Prestamo.fecha < end
-            )
-            .scalar() or 0.0
-        )
-
-        # 💵 Entradas manuales
-        total_entradas_caja = (
-            db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-            .filter(
-                MovimientoCaja.tipo == "entrada_manual",
-                MovimientoCaja.fecha >= start,
-                MovimientoCaja.fecha < end
-            )
-            .scalar() or 0.0
-        )
-
-        # 💸 Salidas
-        total_salidas = (
-            db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-            .filter(
-                MovimientoCaja.tipo == "salida",
-                MovimientoCaja.fecha >= start,
-                MovimientoCaja.fecha < end
-            )
-            .scalar() or 0.0
-        )
-
-        # 🧾 Gastos
-        total_gastos = (
-            db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0.0))
-            .filter(
-                MovimientoCaja.tipo == "gasto",
-                MovimientoCaja.fecha >= start,
-                MovimientoCaja.fecha < end
+        fila = Liquidacion.query.filter_by(fecha=hoy).first()
+        if fila:
+            liq = liquidacion_consolidada(fila)
+        else:
+            # 👀 Día sin movimientos: fila transitoria con la caja arrastrada (no se guarda)
+            arrastre = caja_anterior(hoy)
+            liq = Liquidacion(
+                fecha=hoy, caja_manual=arrastre, caja=arrastre, entradas=0.0,
+                entradas_caja=0.0, prestamos_hoy=0.0, salidas=0.0, gastos=0.0,
             )
-            .scalar() or 0.0
-        )
-
-        # 💼 Caja del día (misma fórmula que Dashboard/Index)
-        total_caja = total_abonos + total_entradas_caja - (total_prestamos + total_salidas + total_gastos)
-
-        # 🔄 Actualizar objeto Liquidacion con los nombres REALES de columnas
-        #    (según usas en /liquidaciones y en tus plantillas)
-        liq.entradas       = total_abonos        # 👈 antes ponías liq.abonos (NO existe)
-        liq.prestamos_hoy  = total_prestamos
-        liq.entradas_caja  = total_entradas_caja
-        liq.salidas        = total_salidas
-        liq.gastos         = total_gastos
-        liq.caja           = total_caja
-
-        db.session.add(liq)
-        db.session.commit()
 
         # 📊 Resumen general
         resumen = obtener_resumen_total()
@@ -1294,7 +1181,7 @@ def liquidacion_view():
             hoy=hoy,
             liq=liq,
             liquidaciones=[liq],
-            total_caja=total_caja,
+            total_caja=liq.caja or 0.0,
             cartera_total=cartera_total,
             resumen=resumen,
         )
@@ -1306,33 +1193,84 @@ def liquidacion_view():
         return redirect(url_for("app_rutas.index"))
 
 
+@app_rutas.route("/liquidacion/recalcular", methods=["POST"])
+@login_required
+def recalcular_liquidacion():
+    """
+    Encola el recálculo de hoy desde abonos y movimientos (acción explícita).
+    Lo ejecuta el worker de trabajos; la página se actualiza sola al terminar (SSE).
+    """
+    hoy = local_date()
+    try:
+        nuevo = encolar("recalcular_liquidacion", hoy.isoformat())
+        db.session.commit()
+        if nuevo:
+            flash(f"🔄 Recálculo de la liquidación del {hoy.strftime('%d-%m-%Y')} en cola.", "success")
+        else:
+            flash("⏳ Ya había un recálculo de hoy en cola.", "info")
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ERROR recalcular_liquidacion] {e}")
+        flash("❌ Error al encolar el recálculo de la liquidación.", "danger")
+    return redirect(url_for("app_rutas.liquidacion_view"))
+
+
 # ======================================================
 # 🗂️ LIQUIDACIONES — HISTÓRICO Y RANGO DE FECHAS (completo, con días vacíos)
 # ======================================================
 @app_rutas.route("/liquidaciones", methods=["GET"])
 @login_required
 def liquidaciones():
+    """Historial de liquidaciones (día / semana / mes) con GET condicional."""
+    granularidad = request.args.get("granularidad", "dia")
+    try:
+        desde, hasta = _rango_de_fechas(request.args.get("desde"), request.args.get("hasta"))
+    except ValueError:
+        desde = hasta = None  # la vista redirige con el mensaje de error
+
+    # 📅 Un periodo (semana/mes) lee los días completos de sus extremos
+    if desde and granularidad in GRANULARIDADES:
+        limites = GRANULARIDADES[granularidad][1]
+        desde, hasta = limites(desde)[0], limites(hasta)[1]
+
+    filtros_liq, filtros_franja = [], []
+    if desde and hasta:
+        filtros_liq = [Liquidacion.fecha >= desde, Liquidacion.fecha <= hasta]
+        filtros_franja = [LiquidacionFranja.fecha >= desde, LiquidacionFranja.fecha <= hasta]
+
+    return responder_condicional(
+        [resumen_filas(Liquidacion, *filtros_liq), resumen_filas(LiquidacionFranja, *filtros_franja)],
+        _liquidaciones,
+        vida=vida_para(hasta),
+        tablas_borradas=("liquidacion", "liquidacion_franja"),
+    )
+
+
+def _liquidaciones():
     fecha_desde = request.args.get("desde")
     fecha_hasta = request.args.get("hasta")
 
+    # 📆 Vista semanal / mensual desde los resúmenes precalculados
+    granularidad = request.args.get("granularidad", "dia")
+    if granularidad in GRANULARIDADES:
+        return _liquidaciones_por_periodo(granularidad, fecha_desde, fecha_hasta)
+
     # Si no hay rango, mostrar últimos 10 registros
     if not fecha_desde or not fecha_hasta:
-        liquidaciones = (
+        liquidaciones = liquidaciones_consolidadas(
             Liquidacion.query.order_by(Liquidacion.fecha.desc()).limit(10).all()
         )
-        resumen = obtener_resumen_total()
         return render_template(
             "liquidaciones.html",
             liquidaciones=liquidaciones,
             fecha_desde=None,
             fecha_hasta=None,
-            total_entradas=sum(l.entradas or 0 for l in liquidaciones),
-            total_prestamos=sum(l.prestamos_hoy or 0 for l in liquidaciones),
-            total_entradas_caja=sum(l.entradas_caja or 0 for l in liquidaciones),
-            total_salidas=sum(l.salidas or 0 for l in liquidaciones),
-            total_gastos=sum(l.gastos or 0 for l in liquidaciones),
-            total_caja=sum(l.caja or 0 for l in liquidaciones),
-            resumen=resumen,
+            total_entradas=sumar(l.entradas for l in liquidaciones),
+            total_prestamos=sumar(l.prestamos_hoy for l in liquidaciones),
+            total_entradas_caja=sumar(l.entradas_caja for l in liquidaciones),
+            total_salidas=sumar(l.salidas for l in liquidaciones),
+            total_gastos=sumar(l.gastos for l in liquidaciones),
+            total_caja=sumar(l.caja for l in liquidaciones),
             hora_chile=hora_chile,
             hora_actual=hora_actual,
         )
@@ -1347,9 +1285,9 @@ def liquidaciones():
 
     # Obtener liquidaciones existentes en ese rango
     registros = {
-        l.fecha: l for l in Liquidacion.query.filter(
+        l.fecha: l for l in liquidaciones_consolidadas(Liquidacion.query.filter(
             Liquidacion.fecha >= desde, Liquidacion.fecha <= hasta
-        ).all()
+        ).all())
     }
 
     # Generar todas las fechas del rango
@@ -1374,14 +1312,12 @@ def liquidaciones():
         liquidaciones.append(liq)
 
     # Calcular totales
-    total_entradas = sum(l.entradas or 0 for l in liquidaciones)
-    total_prestamos = sum(l.prestamos_hoy or 0 for l in liquidaciones)
-    total_entradas_caja = sum(l.entradas_caja or 0 for l in liquidaciones)
-    total_salidas = sum(l.salidas or 0 for l in liquidaciones)
-    total_gastos = sum(l.gastos or 0 for l in liquidaciones)
-    total_caja = sum(l.caja or 0 for l in liquidaciones)
-
-    resumen = obtener_resumen_total()
+    total_entradas = sumar(l.entradas for l in liquidaciones)
+    total_prestamos = sumar(l.prestamos_hoy for l in liquidaciones)
+    total_entradas_caja = sumar(l.entradas_caja for l in liquidaciones)
+    total_salidas = sumar(l.salidas for l in liquidaciones)
+    total_gastos = sumar(l.gastos for l in liquidaciones)
+    total_caja = sumar(l.caja for l in liquidaciones)
 
     return render_template(
         "liquidaciones.html",
@@ -1394,12 +1330,113 @@ def liquidaciones():
         total_salidas=total_salidas,
         total_gastos=total_gastos,
         total_caja=total_caja,
-        resumen=resumen,
         hora_chile=hora_chile,
         hora_actual=hora_actual,
     )
 
 
+def _rango_de_fechas(fecha_desde, fecha_hasta):
+    """Convierte ?desde=&hasta= (YYYY-MM-DD) en fechas; (None, None) si falta alguna."""
+    if not fecha_desde or not fecha_hasta:
+        return None, None
+    return (
+        datetime.strptime(fecha_desde, "%Y-%m-%d").date(),
+        datetime.strptime(fecha_hasta, "%Y-%m-%d").date(),
+    )
+
+
+def _liquidaciones_por_periodo(granularidad, fecha_desde, fecha_hasta):
+    """Historial agrupado por semana o mes (una fila por periodo)."""
+    try:
+        desde, hasta = _rango_de_fechas(fecha_desde, fecha_hasta)
+    except ValueError:
+        flash("Formato de fecha inválido (use YYYY-MM-DD).", "danger")
+        return redirect(url_for("app_rutas.liquidaciones", granularidad=granularidad))
+
+    periodos = periodos_consolidados(granularidad, desde, hasta)
+    return render_template(
+        "liquidaciones.html",
+        liquidaciones=periodos,
+        granularidad=granularidad,
+        etiqueta_periodo=etiqueta_periodo,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        total_entradas=sumar(p.entradas for p in periodos),
+        total_prestamos=sumar(p.prestamos_hoy for p in periodos),
+        total_entradas_caja=sumar(p.entradas_caja for p in periodos),
+        total_salidas=sumar(p.salidas for p in periodos),
+        total_gastos=sumar(p.gastos for p in periodos),
+        total_caja=sumar(p.caja for p in periodos),
+        hora_chile=hora_chile,
+        hora_actual=hora_actual,
+    )
+
+
+@app_rutas.route("/api/liquidaciones")
+@login_required
+def api_liquidaciones():
+    """Liquidaciones en JSON por día, semana o mes (?granularidad=dia|semana|mes&desde=&hasta=)."""
+    granularidad = request.args.get("granularidad", "dia")
+    try:
+        desde, hasta = _rango_de_fechas(request.args.get("desde"), request.args.get("hasta"))
+    except ValueError:
+        return jsonify({"ok": False, "error": "Formato de fecha inválido (use YYYY-MM-DD)."}), 400
+
+    if granularidad in GRANULARIDADES:
+        filas = [periodo_a_dict(granularidad, p) for p in periodos_consolidados(granularidad, desde, hasta)]
+    else:
+        consulta = Liquidacion.query
+        if desde and hasta:
+            consulta = consulta.filter(Liquidacion.fecha >= desde, Liquidacion.fecha <= hasta)
+            dias = consulta.order_by(Liquidacion.fecha.asc()).all()
+        else:
+            dias = list(reversed(consulta.order_by(Liquidacion.fecha.desc()).limit(10).all()))
+        filas = [
+            {
+                "inicio": l.fecha.isoformat(),
+                "fin": l.fecha.isoformat(),
+                "etiqueta": etiqueta_periodo("dia", l.fecha),
+                "dias": 1,
+                **{c: round(float(getattr(l, c) or 0.0), 2) for c in CAMPOS_SUMA},
+                "caja_inicial": round(float(l.caja_manual or 0.0), 2),
+                "caja_final": round(float(l.caja or 0.0), 2),
+            }
+            for l in liquidaciones_consolidadas(dias)
+        ]
+    return jsonify({"ok": True, "granularidad": granularidad, "liquidaciones": filas})
+
+
+@app_rutas.route("/api/liquidacion/<fecha>")
+@login_required
+def api_liquidacion_dia(fecha):
+    """
+    Liquidación de un día en JSON. Un día cerrado es inmutable: se sirve desde
+    caché con ETag = checksum y Cache-Control de larga duración.
+    """
+    try:
+        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"ok": False, "error": "Formato de fecha inválido (use YYYY-MM-DD)."}), 400
+
+    datos, cerrada = liquidacion_del_dia(fecha_obj)
+    if datos is None:
+        return jsonify({"ok": False, "error": "No hay liquidación para esa fecha."}), 404
+
+    if not cerrada:
+        resp = jsonify({"ok": True, **datos})
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    etag = datos["checksum"]
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+    else:
+        resp = jsonify({"ok": True, **datos})
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return resp
+
+
 # ======================================================
 # 📅 REPORTES — MOVIMIENTOS POR DÍA (entrada, abono, salida, gasto)
 # ======================================================
@@ -1409,6 +1446,39 @@ def movimientos_por_dia(tipo, fecha):
     fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
     start, end = day_range(fecha_obj)
 
+    # 🗄️ Con lo archivado (clientes eliminados): el reporte cuadra con la liquidación del día
+    if tipo == "abono":
+        del_dia = (Abono.fecha >= start, Abono.fecha < end)
+        partes = [
+            resumen_filas(Abono, *del_dia, consulta=db.session.query(Abono).execution_options(incluir_archivados=True)),
+            resumen_filas(  # nombres de los clientes que abonaron
+                Cliente, *del_dia,
+                consulta=db.session.query(Cliente)
+                .join(Prestamo, Prestamo.cliente_id == Cliente.id)
+                .join(Abono, Abono.prestamo_id == Prestamo.id)
+                .execution_options(incluir_archivados=True),
+            ),
+        ]
+        borradas = ("abono",)
+    else:
+        partes = [resumen_filas(
+            MovimientoCaja, MovimientoCaja.tipo == tipo,
+            MovimientoCaja.fecha >= start, MovimientoCaja.fecha < end,
+            consulta=db.session.query(MovimientoCaja).execution_options(incluir_archivados=True),
+        )]
+        borradas = ("movimiento_caja",)
+
+    return responder_condicional(
+        partes,
+        lambda: _movimientos_por_dia(tipo, fecha_obj),
+        vida=vida_para(fecha_obj),
+        tablas_borradas=borradas,
+    )
+
+
+def _movimientos_por_dia(tipo, fecha_obj):
+    start, end = day_range(fecha_obj)
+
     if tipo == "entrada_manual":
         movimientos = (
             MovimientoCaja.query.filter(
@@ -1417,10 +1487,11 @@ def movimientos_por_dia(tipo, fecha):
                 MovimientoCaja.fecha < end,
             )
             .order_by(MovimientoCaja.fecha.desc())
+            .execution_options(incluir_archivados=True)
             .all()
         )
         titulo = "💵 Entradas Manuales"
-        total = sum(m.monto for m in movimientos)
+        total = sumar(m.monto for m in movimientos)
 
     elif tipo == "abono":
         movimientos = (
@@ -1430,10 +1501,11 @@ def movimientos_por_dia(tipo, fecha):
             .filter(Abono.fecha >= start, Abono.fecha < end)
             .with_entities(Abono.fecha, Cliente.nombre, Abono.monto)
             .order_by(Abono.fecha.desc())
+            .execution_options(incluir_archivados=True)
             .all()
         )
         titulo = "💰 Ingresos por Abonos"
-        total = sum(m[2] for m in movimientos)
+        total = sumar(m[2] for m in movimientos)
 
     elif tipo in ["salida", "gasto"]:
         movimientos = (
@@ -1443,10 +1515,11 @@ def movimientos_por_dia(tipo, fecha):
                 MovimientoCaja.fecha < end,
             )
             .order_by(MovimientoCaja.fecha.desc())
+            .execution_options(incluir_archivados=True)
             .all()
         )
         titulo = "💸 Salidas" if tipo == "salida" else "🧾 Gastos"
-        total = sum(m.monto for m in movimientos)
+        total = sumar(m.monto for m in movimientos)
 
     else:
         flash("Tipo de movimiento no válido.", "danger")
@@ -1472,6 +1545,25 @@ def prestamos_por_dia(fecha):
     fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
     start, end = day_range(fecha_obj)
 
+    del_dia = (Prestamo.fecha >= start, Prestamo.fecha < end)
+    partes = [
+        resumen_filas(Prestamo, *del_dia),
+        resumen_filas(  # nombre y estado de los clientes
+            Cliente, *del_dia,
+            consulta=db.session.query(Cliente).join(Prestamo, Prestamo.cliente_id == Cliente.id),
+        ),
+    ]
+    return responder_condicional(
+        partes,
+        lambda: _prestamos_por_dia(fecha_obj),
+        vida=vida_para(fecha_obj),
+        tablas_borradas=("prestamo",),
+    )
+
+
+def _prestamos_por_dia(fecha_obj):
+    start, end = day_range(fecha_obj)
+
     prestamos = (
         Prestamo.query
         .join(Cliente, Prestamo.cliente_id == Cliente.id)
@@ -1485,7 +1577,7 @@ def prestamos_por_dia(fecha):
         .all()
     )
 
-    total_prestamos = sum(p.monto for p in prestamos)
+    total_prestamos = sumar(p.monto for p in prestamos)
     return render_template(
         "prestamos_por_dia.html",
         prestamos=prestamos,
@@ -1493,6 +1585,135 @@ def prestamos_por_dia(fecha):
         total_prestamos=total_prestamos,
     )
 
+# ======================================================
+# 📴 MODO OFFLINE — SNAPSHOT DEL ROSTER Y SINCRONIZACIÓN
+# ======================================================
+@app_rutas.route("/api/roster")
+@login_required
+def api_roster():
+    """Roster activo en JSON compacto (lo cachea el service worker)."""
+    return jsonify(snapshot_roster())
+
+
+@app_rutas.route("/api/cambios")
+@login_required
+def api_cambios():
+    """Ids cambiados y borrados desde ?desde=N (exportes y cachés incrementales)."""
+    desde = request.args.get("desde", default=0, type=int)
+    limite = min(request.args.get("limite", default=1000, type=int), 5000)
+    return jsonify(cambios_desde(desde, limite))
+
+
+@app_rutas.route("/api/trabajos")
+@login_required
+def api_trabajos():
+    """Profundidad de la cola de trabajos, espera máxima y últimos fallos."""
+    return jsonify(estado_cola())
+
+
+@app_rutas.route("/api/pronostico")
+@login_required
+def api_pronostico():
+    """Cobranza esperada (cuotas por vencer) vs. abonos reales por día."""
+    dias = request.args.get("dias", 14, type=int)
+    atras = request.args.get("atras", 7, type=int)
+    return jsonify(pronostico(dias, atras))
+
+
+@app_rutas.route("/api/cartera/serie")
+@login_required
+def api_cartera_serie():
+    """Fotos diarias de la cartera: ?desde=&hasta= (YYYY-MM-DD) y ?puntos= (máx. filas)."""
+    try:
+        desde, hasta = (request.args.get(k) for k in ("desde", "hasta"))
+        filas, paso = serie_cartera(
+            date.fromisoformat(desde) if desde else None,
+            date.fromisoformat(hasta) if hasta else None,
+            request.args.get("puntos", 300, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "paso": paso, "filas": filas})
+
+
+def _lista_args(nombre, tipo=str):
+    """?x=1,2&x=3 → [1, 2, 3] (repetido o separado por comas)."""
+    valores = [v.strip() for crudo in request.args.getlist(nombre) for v in crudo.split(",")]
+    return [tipo(v) for v in valores if v]
+
+
+@app_rutas.route("/api/simular")
+@login_required
+def api_simular():
+    """
+    Grilla de alternativas de préstamo: ?monto=…&interes=…&plazo=…&frecuencia=…
+    (cada uno con uno o más valores) y opcional ?inicio=YYYY-MM-DD.
+    """
+    try:
+        inicio = request.args.get("inicio")
+        filas = simular(
+            _lista_args("monto", float), _lista_args("interes", float),
+            _lista_args("plazo", int), _lista_args("frecuencia"),
+            date.fromisoformat(inicio) if inicio else None,
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "combinaciones": len(filas), "filas": filas})
+
+
+@app_rutas.route("/api/integridad")
+@login_required
+def api_integridad():
+    """
+    Revisión de integridad de la cartera en streaming: una violación JSON por
+    línea. Con ?formato=sql devuelve el script de corrección por lotes.
+    """
+    if request.args.get("formato") == "sql":
+        lineas = (linea + "\n" for linea in guion_sql(revisar_integridad()))
+        mimetype = "text/plain"
+    else:
+        lineas = (json.dumps(v, ensure_ascii=False) + "\n" for v in revisar_integridad())
+        mimetype = "application/x-ndjson"
+    return current_app.response_class(
+        stream_with_context(lineas), mimetype=mimetype, headers={"Cache-Control": "no-store"}
+    )
+
+
+@app_rutas.route("/sync", methods=["POST"])
+@login_required
+def sync():
+    """
+    Aplica en una sola transacción la cola de abonos guardados sin conexión.
+    Cuerpo: {"version": N, "abonos": [{"id", "codigo", "monto", "ts"}, ...]}
+    """
+    datos = request.get_json(silent=True) or {}
+    abonos = datos.get("abonos") or []
+    try:
+        version = int(datos.get("version") or 0)
+    except (TypeError, ValueError):
+        version = 0
+
+    if not isinstance(abonos, list):
+        return jsonify({"ok": False, "error": "Formato de cola inválido"}), 400
+
+    try:
+        respuesta = aplicar_cola(abonos, version)
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ERROR sync] {e}")
+        return jsonify({"ok": False, "error": "No se pudo sincronizar, reintente."}), 500
+
+    return jsonify({"ok": True, **respuesta})
+
+
+@app_rutas.route("/sw.js")
+def service_worker():
+    """Sirve el service worker desde la raíz para que controle todo el sitio."""
+    resp = send_from_directory(current_app.static_folder, "sw.js", mimetype="application/javascript")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
 # ======================================================
 # 🕒 TEST DE HORA LOCAL DE CHILE 🇨🇱
 # ======================================================
@@ -1503,14 +1724,14 @@ def test_hora():
     se estén registrando y mostrando correctamente en el sistema.
     """
     from tiempo import hora_actual, local_date, to_hora_chile
-    from datetime import datetime
+    from datetime import datetime, timezone
 
     # 🕒 Hora actual según función interna (hora local sin tz)
     ahora = hora_actual()
     ahora_str = ahora.strftime("%Y-%m-%d %H:%M:%S")
 
     # 🌍 Conversión desde UTC a hora chilena (solo para validar)
-    chile_str = to_hora_chile(datetime.utcnow())
+    chile_str = to_hora_chile(datetime.now(timezone.utc))
 
     # 📅 Fecha local (solo fecha sin hora)
     fecha_local = local_date()
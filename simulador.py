@@ -0,0 +1,62 @@
+# ======================================================
+# simulador.py — vista previa de préstamos (grilla de alternativas)
+# ======================================================
+# Montos × intereses × plazos × frecuencias en una sola pasada de NumPy, con
+# las mismas reglas de Cliente.cuota_total y otorgar_prestamo:
+#   total  = monto + monto * interés / 100
+#   cuotas = max(1, plazo // días del periodo)
+#   cuota  = total / cuotas (redondeada a centavos)
+# La fecha de término es el vencimiento de la última cuota (calendario.py:
+# sin domingos ni feriados).
+
+from datetime import date
+import numpy as np
+from calendario import DIAS_POR_PERIODO, fecha_cuota
+from tiempo import local_date
+
+# 📏 Combinaciones máximas por llamada
+MAX_COMBINACIONES = 2000
+
+
+def simular(montos, intereses, plazos, frecuencias, inicio: date = None):
+    """
+    Devuelve una fila por combinación:
+    {monto, interes, plazo, frecuencia, cuotas, cuota, total, termino}.
+    Lanza ValueError si algún valor es inválido o la grilla es demasiado grande.
+    """
+    frecuencias = [(f or "diario").lower() for f in frecuencias]
+    desconocidas = sorted(set(frecuencias) - set(DIAS_POR_PERIODO))
+    if desconocidas:
+        raise ValueError(f"Frecuencia desconocida: {', '.join(desconocidas)}")
+    if not (montos and intereses and plazos and frecuencias):
+        raise ValueError("Indica al menos un monto, interés, plazo y frecuencia")
+    if len(montos) * len(intereses) * len(plazos) * len(frecuencias) > MAX_COMBINACIONES:
+        raise ValueError(f"Máximo {MAX_COMBINACIONES} combinaciones por simulación")
+
+    m, i, p, f = np.meshgrid(
+        np.asarray(montos, dtype=np.float64),
+        np.asarray(intereses, dtype=np.float64),
+        np.asarray(plazos, dtype=np.int64),
+        np.arange(len(frecuencias)),
+        indexing="ij",
+    )
+    m, i, p, f = m.ravel(), i.ravel(), p.ravel(), f.ravel()
+    if (m <= 0).any() or (i < 0).any() or (p <= 0).any():
+        raise ValueError("Monto y plazo deben ser mayores a 0 y el interés no negativo")
+
+    nombres = np.asarray(frecuencias, dtype=object)[f]
+    periodos = np.asarray([DIAS_POR_PERIODO[x] for x in frecuencias], dtype=np.int64)[f]
+    total = m + m * i / 100
+    cuotas = np.maximum(p // periodos, 1)
+    cuota = np.round(total / cuotas, 2)
+    termino = fecha_cuota(np.full(m.shape, inicio or local_date(), dtype="datetime64[D]"), nombres, cuotas)
+
+    return [
+        {
+            "monto": float(m[k]), "interes": float(i[k]), "plazo": int(p[k]),
+            "frecuencia": nombres[k], "cuotas": int(cuotas[k]),
+            "cuota": float(cuota[k]), "total": round(float(total[k]), 2),
+            "termino": termino[k].isoformat(),
+        }
+        for k in range(m.size)
+    ]
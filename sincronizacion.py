@@ -0,0 +1,170 @@
+# ======================================================
+# sincronizacion.py — modo offline del cobrador (snapshot + cola)
+# ======================================================
+
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.orm import selectinload
+from extensions import db
+from modelos import Cliente, Prestamo, RespuestaIdempotente
+from helpers import insert_upsert
+from idempotencia import HORAS_VIGENCIA, clave_para
+from pagos import registrar_abono, interes_vencido
+from trabajos import encolar
+from versiones import version_actual
+from tiempo import hora_actual, local_date
+
+# 📋 Orden de las columnas en las filas compactas del roster
+CAMPOS_ROSTER = ["id", "codigo", "nombre", "orden", "saldo", "cuota", "ultimo_abono", "cancelado"]
+
+# 🔑 Los abonos offline comparten espacio de claves con la ruta online,
+#    así un abono que sí llegó antes de perder la señal no se duplica.
+RUTA_ABONO = "/registrar_abono_por_codigo"
+
+# ⏳ Antigüedad máxima de un cobro offline (días): uno más viejo se rechaza
+#    (un reloj del dispositivo mal puesto no crea liquidaciones de otros años)
+DIAS_OFFLINE_MAX = int(os.getenv("OFFLINE_DIAS_MAX", "3"))
+
+
+def fila_compacta(c: Cliente):
+    """Fila del roster como lista (más liviana que un dict por cliente)."""
+    return [
+        c.id,
+        c.codigo,
+        c.nombre,
+        c.orden,
+        round(float(c.saldo or 0.0), 2),
+        c.cuota_total(),
+        c.ultimo_abono_fecha.isoformat() if c.ultimo_abono_fecha else None,
+        bool(c.cancelado),
+    ]
+
+
+def snapshot_roster():
+    """Roster activo completo en formato compacto, con la versión actual."""
+    version = version_actual(Cliente)
+    clientes = (
+        Cliente.query.options(selectinload(Cliente.prestamos))
+        .filter_by(cancelado=False)
+        .order_by(Cliente.orden.asc().nullsfirst(), Cliente.id.asc())
+        .all()
+    )
+    return {
+        "version": version,
+        "hoy": local_date().isoformat(),
+        "campos": CAMPOS_ROSTER,
+        "clientes": [fila_compacta(c) for c in clientes],
+    }
+
+
+def clientes_cambiados_desde(version: int):
+    """Clientes (activos o recién cancelados) con version > N."""
+    clientes = (
+        Cliente.query.options(selectinload(Cliente.prestamos))
+        .filter(Cliente.version > version)
+        .order_by(Cliente.version.asc())
+        .all()
+    )
+    return [fila_compacta(c) for c in clientes]
+
+
+def _aplicar_abono_offline(item: dict):
+    """Aplica un abono de la cola. Devuelve el resultado que verá el dispositivo."""
+    codigo = str(item.get("codigo") or "").strip()
+    try:
+        monto = float(item.get("monto") or 0)
+    except (TypeError, ValueError):
+        monto = 0.0
+    if monto <= 0:
+        return {"ok": False, "error": "Monto inválido"}
+
+    # 🕒 Hora en que se cobró en terreno (no la hora de sincronización)
+    ahora = fecha = hora_actual()
+    try:
+        ts = datetime.fromisoformat(str(item.get("ts")))
+        if ts.tzinfo is None and ts <= ahora + timedelta(minutes=5):
+            fecha = ts
+    except ValueError:
+        pass
+    if fecha < ahora - timedelta(days=DIAS_OFFLINE_MAX):
+        return {"ok": False, "rechazado": True,
+                "error": f"Cobro del {fecha:%d-%m-%Y}: más antiguo que {DIAS_OFFLINE_MAX} días"}
+
+    cliente = Cliente.query.filter_by(codigo=codigo).first()
+    if not cliente:
+        return {"ok": False, "error": "Código no encontrado"}
+
+    prestamo = (
+        Prestamo.query.filter(Prestamo.cliente_id == cliente.id, Prestamo.saldo > 0)
+        .order_by(Prestamo.fecha.desc(), Prestamo.id.desc())
+        .first()
+    )
+    if not prestamo:
+        return {"ok": False, "error": "Cliente sin préstamos pendientes"}
+
+    # 🧮 El interés mensual vencido lo aplica el worker (trabajo "interes_mensual")
+    interes_en_cola = interes_vencido(prestamo) and encolar("interes_mensual", local_date().isoformat())
+    resultado = registrar_abono(cliente.id, prestamo.id, monto, fecha=fecha)
+    return {
+        "ok": True,
+        "cliente_id": cliente.id,
+        "saldo": resultado["saldo"],
+        "cancelado": resultado["cancelado"],
+        "interes_en_cola": bool(interes_en_cola),
+    }
+
+
+def aplicar_cola(abonos: list, version_dispositivo: int):
+    """
+    Aplica la cola de abonos offline en UNA transacción.
+    Cada abono trae un id (clave de idempotencia): si ya se aplicó, se devuelve
+    el resultado original sin registrarlo otra vez.
+    Devuelve los resultados por abono y los clientes cambiados desde la versión del dispositivo.
+    """
+    ahora = hora_actual()
+    resultados = []
+
+    for item in abonos:
+        abono_id = str(item.get("id") or "").strip()
+        if not abono_id:
+            resultados.append({"id": None, "ok": False, "error": "Abono sin id"})
+            continue
+
+        clave = clave_para(RUTA_ABONO, abono_id)
+        reservada = db.session.execute(
+            insert_upsert(RespuestaIdempotente)
+            .values(clave=clave, creado=ahora, expira=ahora + timedelta(hours=HORAS_VIGENCIA))
+            .on_conflict_do_nothing(index_elements=["clave"])
+            .returning(RespuestaIdempotente.id)
+        ).first()
+
+        if not reservada:
+            previa = RespuestaIdempotente.query.filter_by(clave=clave).first()
+            try:
+                original = json.loads(previa.cuerpo or b"{}")
+            except ValueError:
+                original = {}
+            resultados.append({**original, "id": abono_id, "duplicado": True})
+            continue
+
+        resultado = {"id": abono_id, **_aplicar_abono_offline(item)}
+        RespuestaIdempotente.query.filter_by(clave=clave).update(
+            {
+                "estado": 200 if resultado["ok"] else 400,
+                "cuerpo": json.dumps(resultado).encode(),
+                "tipo_contenido": "application/json",
+            },
+            synchronize_session=False,
+        )
+        resultados.append(resultado)
+
+    db.session.commit()
+
+    return {
+        "version": version_actual(Cliente),
+        "resultados": resultados,
+        "rechazados": [r["id"] for r in resultados if r.get("rechazado")],
+        "campos": CAMPOS_ROSTER,
+        "clientes": clientes_cambiados_desde(version_dispositivo),
+    }
@@ -0,0 +1,112 @@
+// ======================================================
+// en_vivo.js — totales del día en vivo (Server-Sent Events)
+// ======================================================
+// Marca los elementos con data-total="entradas|entradas_caja|prestamos_hoy|
+// salidas|gastos|caja_dia|caja" y llama a TotalesEnVivo.iniciar(url, urlTotales).
+// Si el servidor no tiene cupo para otro stream (503) se consultan los
+// totales cada SONDEO_MS. Con la pestaña oculta el stream se cierra.
+
+const TotalesEnVivo = (() => {
+  const CAMPOS = ["entradas", "entradas_caja", "prestamos_hoy", "salidas", "gastos"];
+  const SONDEO_MS = 30000;
+  let totales = null;
+  let fuente = null;
+  let sondeo = null;
+  let urlEventos = null;
+  let urlTotales = null;
+
+  function formato(valor) {
+    return "$" + Number(valor || 0).toFixed(2);
+  }
+
+  function pintar() {
+    const cajaDia = totales.entradas + totales.entradas_caja
+      - (totales.prestamos_hoy + totales.salidas + totales.gastos);
+    totales.caja_dia = cajaDia;
+    totales.caja = totales.caja_manual + cajaDia;
+
+    document.querySelectorAll("[data-total]").forEach(el => {
+      const campo = el.dataset.total;
+      if (!(campo in totales)) return;
+      el.textContent = formato(totales[campo]);
+
+      // 🎨 Tarjetas de caja: verde si es positiva, rojo si es negativa
+      const tarjeta = el.closest("[data-signo]");
+      if (tarjeta) {
+        tarjeta.classList.toggle("bg-success", totales[campo] >= 0);
+        tarjeta.classList.toggle("bg-danger", totales[campo] < 0);
+      }
+    });
+  }
+
+  function conectar() {
+    if (fuente) fuente.close();
+    fuente = new EventSource(urlEventos);
+
+    // 📦 Totales completos (al conectar o reconectar)
+    fuente.addEventListener("totales", e => {
+      totales = JSON.parse(e.data);
+      pintar();
+    });
+
+    // ➕ Un movimiento del día: se suma al total de su campo
+    fuente.addEventListener("movimiento", e => {
+      const ev = JSON.parse(e.data);
+      if (!totales || ev.fecha !== totales.fecha || !CAMPOS.includes(ev.campo)) return;
+      totales[ev.campo] += ev.monto;
+      pintar();
+    });
+
+    // 🔄 Recalculo completo: se piden los totales de nuevo
+    fuente.addEventListener("recalculo", e => {
+      const ev = JSON.parse(e.data);
+      if (totales && ev.fecha === totales.fecha) conectar();
+    });
+
+    // 🚦 Cerrado sin reintento (503: sin cupo) → consultar cada SONDEO_MS
+    fuente.addEventListener("error", () => {
+      if (fuente && fuente.readyState === EventSource.CLOSED) sondear();
+    });
+  }
+
+  function consultar() {
+    fetch(urlTotales, { credentials: "same-origin" })
+      .then(r => (r.ok ? r.json() : null))
+      .then(datos => {
+        if (datos) {
+          totales = datos;
+          pintar();
+        }
+      })
+      .catch(() => {});
+  }
+
+  function sondear() {
+    if (fuente) fuente.close();
+    fuente = null;
+    if (!urlTotales || sondeo) return;
+    consultar();
+    sondeo = setInterval(consultar, SONDEO_MS);
+  }
+
+  // 🙈 Pestaña oculta: se suelta el stream (o el sondeo) y se retoma al volver
+  document.addEventListener("visibilitychange", () => {
+    if (!urlEventos) return;
+    if (document.hidden) {
+      if (fuente) fuente.close();
+      fuente = null;
+      clearInterval(sondeo);
+      sondeo = null;
+    } else {
+      conectar();
+    }
+  });
+
+  function iniciar(url, totalesUrl) {
+    urlEventos = url;
+    urlTotales = totalesUrl || null;
+    conectar();
+  }
+
+  return { iniciar };
+})();
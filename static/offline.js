@@ -0,0 +1,222 @@
+// ======================================================
+// offline.js — cola local de abonos, roster offline y sincronización (/sync)
+// ======================================================
+// 📋 El roster (/api/roster, filas compactas) se guarda en IndexedDB y se
+//    mantiene al día con los cambios que devuelve /sync. Sin señal, la tabla
+//    de clientes se dibuja desde ese roster (menos los abonos en cola).
+
+const CobroOffline = (() => {
+  const DB_NOMBRE = "cobro-offline";
+  const STORE = "abonos";
+  const STORE_ROSTER = "roster";
+  const CLAVE_VERSION = "cobro.version";
+  // ⏱️ Se vuelve a bajar el roster completo pasado este tiempo (o al cambiar el día)
+  const ROSTER_VIGENCIA_MS = 10 * 60 * 1000;
+
+  function abrir() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NOMBRE, 2);
+      req.onupgradeneeded = () => {
+        const db = req.result;
+        if (!db.objectStoreNames.contains(STORE)) db.createObjectStore(STORE, { keyPath: "id" });
+        if (!db.objectStoreNames.contains(STORE_ROSTER)) db.createObjectStore(STORE_ROSTER);
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  async function tx(modo, fn, store = STORE) {
+    const db = await abrir();
+    return new Promise((resolve, reject) => {
+      const t = db.transaction(store, modo);
+      const resultado = fn(t.objectStore(store));
+      t.oncomplete = () => resolve(resultado && resultado.result);
+      t.onerror = () => reject(t.error);
+    });
+  }
+
+  // 🕒 Hora local del dispositivo sin zona (igual que hora_actual() en el servidor)
+  function horaLocal() {
+    const d = new Date();
+    return new Date(d.getTime() - d.getTimezoneOffset() * 60000).toISOString().slice(0, 19);
+  }
+
+  function nuevoId() {
+    return crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+  }
+
+  async function encolar({ id, codigo, monto }) {
+    const item = { id: id || nuevoId(), codigo, monto: Number(monto), ts: horaLocal() };
+    await tx("readwrite", s => s.put(item));
+    actualizarContador();
+    return item;
+  }
+
+  const pendientes = () => tx("readonly", s => s.getAll());
+
+  async function borrar(ids) {
+    await tx("readwrite", s => ids.forEach(id => s.delete(id)));
+    actualizarContador();
+  }
+
+  async function actualizarContador() {
+    const badge = document.getElementById("offline-pendientes");
+    if (!badge) return;
+    const n = (await pendientes()).length;
+    badge.textContent = `📴 ${n} abono${n === 1 ? "" : "s"} sin sincronizar`;
+    badge.classList.toggle("d-none", n === 0);
+  }
+
+  // ---------------------------------------------------
+  // 📋 Roster guardado
+  // ---------------------------------------------------
+  const leerRoster = () => tx("readonly", s => s.get("snapshot"), STORE_ROSTER);
+  const guardarRoster = roster => tx("readwrite", s => s.put(roster, "snapshot"), STORE_ROSTER);
+
+  function hoyLocal() {
+    return horaLocal().slice(0, 10);
+  }
+
+  async function descargarRoster() {
+    const guardado = await leerRoster();
+    if (guardado && guardado.hoy === hoyLocal() && Date.now() - guardado.descargado < ROSTER_VIGENCIA_MS) return;
+    const res = await fetch("/api/roster", { headers: { "X-Requested-With": "fetch" } });
+    if (!res.ok || res.redirected) return;
+    const roster = await res.json();
+    roster.descargado = Date.now();
+    await guardarRoster(roster);
+    localStorage.setItem(CLAVE_VERSION, roster.version);
+  }
+
+  // 🔄 Mezcla en el roster guardado las filas cambiadas que devolvió /sync
+  async function mezclarRoster(data) {
+    const roster = await leerRoster();
+    if (!roster || !(data.clientes || []).length) return;
+    const indice = roster.campos.indexOf("id");
+    const cancelado = roster.campos.indexOf("cancelado");
+    const porId = new Map(roster.clientes.map(f => [f[indice], f]));
+    data.clientes.forEach(f => {
+      if (f[cancelado]) porId.delete(f[indice]);
+      else porId.set(f[indice], f);
+    });
+    roster.clientes = [...porId.values()];
+    roster.version = data.version;
+    await guardarRoster(roster);
+  }
+
+  function celda(texto) {
+    const td = document.createElement("td");
+    td.textContent = texto;
+    return td;
+  }
+
+  // 📴 Dibuja la tabla de clientes desde el roster guardado
+  async function renderizarRoster() {
+    const tbody = document.querySelector("#tabla-clientes tbody");
+    const roster = await leerRoster();
+    if (!tbody || !roster) return;
+
+    const porCodigo = {};
+    (await pendientes()).forEach(a => { porCodigo[a.codigo] = (porCodigo[a.codigo] || 0) + a.monto; });
+
+    const filas = roster.clientes
+      .map(f => Object.fromEntries(roster.campos.map((k, i) => [k, f[i]])))
+      .sort((a, b) => (a.orden ?? -Infinity) - (b.orden ?? -Infinity) || a.id - b.id);
+
+    tbody.replaceChildren(...filas.map(c => {
+      const tr = document.createElement("tr");
+      tr.id = `cliente-${c.id}`;
+      tr.className = "fila-cliente";
+      tr.dataset.orden = c.orden ?? "";
+
+      const abonar = document.createElement("td");
+      abonar.className = "abono-td";
+      abonar.innerHTML = `
+        <form action="/registrar_abono_por_codigo" method="post" class="d-flex justify-content-center form-abono">
+          <input type="hidden" name="codigo">
+          <input type="number" step="0.01" min="0.01" name="monto" placeholder="0"
+                 class="form-control text-end abono-input fw-bold" style="width:120px; height:50px; font-size:1.4rem;"
+                 required autocomplete="off">
+          <button type="submit" class="btn btn-success ms-2" style="font-size:1.4rem; padding:0 15px;">💵</button>
+        </form>`;
+      abonar.querySelector("input[name='codigo']").value = c.codigo;
+
+      const saldo = celda((Number(c.saldo) - (porCodigo[c.codigo] || 0)).toFixed(2));
+      saldo.classList.add("saldo-texto");
+      saldo.dataset.clienteId = c.id;
+
+      const nombre = celda(c.nombre);
+      nombre.className = "nombre-cliente";
+      tr.append(
+        celda(c.orden ?? ""), celda(c.codigo), celda("—"), nombre, celda("—"),
+        celda(Number(c.cuota || 0).toFixed(2)), celda("—"), celda(c.ultimo_abono || "—"),
+        abonar, saldo, celda(""), celda(""),
+      );
+      return tr;
+    }));
+  }
+
+  // 🔄 Aplica las filas cambiadas (formato compacto) sobre la tabla
+  function aplicarDelta(data) {
+    const campos = data.campos || [];
+    (data.clientes || []).forEach(fila => {
+      const c = Object.fromEntries(campos.map((k, i) => [k, fila[i]]));
+      const tr = document.getElementById(`cliente-${c.id}`);
+      if (!tr) return;
+      if (c.cancelado) { tr.remove(); return; }
+      const saldo = tr.querySelector(".saldo-texto");
+      if (saldo) saldo.textContent = Number(c.saldo).toFixed(2);
+    });
+  }
+
+  let sincronizando = false;
+  async function sincronizar() {
+    if (sincronizando || !navigator.onLine) return;
+    sincronizando = true;
+    try {
+      const cola = await pendientes();
+      const version = Number(localStorage.getItem(CLAVE_VERSION) || 0);
+      if (!cola.length && version) return;
+
+      const res = await fetch("/sync", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "X-Requested-With": "fetch" },
+        body: JSON.stringify({ version, abonos: cola })
+      });
+      if (!res.ok) return;
+      const data = await res.json();
+
+      await borrar(data.resultados.map(r => r.id).filter(Boolean));
+      localStorage.setItem(CLAVE_VERSION, data.version);
+      await mezclarRoster(data);
+      aplicarDelta(data);
+
+      const errores = data.resultados.filter(r => !r.ok);
+      if (errores.length) alert(`⚠️ ${errores.length} abono(s) offline rechazados: ${errores.map(e => e.error).join(", ")}`);
+    } catch (err) {
+      console.warn("Sincronización pendiente:", err);
+    } finally {
+      sincronizando = false;
+    }
+  }
+
+  async function alCargar() {
+    actualizarContador();
+    if (!navigator.onLine) return renderizarRoster();
+    await sincronizar();
+    try {
+      await descargarRoster();
+    } catch (err) {
+      // 📴 La página vino de la caché del service worker: usar el roster guardado
+      console.warn("Roster no disponible:", err);
+      renderizarRoster();
+    }
+  }
+
+  window.addEventListener("online", sincronizar);
+  document.addEventListener("DOMContentLoaded", alCargar);
+  setInterval(sincronizar, 60000);
+
+  return { encolar, pendientes, sincronizar, renderizarRoster };
+})();
@@ -0,0 +1,55 @@
+// ======================================================
+// sw.js — service worker del cobrador (modo offline)
+// ======================================================
+// 📦 Páginas y roster: red primero, caché si no hay señal.
+// 🎨 Bootstrap (CDN): caché primero.
+
+const CACHE = "cobro-v1";
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", event => {
+  event.waitUntil(
+    caches.keys()
+      .then(claves => Promise.all(claves.filter(c => c !== CACHE).map(c => caches.delete(c))))
+      .then(() => self.clients.claim())
+  );
+});
+
+async function redPrimero(request) {
+  const cache = await caches.open(CACHE);
+  try {
+    const res = await fetch(request);
+    // 🚫 No guardar redirecciones al login ni errores
+    if (res.ok && !res.redirected) cache.put(request, res.clone());
+    return res;
+  } catch (err) {
+    const guardada = await cache.match(request);
+    if (guardada) return guardada;
+    throw err;
+  }
+}
+
+async function cachePrimero(request) {
+  const cache = await caches.open(CACHE);
+  const guardada = await cache.match(request);
+  if (guardada) return guardada;
+  const res = await fetch(request);
+  if (res.ok) cache.put(request, res.clone());
+  return res;
+}
+
+self.addEventListener("fetch", event => {
+  const req = event.request;
+  if (req.method !== "GET") return;
+
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) {
+    if (url.hostname === "cdn.jsdelivr.net") event.respondWith(cachePrimero(req));
+    return;
+  }
+
+  if (req.mode === "navigate" || url.pathname === "/api/roster") {
+    event.respondWith(redPrimero(req));
+  }
+});
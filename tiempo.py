@@ -3,7 +3,8 @@
 # tiempo.py — versión final (hora local Chile 🇨🇱)
 # ======================================================
 
-from datetime import datetime, timedelta, time, date
+from datetime import datetime, date
+from flask import g, has_request_context
 import pytz
 
 # 🕒 Zona horaria oficial de Chile
@@ -21,27 +22,43 @@ def hora_actual():
 # 🔹 Fecha local (solo día)
 # ------------------------------------------------------
 def local_date():
-    """Devuelve la fecha local de Chile (solo date)."""
-    return hora_actual().date()
+    """
+    Devuelve la fecha local de Chile (solo date). Dentro de una petición se
+    calcula una sola vez: todo el request ve el mismo "hoy" aunque cruce la
+    medianoche. Fuera de una petición (worker, CLI) se calcula cada vez.
+    """
+    if not has_request_context():
+        return hora_actual().date()
+    hoy = g.get("_hoy")
+    if hoy is None:
+        hoy = g._hoy = hora_actual().date()
+    return hoy
 
 # ------------------------------------------------------
 # 🔹 Rango horario del día completo (inicio-fin)
 # ------------------------------------------------------
 def day_range(fecha: date):
-    """Devuelve el inicio y fin del día completo según hora local de Chile."""
-    inicio = datetime.combine(fecha, time.min)
-    fin = datetime.combine(fecha + timedelta(days=1), time.min)
-    return inicio, fin
+    """Devuelve el inicio y fin del día completo según hora local de Chile (memorizado)."""
+    from calendario import rango_dia
+    return rango_dia(fecha)
 
 # ------------------------------------------------------
 # 🔹 Formatear hora chilena legible
 # ------------------------------------------------------
-def to_hora_chile(dt):
-    """Convierte un datetime a formato legible HH:MM:SS AM/PM (hora Chile)."""
+_AHORA = object()
+
+
+def to_hora_chile(dt=_AHORA):
+    """
+    Convierte un datetime a formato legible HH:MM:SS AM/PM (hora Chile).
+    - Sin argumento: la hora actual ({{ hora_chile() }}).
+    - Naive: ya es hora local de Chile (así se guarda), se formatea sin pytz.
+    - Con tzinfo: se convierte a Santiago.
+    """
+    if dt is _AHORA:
+        dt = hora_actual()
     if dt is None:
         return ""
     if dt.tzinfo is not None:
         dt = dt.astimezone(CHILE_TZ)
-    else:
-        dt = CHILE_TZ.localize(dt)
     return dt.strftime("%I:%M:%S %p")
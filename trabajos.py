@@ -0,0 +1,316 @@
+# ======================================================
+# trabajos.py — cola de trabajos en segundo plano (tabla trabajo)
+# ======================================================
+# - encolar() inserta en la misma transacción de la ruta: si la ruta hace
+#   rollback, el trabajo tampoco existe.
+# - Un solo pendiente por (tipo, clave) (índice único parcial): diez pedidos
+#   de recalcular el mismo día dejan una fila.
+# - El worker (Procfile: "flask --app app trabajos") toma trabajos con
+#   FOR UPDATE SKIP LOCKED en PostgreSQL; en SQLite el UPDATE ... RETURNING
+#   ya es atómico. Varios workers nunca toman el mismo trabajo.
+# - Si el trabajo falla se reintenta con espera exponencial hasta max_intentos.
+# - Un trabajo "en_curso" cuyo worker murió vuelve a tomarse pasado VISIBILIDAD_SEG.
+
+import os
+import time
+import signal
+import traceback
+from datetime import date, timedelta
+from sqlalchemy import select, update, delete, func, or_, and_
+from extensions import db
+from modelos import Trabajo
+from helpers import insert_upsert
+from tiempo import hora_actual, local_date
+
+# ⏱️ Segundos entre consultas cuando la cola está vacía
+INTERVALO_SEG = float(os.getenv("TRABAJOS_INTERVALO", "2"))
+
+# 🔁 Espera base entre reintentos (se duplica en cada intento, tope 1 h)
+REINTENTO_BASE_SEG = int(os.getenv("TRABAJOS_REINTENTO_SEG", "30"))
+
+# 👻 Un trabajo en curso más viejo que esto se da por abandonado
+VISIBILIDAD_SEG = int(os.getenv("TRABAJOS_VISIBILIDAD_SEG", "900"))
+
+# 🧹 Días que se guardan los trabajos terminados
+DIAS_HISTORIAL = int(os.getenv("TRABAJOS_DIAS_HISTORIAL", "7"))
+
+# tipo → función(clave, datos)
+TAREAS = {}
+
+# 📅 Trabajos que el worker programa una vez por día (clave = fecha)
+DIARIOS = ("cierre_diario", "interes_mensual", "archivar", "purgar", "integridad")
+
+
+def tarea(tipo: str):
+    """Decorador: registra la función que ejecuta los trabajos de `tipo`."""
+    def registrar(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return registrar
+
+
+# ---------------------------------------------------
+# ➕ Encolar
+# ---------------------------------------------------
+def encolar(tipo: str, clave: str = "", datos: dict = None, demora: int = 0, max_intentos: int = 5):
+    """
+    Agrega un trabajo pendiente, o no hace nada si ya hay uno pendiente con
+    el mismo (tipo, clave). Devuelve True si se creó. No hace commit.
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    ahora = hora_actual()
+    creado = db.session.execute(
+        insert_upsert(Trabajo)
+        .values(
+            tipo=tipo, clave=str(clave), datos=datos or {}, estado="pendiente",
+            intentos=0, max_intentos=max_intentos,
+            disponible_en=ahora + timedelta(seconds=demora), creado=ahora,
+        )
+        .on_conflict_do_nothing(
+            index_elements=["tipo", "clave"], index_where=Trabajo.estado == "pendiente"
+        )
+        .returning(Trabajo.id)
+    ).first()
+    return creado is not None
+
+
+def programar_diarios(hoy: date = None):
+    """Encola (una vez por día) los trabajos de DIARIOS. Hace commit."""
+    clave = (hoy or local_date()).isoformat()
+    ya = set(db.session.execute(
+        select(Trabajo.tipo).where(Trabajo.tipo.in_(DIARIOS), Trabajo.clave == clave)
+    ).scalars())
+    nuevos = [t for t in DIARIOS if t not in ya and encolar(t, clave)]
+    db.session.commit()
+    return nuevos
+
+
+# ---------------------------------------------------
+# 🏃 Tomar y ejecutar
+# ---------------------------------------------------
+def tomar():
+    """Reserva el próximo trabajo disponible (o None). Hace commit."""
+    ahora = hora_actual()
+    candidato = (
+        select(Trabajo.id)
+        .where(or_(
+            and_(Trabajo.estado == "pendiente", Trabajo.disponible_en <= ahora),
+            and_(Trabajo.estado == "en_curso",
+                 Trabajo.iniciado < ahora - timedelta(seconds=VISIBILIDAD_SEG)),
+        ))
+        .order_by(Trabajo.disponible_en, Trabajo.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    fila = db.session.execute(
+        update(Trabajo)
+        .where(Trabajo.id == candidato)
+        .values(estado="en_curso", iniciado=ahora, intentos=Trabajo.intentos + 1)
+        .returning(Trabajo.id, Trabajo.tipo, Trabajo.clave, Trabajo.datos,
+                   Trabajo.intentos, Trabajo.max_intentos)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.session.commit()
+    return fila
+
+
+def _terminar(trabajo_id: int, **valores):
+    db.session.execute(
+        update(Trabajo).where(Trabajo.id == trabajo_id)
+        .values(terminado=hora_actual(), **valores)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _ultima_linea(texto):
+    """Última línea de un traceback (el mensaje de la excepción)."""
+    lineas = (texto or "").strip().splitlines()
+    return lineas[-1] if lineas else ""
+
+
+def _fallar(fila, error: str):
+    """Reprograma con espera exponencial o marca como fallido."""
+    db.session.rollback()
+    hay_otro = db.session.query(Trabajo.id).filter(
+        Trabajo.tipo == fila.tipo, Trabajo.clave == fila.clave,
+        Trabajo.estado == "pendiente", Trabajo.id != fila.id,
+    ).first()
+    if fila.intentos >= fila.max_intentos or hay_otro:
+        _terminar(fila.id, estado="fallido", error=error)
+        print(f"❌ Trabajo {fila.tipo}[{fila.clave}] falló definitivamente: {_ultima_linea(error)}")
+        return
+    espera = min(REINTENTO_BASE_SEG * 2 ** (fila.intentos - 1), 3600)
+    db.session.execute(
+        update(Trabajo).where(Trabajo.id == fila.id)
+        .values(estado="pendiente", error=error,
+                disponible_en=hora_actual() + timedelta(seconds=espera))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    print(f"🔁 Trabajo {fila.tipo}[{fila.clave}] reintento {fila.intentos}/{fila.max_intentos} en {espera}s")
+
+
+def ejecutar(fila):
+    """Corre un trabajo ya tomado y registra el resultado."""
+    funcion = TAREAS.get(fila.tipo)
+    if funcion is None:
+        _terminar(fila.id, estado="fallido", error=f"Sin tarea registrada para {fila.tipo}")
+        return False
+    inicio = time.perf_counter()
+    try:
+        funcion(fila.clave, fila.datos or {})
+        db.session.commit()
+    except Exception:
+        _fallar(fila, traceback.format_exc())
+        return False
+    _terminar(fila.id, estado="hecho", error=None)
+    print(f"✅ Trabajo {fila.tipo}[{fila.clave}] en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return True
+
+
+def procesar(limite: int = None):
+    """Ejecuta trabajos disponibles hasta vaciar la cola (o `limite`). Devuelve cuántos tomó."""
+    tomados = 0
+    while limite is None or tomados < limite:
+        fila = tomar()
+        if fila is None:
+            break
+        ejecutar(fila)
+        tomados += 1
+    return tomados
+
+
+def trabajar(intervalo: float = INTERVALO_SEG, una_vez: bool = False):
+    """Bucle del worker. SIGTERM (deploy de Heroku) termina tras el trabajo en curso."""
+    detener = []
+    signal.signal(signal.SIGTERM, lambda *_: detener.append(True))
+    print(f"⚙️ Worker de trabajos iniciado (pid {os.getpid()})")
+    while not detener:
+        programar_diarios()
+        if not procesar() and not una_vez:
+            time.sleep(intervalo)
+        if una_vez:
+            break
+    print("⚙️ Worker de trabajos detenido")
+
+
+# ---------------------------------------------------
+# 📊 Estado de la cola
+# ---------------------------------------------------
+def estado_cola():
+    """Profundidad por tipo y estado, antigüedad del pendiente más viejo y últimos fallos."""
+    ahora = hora_actual()
+    conteos = {}
+    for tipo, estado, cantidad in db.session.execute(
+        select(Trabajo.tipo, Trabajo.estado, func.count(Trabajo.id))
+        .group_by(Trabajo.tipo, Trabajo.estado)
+    ):
+        conteos.setdefault(tipo, {})[estado] = cantidad
+
+    mas_viejo = db.session.query(func.min(Trabajo.creado)).filter(Trabajo.estado == "pendiente").scalar()
+    fallos = (
+        Trabajo.query.filter(Trabajo.estado == "fallido")
+        .order_by(Trabajo.terminado.desc()).limit(10).all()
+    )
+    return {
+        "pendientes": sum(c.get("pendiente", 0) for c in conteos.values()),
+        "en_curso": sum(c.get("en_curso", 0) for c in conteos.values()),
+        "fallidos": sum(c.get("fallido", 0) for c in conteos.values()),
+        "espera_max_seg": int((ahora - mas_viejo).total_seconds()) if mas_viejo else 0,
+        "por_tipo": conteos,
+        "ultimos_fallos": [
+            {"id": t.id, "tipo": t.tipo, "clave": t.clave, "intentos": t.intentos,
+             "terminado": t.terminado.isoformat() if t.terminado else None,
+             "error": _ultima_linea(t.error)}
+            for t in fallos
+        ],
+    }
+
+
+def purgar_trabajos(dias: int = DIAS_HISTORIAL):
+    """Borra trabajos hechos o fallidos de hace más de `dias` días. No hace commit."""
+    limite = hora_actual() - timedelta(days=dias)
+    return db.session.execute(
+        delete(Trabajo).where(Trabajo.estado.in_(("hecho", "fallido")), Trabajo.terminado < limite)
+    ).rowcount
+
+
+# ======================================================
+# 🧰 Tareas
+# ======================================================
+@tarea("recalcular_liquidacion")
+def _recalcular_liquidacion(clave, datos):
+    """Recalcula un día desde abonos y movimientos (botón "Recalcular")."""
+    from helpers import actualizar_liquidacion_por_movimiento
+    actualizar_liquidacion_por_movimiento(date.fromisoformat(clave))
+
+
+@tarea("reproducir_diario")
+def _reproducir_diario(clave, datos):
+    """Corrige las proyecciones reproduciendo el diario de dinero desde `datos["desde"]`."""
+    from diario import reproducir
+    informe = reproducir(datos.get("desde"), aplicar=True)
+    print(f"📒 Diario reproducido: {len(informe['prestamos'])} préstamos, "
+          f"{len(informe['dias'])} diferencias de liquidación corregidas")
+
+
+@tarea("conciliar_prestamos")
+def _conciliar_prestamos(clave, datos):
+    from conciliacion import conciliar_prestamos
+    conciliar_prestamos(aplicar=True)
+
+
+@tarea("cierre_diario")
+def _cierre_diario(clave, datos):
+    from cierre import cerrar_pendientes
+    from cartera import capturar
+    cerrar_pendientes()
+    # 📈 Foto de la cartera del día recién cerrado (si ya existe, no se toca)
+    capturar(local_date() - timedelta(days=1))
+    db.session.commit()
+
+
+@tarea("interes_mensual")
+def _interes_mensual(clave, datos):
+    """Suma el interés a los préstamos mensuales que cumplieron 30 días (fuera de la ruta de abonos)."""
+    from pagos import aplicar_intereses_vencidos
+    aplicados = aplicar_intereses_vencidos()
+    if aplicados:
+        print(f"📈 Interés mensual aplicado a {len(aplicados)} préstamos "
+              f"(${sum(aplicados.values()):,.2f})")
+
+
+@tarea("analitica_exportar")
+def _analitica_exportar(clave, datos):
+    """Actualiza la copia columnar de analítica (comando analitica-exportar)."""
+    from analitica import exportar, DIRECTORIO
+    exportar(datos.get("directorio") or DIRECTORIO, bool(datos.get("completo")))
+
+
+@tarea("archivar")
+def _archivar(clave, datos):
+    from archivo import mover_archivados
+    mover_archivados()
+
+
+@tarea("purgar")
+def _purgar(clave, datos):
+    from idempotencia import purgar_respuestas_vencidas
+    purgar_respuestas_vencidas()
+    purgar_trabajos()
+
+
+@tarea("integridad")
+def _integridad(clave, datos):
+    """Revisión nocturna: deja el resumen en el log del worker."""
+    from integridad import revisar, resumen
+    violaciones = list(revisar())
+    if not violaciones:
+        print("🩺 Integridad: sin violaciones")
+        return
+    errores = sum(1 for v in violaciones if v["severidad"] == "error")
+    print(f"🩺 Integridad: {errores} errores, {len(violaciones) - errores} avisos · "
+          + ", ".join(f"{r} {n}" for r, n in sorted(resumen(violaciones).items())))
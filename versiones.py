@@ -0,0 +1,164 @@
+# ======================================================
+# versiones.py — versión de cambio global (sync, exportes, ETags)
+# ======================================================
+# Las versiones salen de una secuencia, pero las transacciones confirman en
+# cualquier orden: la fila con versión 10 puede aparecer después de la 11.
+# Por eso la marca que se entrega a los clientes ("cambios desde N") nunca
+# pasa de la mayor versión sellada hace más de VENTANA_SEG segundos: lo más
+# nuevo se vuelve a enviar en la consulta siguiente (los ids repetidos no
+# dañan) y ninguna fila confirmada tarde queda por debajo de la marca.
+
+import os
+from datetime import timedelta
+from sqlalchemy import event, func, select, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from modelos import (
+    Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion, LiquidacionFranja,
+    VersionContador, CambioBorrado,
+)
+from tiempo import hora_actual
+
+# 📋 Modelos que llevan columnas "version" y "actualizado"
+MODELOS_VERSIONADOS = (Cliente, Prestamo, Abono, MovimientoCaja, Liquidacion, LiquidacionFranja)
+
+# 🗂️ nombre de tabla → modelo (para responder "cambios desde N")
+TABLAS_VERSIONADAS = {m.__tablename__: m for m in MODELOS_VERSIONADOS}
+
+# ⏳ Duración máxima esperada de una transacción de escritura
+VENTANA_SEG = int(os.getenv("VERSIONES_VENTANA_SEG", "120"))
+
+
+def siguiente_version(conexion=None):
+    """
+    Devuelve la próxima versión para usar en INSERT/UPDATE.
+    - PostgreSQL: expresión nextval(...) que se evalúa dentro de la misma sentencia.
+    - SQLite: entero obtenido con un UPSERT ... RETURNING sobre version_contador.
+    """
+    conexion = conexion or db.session.connection()
+    if conexion.dialect.name == "postgresql":
+        return func.nextval("cambio_version_seq")
+
+    tabla = VersionContador.__table__
+    return conexion.execute(
+        sqlite_insert(VersionContador)
+        .values(id=1, valor=1)
+        .on_conflict_do_update(index_elements=["id"], set_={"valor": tabla.c.valor + 1})
+        .returning(tabla.c.valor)
+    ).scalar_one()
+
+
+def sello(conexion=None):
+    """Valores de version/actualizado para INSERT/UPDATE hechos con Core (fuera del ORM)."""
+    return {"version": siguiente_version(conexion), "actualizado": hora_actual()}
+
+
+def version_actual(*modelos):
+    """
+    Marca segura de los modelos indicados (todos si no se indica ninguno,
+    incluidas las filas borradas): la mayor versión sellada antes de la
+    ventana de VENTANA_SEG. Una transacción en curso ya no puede confirmar
+    filas con versión menor o igual. Quien pide "cambios desde N" recibe las
+    filas con version > N.
+    """
+    limite = hora_actual() - timedelta(seconds=VENTANA_SEG)
+    modelos = modelos or MODELOS_VERSIONADOS + (CambioBorrado,)
+    maximo = 0
+    for modelo in modelos:
+        sellado = modelo.fecha if modelo is CambioBorrado else modelo.actualizado
+        valor = db.session.execute(
+            select(modelo.version).where(sellado < limite)
+            .order_by(modelo.version.desc()).limit(1)
+            .execution_options(incluir_archivados=True)
+        ).scalar()
+        maximo = max(maximo, int(valor or 0))
+    return maximo
+
+
+def anotar_borrados(tabla: str, ids):
+    """Lápidas para filas borradas con DELETE de Core (no pasan por el ORM). No hace commit."""
+    if not ids:
+        return
+    db.session.execute(
+        insert(CambioBorrado.__table__).values(version=siguiente_version(), fecha=hora_actual()),
+        [{"tabla": tabla, "fila_id": i} for i in ids],
+    )
+
+
+def cambios_desde(version: int, limite: int = 1000):
+    """
+    Ids cambiados y borrados con version > N, por tabla, de menor a mayor versión.
+    Cada tabla devuelve como máximo `limite` filas; si alguna se cortó,
+    "version" apunta al último punto completo y "completo" es False
+    (basta volver a pedir desde esa versión). "version" tampoco pasa de la
+    marca segura (version_actual): lo más reciente vuelve a llegar la vez
+    siguiente.
+    """
+    cambios, cortes, vistos = {}, [], [version]
+
+    for tabla, modelo in TABLAS_VERSIONADAS.items():
+        filas = (
+            db.session.query(modelo.id, modelo.version)
+            .filter(modelo.version > version)
+            .order_by(modelo.version.asc())
+            .limit(limite)
+            .execution_options(incluir_archivados=True)  # archivar también es un cambio
+            .all()
+        )
+        if filas:
+            cambios[tabla] = [f[0] for f in filas]
+            vistos.append(filas[-1][1])
+            if len(filas) == limite:
+                cortes.append(filas[-1][1])
+
+    borrados = {}
+    lapidas = (
+        CambioBorrado.query.filter(CambioBorrado.version > version)
+        .order_by(CambioBorrado.version.asc())
+        .limit(limite)
+        .all()
+    )
+    for l in lapidas:
+        borrados.setdefault(l.tabla, []).append(l.fila_id)
+    if lapidas:
+        vistos.append(lapidas[-1].version)
+        if len(lapidas) == limite:
+            cortes.append(lapidas[-1].version)
+
+    hasta = min(cortes) if cortes else max(vistos)
+    return {
+        "version": int(max(version, min(hasta, version_actual()))),
+        "completo": not cortes,
+        "cambios": cambios,
+        "borrados": borrados,
+    }
+
+
+# ---------------------------------------------------
+# 🔔 Sellar versión en cada INSERT/UPDATE/DELETE del ORM
+# ---------------------------------------------------
+@event.listens_for(Session, "before_flush")
+def _sellar_versiones(session, flush_context, instances):
+    conexion = None
+    ahora = hora_actual()
+
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, MODELOS_VERSIONADOS):
+            continue
+        if obj in session.new or session.is_modified(obj):
+            conexion = conexion or session.connection()
+            obj.version = siguiente_version(conexion)
+            obj.actualizado = ahora
+
+    # 🪦 Lápida por cada fila borrada (los DELETE masivos de Core no pasan por aquí)
+    for obj in list(session.deleted):
+        if not isinstance(obj, MODELOS_VERSIONADOS) or obj.id is None:
+            continue
+        conexion = conexion or session.connection()
+        session.add(CambioBorrado(
+            tabla=obj.__tablename__,
+            fila_id=obj.id,
+            version=siguiente_version(conexion),
+            fecha=ahora,
+        ))